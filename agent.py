@@ -1,7 +1,13 @@
 import asyncio
 import logging
-from typing import Dict, Any, List
-from config import module_config
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable, Callable, Awaitable
+from config import settings, module_config
+from http_client import AsyncHTTPClient
+from dns_resolver import DNSResolver
+from whois_client import WhoisClient
+from scheduler import FairScheduler
+from base_module import module_events
 from modules.whois_module import WhoisModule
 from modules.domain_module import DomainModule
 from modules.port_module import PortModule
@@ -14,41 +20,108 @@ logger = logging.getLogger(__name__)
 
 
 class InformationGatheringAgent:
-    """用于信息收集的主AI代理"""
+    """
+    用于信息收集的主AI代理
+    
+    代理持有所有模块共享的HTTP连接池、带缓存的DNS解析器和WHOIS客户端，建议以异步上下文管理器的方式使用:
+    
+        async with InformationGatheringAgent() as agent:
+            results = await agent.run_scan("example.com")
+    """
     
     def __init__(self):
         self.modules = {}
         self.results = {}
+        self.http_client = AsyncHTTPClient()
+        self.resolver = DNSResolver()
+        self.whois = WhoisClient(self.resolver)
         self._initialize_modules()
     
+    async def __aenter__(self) -> "InformationGatheringAgent":
+        await self.http_client.__aenter__()
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+    
+    async def close(self):
+        """关闭代理持有的共享连接池和DNS解析器"""
+        await self.http_client.close()
+        await self.resolver.close()
+    
+    def get_pool_stats(self) -> Dict[str, int]:
+        """
+        获取共享HTTP连接池的统计信息
+        
+        返回:
+            包含打开、空闲连接数和等待请求数的字典
+        """
+        return self.http_client.get_pool_stats()
+    
     def _initialize_modules(self):
         """初始化所有启用的模块"""
         enabled_modules = module_config.get_enabled_modules()
         
         if "whois" in enabled_modules:
-            self.modules["whois"] = WhoisModule()
+            self.modules["whois"] = WhoisModule(self.http_client, self.whois)
         
         if "domain" in enabled_modules:
-            self.modules["domain"] = DomainModule()
+            self.modules["domain"] = DomainModule(self.http_client, self.resolver)
         
         if "port" in enabled_modules:
-            self.modules["port"] = PortModule()
+            self.modules["port"] = PortModule(self.http_client, self.resolver)
         
         if "sensitive" in enabled_modules:
-            self.modules["sensitive"] = SensitiveInfoModule()
+            self.modules["sensitive"] = SensitiveInfoModule(self.http_client)
         
         if "github" in enabled_modules:
-            self.modules["github"] = GithubModule()
+            self.modules["github"] = GithubModule(self.http_client)
         
         logger.info(f"已初始化 {len(self.modules)} 个模块: {list(self.modules.keys())}")
     
-    async def run_scan(self, target: str) -> Dict[str, Any]:
+    def fresh_modules(self, previous: Optional[Dict[str, Any]],
+                      module_names: Optional[List[str]] = None) -> List[str]:
+        """
+        找出上一次结果仍在有效期内、增量扫描时可以直接沿用的模块
+        
+        有效期按模块在 modules.yaml 的 incremental.ttls 中配置，默认为 settings.incremental_default_ttl。
+        
+        参数:
+            previous: 存储返回的上一次完整结果（包含 "results" 和 "module_timestamps"），没有时为None
+            module_names: 要考虑的模块名称列表，默认为所有启用的模块
+            
+        返回:
+            可以沿用的模块名称列表
+        """
+        if not previous:
+            return []
+        ttls = module_config.get_incremental_config().get("ttls") or {}
+        timestamps = previous.get("module_timestamps", {})
+        now = datetime.now()
+        fresh = []
+        for name in self.modules:
+            if module_names is not None and name not in module_names:
+                continue
+            old = previous["results"].get(name)
+            if old is None or "error" in old or not timestamps.get(name):
+                continue
+            age = (now - datetime.fromisoformat(timestamps[name])).total_seconds()
+            if age < ttls.get(name, settings.incremental_default_ttl):
+                fresh.append(name)
+        return fresh
+    
+    async def run_scan(self, target: str, carried: Optional[Dict[str, Dict[str, Any]]] = None,
+                       on_module_complete: Optional[Callable[[str, str, Dict[str, Any]], Awaitable[None]]] = None,
+                       on_event: Optional[Callable[[str, str, Dict[str, Any]], Awaitable[None]]] = None) -> Dict[str, Any]:
         """
         对目标运行完整的信息收集扫描
         
         参数:
             target: 要扫描的目标域名/IP
-            
+            carried: 增量扫描时直接沿用、不再运行的模块结果（模块名 -> 结果）
+            on_module_complete: 每个模块运行完成（包括出错）后调用的协程函数，参数为 (目标, 模块名, 模块结果)，
+                用于在扫描过程中逐个保存模块结果；沿用的模块结果不会传给该回调
+                
         返回:
             包含所有扫描结果的字典
         """
@@ -56,11 +129,15 @@ class InformationGatheringAgent:
         
         # 清除之前的结果
         self.results.clear()
+        self.results.update(carried or {})
         
         # 为所有启用的模块创建任务
         tasks = []
         for module_name, module in self.modules.items():
-            task = self._run_module(module_name, module, target)
+            if module_name in self.results:
+                continue
+            task = self._run_module(module_name, module, target, on_module_complete=on_module_complete,
+                                    on_event=on_event)
             tasks.append(task)
         
         # 并发运行所有任务
@@ -69,7 +146,10 @@ class InformationGatheringAgent:
         logger.info(f"完成对 {target} 的信息收集扫描")
         return self.results
     
-    async def _run_module(self, module_name: str, module, target: str):
+    async def _run_module(self, module_name: str, module, target: str,
+                          results: Optional[Dict[str, Any]] = None,
+                          on_module_complete: Optional[Callable[[str, str, Dict[str, Any]], Awaitable[None]]] = None,
+                          on_event: Optional[Callable[[str, str, Dict[str, Any]], Awaitable[None]]] = None):
         """
         运行特定模块并存储其结果
         
@@ -77,23 +157,156 @@ class InformationGatheringAgent:
             module_name: 模块名称
             module: 模块实例
             target: 要扫描的目标
+            results: 存放结果的字典，默认为 self.results
+            on_module_complete: 模块完成后调用的协程函数，参数为 (目标, 模块名, 模块结果)
+            on_event: 接收进度事件的协程函数，参数为 (目标, 模块名, 事件)；事件是带 type 字段的字典，
+                依次为 module_started、模块上报的 finding 和 module_completed
         """
+        if results is None:
+            results = self.results
+        
+        handler = None
+        if on_event is not None:
+            async def handler(event: Dict[str, Any]):
+                await on_event(target, module_name, event)
+            await self._emit(handler, {"type": "module_started"})
+        
         try:
             logger.info(f"正在运行 {target} 的 {module_name} 模块")
-            result = await module.execute(target)
-            self.results[module_name] = result
+            with module_events(handler):
+                result = await module.execute(target)
+            results[module_name] = result
             logger.info(f"完成 {target} 的 {module_name} 模块")
         except Exception as e:
             logger.error(f"运行 {target} 的 {module_name} 模块时出错: {str(e)}")
-            self.results[module_name] = {"error": str(e)}
+            results[module_name] = {"error": str(e)}
+        
+        if handler is not None:
+            await self._emit(handler, self._completed_event(results[module_name]))
+        
+        if on_module_complete is not None:
+            try:
+                await on_module_complete(target, module_name, results[module_name])
+            except Exception as e:
+                logger.error(f"处理 {target} 的 {module_name} 模块结果时出错: {str(e)}")
     
-    async def run_specific_modules(self, target: str, module_names: List[str]) -> Dict[str, Any]:
+    async def _emit(self, handler: Callable[[Dict[str, Any]], Awaitable[None]], event: Dict[str, Any]):
+        """把代理自身的事件交给处理函数，处理函数出错不影响扫描"""
+        try:
+            await handler(event)
+        except Exception as e:
+            logger.error(f"处理 {event['type']} 事件时出错: {str(e)}")
+    
+    @staticmethod
+    def _completed_event(module_results: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        生成 module_completed 事件，只包含各列表和字典字段的条目数，完整结果由 on_module_complete 处理
+        
+        参数:
+            module_results: 模块结果
+            
+        返回:
+            事件字典
+        """
+        event = {"type": "module_completed", "status": "error" if "error" in module_results else "success"}
+        if "error" in module_results:
+            event["error"] = str(module_results["error"])
+        event["counts"] = {
+            field: len(value) for field, value in module_results.items()
+            if isinstance(value, (list, dict))
+        }
+        return event
+    
+    async def run_batch(self, targets: Iterable[str], module_names: Optional[List[str]] = None,
+                        max_concurrency: Optional[int] = None,
+                        per_target_concurrency: Optional[int] = None,
+                        on_target_complete: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+                        carried_results: Optional[Callable[[str], Awaitable[Dict[str, Dict[str, Any]]]]] = None,
+                        on_module_complete: Optional[Callable[[str, str, Dict[str, Any]], Awaitable[None]]] = None,
+                        on_event: Optional[Callable[[str, str, Dict[str, Any]], Awaitable[None]]] = None
+                        ) -> Dict[str, Dict[str, Any]]:
+        """
+        批量扫描多个目标
+        
+        所有 目标×模块 工作项由同一个有界调度器执行，调度在目标之间轮转，
+        每个目标同时运行的模块数也有上限。每个目标的结果单独存放，不会互相覆盖，
+        也不会影响 self.results。
+        
+        参数:
+            targets: 要扫描的目标（列表或惰性迭代器，重复项会被忽略）
+            module_names: 要运行的模块名称列表，默认为所有启用的模块
+            max_concurrency: 同时运行的工作项总数，默认为 settings.batch_max_concurrency
+            per_target_concurrency: 单个目标同时运行的模块数，默认为 settings.batch_per_target_concurrency
+            on_target_complete: 某个目标的全部模块完成后调用的协程函数，参数为 (目标, 结果)；
+                提供该回调时，已交给回调的目标结果不再保留在返回值中
+            carried_results: 增量扫描时调用的协程函数，参数为目标，返回该目标可以沿用、不再运行的模块结果；
+                每个目标只调用一次
+            on_module_complete: 每个模块运行完成（包括出错）后调用的协程函数，参数为 (目标, 模块名, 模块结果)，
+                用于在扫描过程中逐个保存模块结果；沿用的模块结果不会传给该回调
+            on_event: 接收进度事件的协程函数，参数为 (目标, 模块名, 事件)，见 _run_module
+            
+        返回:
+            以目标为键、模块结果字典为值的字典
+        """
+        modules_to_run = [
+            name for name in self.modules
+            if module_names is None or name in module_names
+        ]
+        scheduler = FairScheduler(
+            max_concurrency or settings.batch_max_concurrency,
+            per_target_concurrency or settings.batch_per_target_concurrency
+        )
+        batch_results: Dict[str, Dict[str, Any]] = {}
+        
+        def work_groups():
+            seen = set()
+            for target in targets:
+                target = target.strip()
+                if not target or target in seen:
+                    continue
+                seen.add(target)
+                batch_results[target] = {}
+                yield target, modules_to_run
+        
+        carried_futures: Dict[str, "asyncio.Future[Dict[str, Dict[str, Any]]]"] = {}
+        
+        async def handle(target: str, module_name: str):
+            if carried_results is not None:
+                # 同一目标的多个模块共享一次加载
+                if target not in carried_futures:
+                    carried_futures[target] = asyncio.ensure_future(carried_results(target))
+                carried = await asyncio.shield(carried_futures[target])
+                if module_name in carried:
+                    batch_results[target][module_name] = carried[module_name]
+                    return
+            await self._run_module(module_name, self.modules[module_name], target, batch_results[target],
+                                   on_module_complete, on_event)
+        
+        async def complete(target: str):
+            logger.info(f"完成对 {target} 的批量扫描")
+            carried_futures.pop(target, None)
+            if on_target_complete is not None:
+                await on_target_complete(target, batch_results.pop(target))
+        
+        logger.info(f"开始批量扫描，模块: {modules_to_run}")
+        await scheduler.run(work_groups(), handle, complete)
+        logger.info("批量扫描完成")
+        return batch_results
+    
+    async def run_specific_modules(self, target: str, module_names: List[str],
+                                   carried: Optional[Dict[str, Dict[str, Any]]] = None,
+                                   on_module_complete: Optional[Callable[[str, str, Dict[str, Any]], Awaitable[None]]] = None,
+                                   on_event: Optional[Callable[[str, str, Dict[str, Any]], Awaitable[None]]] = None) -> Dict[str, Any]:
         """
         仅运行特定模块
         
         参数:
             target: 要扫描的目标域名/IP
             module_names: 要运行的模块名称列表
+            carried: 增量扫描时直接沿用、不再运行的模块结果（模块名 -> 结果）
+            on_module_complete: 每个模块运行完成（包括出错）后调用的协程函数，参数为 (目标, 模块名, 模块结果)，
+                用于在扫描过程中逐个保存模块结果；沿用的模块结果不会传给该回调
+            on_event: 接收进度事件的协程函数，参数为 (目标, 模块名, 事件)，见 _run_module
             
         返回:
             包含指定模块结果的字典
@@ -104,15 +317,20 @@ class InformationGatheringAgent:
         self.results.clear()
         
         # 筛选出仅启用和请求的模块
-        modules_to_run = {
-            name: module for name, module in self.modules.items()
-            if name in module_names
-        }
+        modules_to_run = {}
+        for name, module in self.modules.items():
+            if name not in module_names:
+                continue
+            if carried and name in carried:
+                self.results[name] = carried[name]
+            else:
+                modules_to_run[name] = module
         
         # 为选定的模块创建任务
         tasks = []
         for module_name, module in modules_to_run.items():
-            task = self._run_module(module_name, module, target)
+            task = self._run_module(module_name, module, target, on_module_complete=on_module_complete,
+                                    on_event=on_event)
             tasks.append(task)
         
         # 并发运行所有任务
@@ -137,12 +355,10 @@ class InformationGatheringAgent:
 
 async def main():
     """用于测试代理的主函数"""
-    # 创建代理实例
-    agent = InformationGatheringAgent()
-    
-    # 对example.com运行扫描
+    # 创建代理实例并对example.com运行扫描
     target = "example.com"
-    results = await agent.run_scan(target)
+    async with InformationGatheringAgent() as agent:
+        results = await agent.run_scan(target)
     
     # 打印结果摘要
     print(f"\n=== {target} 的扫描结果 ===")
@@ -162,7 +378,8 @@ async def main():
             # 打印每个模块的一些关键信息
             if module_name == "whois":
                 whois_data = result.get("whois_data", {})
-                print(f"  查询的来源: {len(whois_data)}")
+                print(f"  注册商: {whois_data.get('registrar', 'N/A')}")
+                print(f"  过期时间: {whois_data.get('expiration_date', 'N/A')}")
             elif module_name == "domain":
                 subdomains = result.get("subdomains", [])
                 print(f"  发现的子域名: {len(subdomains)}")
@@ -41,8 +41,7 @@ async def run_scan(target: str, modules: List[str], task_id: str = None) -> dict
         task_id = str(uuid.uuid4())
     
     # Create task record
-    storage.create_task(task_id, target, modules)
-    storage.update_task_status(task_id, "running")
+    await storage.create_task_async(task_id, target, modules, status="running")
     
     try:
         # Create agent and run scan
@@ -50,16 +49,12 @@ async def run_scan(target: str, modules: List[str], task_id: str = None) -> dict
         task = {"target": target, "modules": modules}
         results = await agent.execute(task)
         
-        # Save results to storage
-        for module_name, result in results.items():
-            storage.save_result(task_id, target, module_name, result)
-        
-        # Update task status
-        storage.update_task_status(task_id, "completed")
+        # Save all module results and update task status in one transaction
+        await storage.complete_task_async(task_id, target, results)
         
         return results
     except Exception as e:
-        storage.update_task_status(task_id, "failed")
+        await storage.update_task_status_async(task_id, "failed")
         raise
 
 
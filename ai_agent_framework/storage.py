@@ -1,92 +1,187 @@
 """
 Storage System for AI Agent Framework
 """
+import asyncio
 import json
+import queue
 import sqlite3
 import logging
-from typing import Dict, Any, List, Optional
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Callable, Tuple
 from pathlib import Path
 from datetime import datetime
 
+try:
+    from findings_index import FindingsIndex
+except ImportError:  # Package used outside the project tree, findings are not indexed
+    FindingsIndex = None
+
 logger = logging.getLogger(__name__)
 
+# Statements are kept as constants so that every call reuses the same SQL text and
+# sqlite3's per-connection statement cache hands back the already prepared statement
+INSERT_RESULT_SQL = "INSERT INTO results (task_id, target, module_name, result) VALUES (?, ?, ?, ?)"
+SELECT_RESULTS_SQL = "SELECT * FROM results WHERE task_id = ? ORDER BY timestamp, id"
+INSERT_TASK_SQL = "INSERT INTO tasks (task_id, target, modules) VALUES (?, ?, ?)"
+UPDATE_TASK_SQL = "UPDATE tasks SET status = ? WHERE task_id = ?"
+UPDATE_TASK_COMPLETED_SQL = "UPDATE tasks SET status = ?, completed_at = ? WHERE task_id = ?"
+SELECT_TASK_SQL = "SELECT * FROM tasks WHERE task_id = ?"
+
+# Size of the per-connection prepared statement cache
+STATEMENT_CACHE_SIZE = 64
+# Maximum number of queued async writes committed together by the writer thread
+WRITER_BATCH_SIZE = 256
+# Full-text findings index shared with the agent's ResultsStorage (same default location)
+DEFAULT_FINDINGS_INDEX_PATH = "results/findings.db"
+
 
 class Storage:
-    """Storage system for agent results and configuration"""
+    """
+    Storage system for agent results and configuration
     
-    def __init__(self, db_path: str = "agent_data.db"):
+    A single long-lived connection in WAL mode is shared by all calls (guarded by a lock),
+    so there is no connect/close per operation. Synchronous methods commit their own
+    transaction; the *_async methods hand their writes to a background writer thread which
+    commits everything queued at that moment in one transaction, so coroutines never block
+    the event loop on disk I/O and concurrent writers share a single fsync.
+    """
+    
+    def __init__(self, db_path: str = "agent_data.db", findings_index_path: Optional[str] = DEFAULT_FINDINGS_INDEX_PATH):
         self.db_path = Path(db_path)
+        self._lock = threading.RLock()
+        # Transactions are managed explicitly (BEGIN/COMMIT), hence isolation_level=None
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                                     cached_statements=STATEMENT_CACHE_SIZE)
+        self._conn.row_factory = sqlite3.Row
+        self._writer_queue: "queue.Queue[Optional[Tuple[Callable, asyncio.AbstractEventLoop, asyncio.Future]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
         self._init_database()
+        self.findings = None
+        if findings_index_path and FindingsIndex is not None:
+            Path(findings_index_path).parent.mkdir(parents=True, exist_ok=True)
+            self.findings = FindingsIndex(findings_index_path)
     
     def _init_database(self):
         """Initialize the SQLite database"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Create results table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS results (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    task_id TEXT NOT NULL,
-                    target TEXT NOT NULL,
-                    module_name TEXT NOT NULL,
-                    result TEXT NOT NULL,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # With WAL, NORMAL only syncs at checkpoints and stays consistent after a crash
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
             
-            # Create tasks table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    task_id TEXT UNIQUE NOT NULL,
-                    target TEXT NOT NULL,
-                    modules TEXT NOT NULL,
-                    status TEXT DEFAULT 'pending',
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    completed_at DATETIME
-                )
-            """)
-            
-            conn.commit()
-            logger.info("Database initialized successfully")
+            with self._transaction():
+                # Create results table
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS results (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        task_id TEXT NOT NULL,
+                        target TEXT NOT NULL,
+                        module_name TEXT NOT NULL,
+                        result TEXT NOT NULL,
+                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                # Create tasks table
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS tasks (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        task_id TEXT UNIQUE NOT NULL,
+                        target TEXT NOT NULL,
+                        modules TEXT NOT NULL,
+                        status TEXT DEFAULT 'pending',
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        completed_at DATETIME
+                    )
+                """)
+                
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_task_id ON results(task_id)")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
+        
+        logger.info("Database initialized successfully")
+    
+    @contextmanager
+    def _transaction(self):
+        """Run the enclosed statements in one transaction on the shared connection"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+    
+    def close(self):
+        """Flush pending async writes, stop the writer thread and close the connection"""
+        if self._writer is not None:
+            self._writer_queue.put(None)
+            self._writer.join()
+            self._writer = None
+        with self._lock:
+            self._conn.close()
+        if self.findings is not None:
+            self.findings.close()
+    
+    # Write operations, executed on a given connection inside an open transaction
+    
+    @staticmethod
+    def _insert_results(conn: sqlite3.Connection, task_id: str, target: str, results: Dict[str, Dict[str, Any]]):
+        conn.executemany(INSERT_RESULT_SQL, [
+            (task_id, target, module_name, json.dumps(result, ensure_ascii=False))
+            for module_name, result in results.items()
+        ])
+    
+    @staticmethod
+    def _insert_task(conn: sqlite3.Connection, task_id: str, target: str, modules: List[str]):
+        conn.execute(INSERT_TASK_SQL, (task_id, target, json.dumps(modules, ensure_ascii=False)))
+    
+    @staticmethod
+    def _update_task(conn: sqlite3.Connection, task_id: str, status: str, completed_at: Optional[str]):
+        if completed_at:
+            conn.execute(UPDATE_TASK_COMPLETED_SQL, (status, completed_at, task_id))
+        else:
+            conn.execute(UPDATE_TASK_SQL, (status, task_id))
+    
+    def _index_findings(self, task_id: str, target: str, results: Dict[str, Dict[str, Any]]):
+        """Add the findings of the given module results to the full-text index; failures are only logged"""
+        if self.findings is None:
+            return
+        try:
+            self.findings.add_results(task_id, "framework", target, datetime.now().isoformat(), results)
+        except Exception as e:
+            logger.warning(f"Failed to index findings for task {task_id}: {str(e)}")
     
     def save_result(self, task_id: str, target: str, module_name: str, result: Dict[str, Any]):
         """Save a module result to the database"""
+        self.save_results(task_id, target, {module_name: result})
+    
+    def save_results(self, task_id: str, target: str, results: Dict[str, Dict[str, Any]]):
+        """Save several module results (module name -> result) in a single transaction"""
         try:
-            result_json = json.dumps(result, ensure_ascii=False)
+            with self._transaction() as conn:
+                self._insert_results(conn, task_id, target, results)
+            self._index_findings(task_id, target, results)
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO results (task_id, target, module_name, result)
-                    VALUES (?, ?, ?, ?)
-                """, (task_id, target, module_name, result_json))
-                conn.commit()
-                
-            logger.info(f"Saved result for task {task_id}, module {module_name}")
+            logger.info(f"Saved {len(results)} result(s) for task {task_id}")
         except Exception as e:
-            logger.error(f"Failed to save result: {str(e)}")
+            logger.error(f"Failed to save results: {str(e)}")
             raise
     
     def get_results(self, task_id: str) -> List[Dict[str, Any]]:
         """Retrieve all results for a task"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT * FROM results WHERE task_id = ? ORDER BY timestamp
-                """, (task_id,))
-                
-                rows = cursor.fetchall()
-                results = []
-                for row in rows:
-                    result = dict(row)
-                    result["result"] = json.loads(result["result"])
-                    results.append(result)
-                
-                return results
+            with self._lock:
+                rows = self._conn.execute(SELECT_RESULTS_SQL, (task_id,)).fetchall()
+            
+            results = []
+            for row in rows:
+                result = dict(row)
+                result["result"] = json.loads(result["result"])
+                results.append(result)
+            
+            return results
         except Exception as e:
             logger.error(f"Failed to retrieve results: {str(e)}")
             return []
@@ -94,16 +189,9 @@ class Storage:
     def create_task(self, task_id: str, target: str, modules: List[str]):
         """Create a new task record"""
         try:
-            modules_json = json.dumps(modules, ensure_ascii=False)
+            with self._transaction() as conn:
+                self._insert_task(conn, task_id, target, modules)
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO tasks (task_id, target, modules)
-                    VALUES (?, ?, ?)
-                """, (task_id, target, modules_json))
-                conn.commit()
-                
             logger.info(f"Created task {task_id} for target {target}")
         except Exception as e:
             logger.error(f"Failed to create task: {str(e)}")
@@ -112,20 +200,10 @@ class Storage:
     def update_task_status(self, task_id: str, status: str, completed_at: Optional[str] = None):
         """Update task status"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                if completed_at:
-                    cursor.execute("""
-                        UPDATE tasks SET status = ?, completed_at = ? WHERE task_id = ?
-                    """, (status, completed_at, task_id))
-                else:
-                    cursor.execute("""
-                        UPDATE tasks SET status = ? WHERE task_id = ?
-                    """, (status, task_id))
-                
-                conn.commit()
-                logger.info(f"Updated task {task_id} status to {status}")
+            with self._transaction() as conn:
+                self._update_task(conn, task_id, status, completed_at)
+            
+            logger.info(f"Updated task {task_id} status to {status}")
         except Exception as e:
             logger.error(f"Failed to update task status: {str(e)}")
             raise
@@ -133,23 +211,142 @@ class Storage:
     def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
         """Retrieve a task by ID"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT * FROM tasks WHERE task_id = ?
-                """, (task_id,))
-                
-                row = cursor.fetchone()
-                if row:
-                    task = dict(row)
-                    task["modules"] = json.loads(task["modules"])
-                    return task
-                return None
+            with self._lock:
+                row = self._conn.execute(SELECT_TASK_SQL, (task_id,)).fetchone()
+            
+            if row:
+                task = dict(row)
+                task["modules"] = json.loads(task["modules"])
+                return task
+            return None
         except Exception as e:
             logger.error(f"Failed to retrieve task: {str(e)}")
             return None
     
+    # Async API: writes go through the writer thread
+    
+    def _start_writer(self):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._writer_loop, name="storage-writer", daemon=True)
+                self._writer.start()
+    
+    def _writer_loop(self):
+        """Commit queued writes in batches until close() enqueues None"""
+        while True:
+            job = self._writer_queue.get()
+            batch = []
+            stop = job is None
+            if not stop:
+                batch.append(job)
+            # Group everything already queued into the same transaction
+            while not stop and len(batch) < WRITER_BATCH_SIZE:
+                try:
+                    job = self._writer_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                else:
+                    batch.append(job)
+            
+            if batch:
+                self._run_batch(batch)
+            if stop:
+                return
+    
+    def _run_batch(self, batch: List[Tuple[Callable, asyncio.AbstractEventLoop, asyncio.Future]]):
+        outcomes = []
+        try:
+            with self._transaction() as conn:
+                for operation, _, _ in batch:
+                    # A savepoint per operation keeps one failing write from discarding the others
+                    conn.execute("SAVEPOINT operation")
+                    try:
+                        operation(conn)
+                        conn.execute("RELEASE operation")
+                        outcomes.append(None)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO operation")
+                        conn.execute("RELEASE operation")
+                        outcomes.append(e)
+        except Exception as e:
+            logger.error(f"Failed to commit {len(batch)} queued write(s): {str(e)}")
+            outcomes = [e] * len(batch)
+        
+        for (_, loop, future), error in zip(batch, outcomes):
+            try:
+                loop.call_soon_threadsafe(self._resolve, future, error)
+            except RuntimeError:
+                # The caller's event loop has already been closed
+                pass
+    
+    @staticmethod
+    def _resolve(future: asyncio.Future, error: Optional[Exception]):
+        if future.cancelled():
+            return
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
+    
+    async def _submit(self, operation: Callable[[sqlite3.Connection], None]):
+        """Queue a write for the writer thread and wait until it is committed"""
+        self._start_writer()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._writer_queue.put((operation, loop, future))
+        await future
+    
+    async def save_results_async(self, task_id: str, target: str, results: Dict[str, Dict[str, Any]]):
+        """Async version of save_results; the insert is committed by the writer thread"""
+        try:
+            await self._submit(lambda conn: self._insert_results(conn, task_id, target, results))
+            await asyncio.to_thread(self._index_findings, task_id, target, results)
+            logger.info(f"Saved {len(results)} result(s) for task {task_id}")
+        except Exception as e:
+            logger.error(f"Failed to save results: {str(e)}")
+            raise
+    
+    async def create_task_async(self, task_id: str, target: str, modules: List[str],
+                                status: Optional[str] = None):
+        """Async version of create_task, optionally setting the initial status in the same write"""
+        def operation(conn: sqlite3.Connection):
+            self._insert_task(conn, task_id, target, modules)
+            if status:
+                self._update_task(conn, task_id, status, None)
+        
+        try:
+            await self._submit(operation)
+            logger.info(f"Created task {task_id} for target {target}")
+        except Exception as e:
+            logger.error(f"Failed to create task: {str(e)}")
+            raise
+    
+    async def update_task_status_async(self, task_id: str, status: str, completed_at: Optional[str] = None):
+        """Async version of update_task_status"""
+        try:
+            await self._submit(lambda conn: self._update_task(conn, task_id, status, completed_at))
+            logger.info(f"Updated task {task_id} status to {status}")
+        except Exception as e:
+            logger.error(f"Failed to update task status: {str(e)}")
+            raise
+    
+    async def complete_task_async(self, task_id: str, target: str, results: Dict[str, Dict[str, Any]],
+                                  status: str = "completed"):
+        """Save all module results of a task and mark it finished in one transaction"""
+        def operation(conn: sqlite3.Connection):
+            self._insert_results(conn, task_id, target, results)
+            self._update_task(conn, task_id, status, datetime.now().isoformat())
+        
+        try:
+            await self._submit(operation)
+            await asyncio.to_thread(self._index_findings, task_id, target, results)
+            logger.info(f"Saved {len(results)} result(s) and marked task {task_id} {status}")
+        except Exception as e:
+            logger.error(f"Failed to complete task: {str(e)}")
+            raise
+    
     def export_results(self, task_id: str, filepath: str, format: str = "json"):
         """Export results to a file"""
         results = self.get_results(task_id)
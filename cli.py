@@ -5,6 +5,7 @@ import os
 from typing import List
 from agent import InformationGatheringAgent
 from storage import ResultsStorage
+from result_diff import summarize_diff
 from config import module_config
 import logging
 
@@ -30,7 +31,14 @@ class InformationGatheringCLI:
   python cli.py -t example.com
   python cli.py -t example.com -m whois domain
   python cli.py -t example.com --list-modules
+  python cli.py --targets-file targets.txt -o json
+  python cli.py --targets-file targets.txt -o jsonl
+  python cli.py --targets-file targets.txt --incremental
   python cli.py --list-results
+  python cli.py --list-results -t example.com --since 2024-01-01 --has-open-ports --page 2
+  python cli.py --rebuild-catalog
+  python cli.py --search .git/config --scans
+  python cli.py --search ghp_ --kind credential --since 2024-01-01
             """
         )
         
@@ -39,12 +47,23 @@ class InformationGatheringCLI:
             help="要扫描的目标域名或IP地址"
         )
         
+        parser.add_argument(
+            "--targets-file",
+            help="批量扫描：包含目标列表的文件，每行一个目标，# 开头的行为注释"
+        )
+        
         parser.add_argument(
             "-m", "--modules",
             nargs="+",
             help="要运行的特定模块（默认：所有启用的模块）"
         )
         
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="增量扫描：沿用上一次结果中仍在有效期内的模块，只保存与上一次结果的差异（JSON）"
+        )
+        
         parser.add_argument(
             "--list-modules",
             action="store_true",
@@ -57,6 +76,66 @@ class InformationGatheringCLI:
             help="列出所有保存的扫描结果"
         )
         
+        parser.add_argument(
+            "--since",
+            help="列出结果或查询发现时只显示该日期（YYYY-MM-DD）之后的扫描"
+        )
+        
+        parser.add_argument(
+            "--until",
+            help="列出结果或查询发现时只显示该日期（YYYY-MM-DD）之前的扫描（包含当天）"
+        )
+        
+        parser.add_argument(
+            "--has-open-ports",
+            action="store_true",
+            help="列出结果时只显示发现了开放端口的扫描"
+        )
+        
+        parser.add_argument(
+            "--page",
+            type=int,
+            default=1,
+            help="列出结果或查询发现时显示的页码（默认：1）"
+        )
+        
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=50,
+            help="列出结果或查询发现时每页显示的条数（默认：50）"
+        )
+        
+        parser.add_argument(
+            "--rebuild-catalog",
+            action="store_true",
+            help="重新索引结果目录中已有的结果文件"
+        )
+        
+        parser.add_argument(
+            "--search",
+            metavar="TEXT",
+            help="在所有保存的扫描的发现（子域名、URL、横幅、代码片段、凭证）中查找包含该文本的条目"
+        )
+        
+        parser.add_argument(
+            "--kind",
+            choices=["subdomain", "url", "banner", "snippet", "credential"],
+            help="查询发现时只显示该类型的发现"
+        )
+        
+        parser.add_argument(
+            "--scans",
+            action="store_true",
+            help="查询发现时列出出现过匹配发现的扫描，而不是逐条列出发现"
+        )
+        
+        parser.add_argument(
+            "--rebuild-findings",
+            action="store_true",
+            help="根据已保存的结果文件重新建立发现的全文索引"
+        )
+        
         parser.add_argument(
             "--load-result",
             help="加载并显示保存的结果文件"
@@ -64,9 +143,9 @@ class InformationGatheringCLI:
         
         parser.add_argument(
             "-o", "--output",
-            choices=["json", "text"],
+            choices=["json", "jsonl", "text"],
             default="text",
-            help="结果的输出格式（默认：text）"
+            help="结果的输出格式（默认：text）；jsonl 在每个模块完成后立即写入压缩的 JSON Lines 文件"
         )
         
         parser.add_argument(
@@ -94,23 +173,81 @@ class InformationGatheringCLI:
             status = "已启用" if module_name in module_config.get_enabled_modules() else "已禁用"
             print(f"{module_name:<12} | {status:<10} | {description}")
     
-    def list_results(self):
-        """列出所有保存的扫描结果"""
-        results = self.storage.list_saved_results()
+    def list_results(self, target: str = None, since: str = None, until: str = None,
+                     has_open_ports: bool = False, page: int = 1, page_size: int = 50):
+        """按条件分页列出保存的扫描结果"""
+        filters = {
+            "target": target,
+            "since": since,
+            "until": until,
+            "has_open_ports": True if has_open_ports else None
+        }
+        page = max(page, 1)
+        total = self.storage.count_saved_results(**filters)
+        results = self.storage.list_saved_results(**filters, limit=page_size, offset=(page - 1) * page_size)
         
         if not results:
             print("未找到保存的结果。")
             return
         
-        print("保存的结果:")
-        print("-" * 60)
-        print(f"{'文件名':<30} {'修改时间':<20}")
-        print("-" * 60)
+        print(f"保存的结果（共 {total} 个，第 {page} 页）:")
+        print("-" * 100)
+        print(f"{'文件名':<40} {'目标':<20} {'扫描时间':<20} {'类型':<6} {'子域名':>6} {'端口':>6} {'凭证':>6}")
+        print("-" * 100)
         
         for result in results:
             filename = result["filename"]
-            modified = result["modified"].split("T")[0]  # 仅日期部分
-            print(f"{filename:<30} {modified:<20}")
+            scanned = result["scan_timestamp"][:19].replace("T", " ")
+            print(f"{filename:<40} {result['target'] or '未知':<20} {scanned:<20} {result['type']:<6} "
+                  f"{result['subdomains']:>6} {result['open_ports']:>6} {result['credentials']:>6}")
+    
+    def rebuild_catalog(self):
+        """重新索引结果目录"""
+        print(f"正在重新索引 {self.storage.output_dir} 中的结果文件...")
+        indexed = self.storage.rebuild_catalog()
+        print(f"已索引 {indexed} 个结果文件")
+    
+    def search_findings(self, query: str, kind: str = None, target: str = None, since: str = None,
+                        until: str = None, scans: bool = False, page: int = 1, page_size: int = 50):
+        """在发现索引中查询并分页显示匹配的发现或扫描"""
+        filters = {"kind": kind, "target": target, "since": since, "until": until}
+        page = max(page, 1)
+        offset = (page - 1) * page_size
+        
+        if scans:
+            matches = self.storage.search_scans(query, **filters, limit=page_size, offset=offset)
+            if not matches:
+                print(f"没有扫描包含 \"{query}\"。")
+                return
+            print(f"包含 \"{query}\" 的扫描（第 {page} 页）:")
+            print("-" * 100)
+            print(f"{'扫描':<44} {'来源':<10} {'目标':<20} {'扫描时间':<20} {'匹配':>6}")
+            print("-" * 100)
+            for match in matches:
+                scanned = match["scan_timestamp"][:19].replace("T", " ")
+                print(f"{match['scan_key']:<44} {match['source']:<10} {match['target'] or '未知':<20} "
+                      f"{scanned:<20} {match['matches']:>6}")
+            return
+        
+        total = self.storage.count_findings(query, **filters)
+        findings = self.storage.search_findings(query, **filters, limit=page_size, offset=offset)
+        if not findings:
+            print(f"未找到包含 \"{query}\" 的发现。")
+            return
+        print(f"包含 \"{query}\" 的发现（共 {total} 条，第 {page} 页）:")
+        print("-" * 100)
+        for finding in findings:
+            scanned = finding["scan_timestamp"][:19].replace("T", " ")
+            print(f"[{finding['kind']}] {finding['value']}")
+            if finding["context"]:
+                print(f"    {finding['context'][:200]}")
+            print(f"    {finding['target'] or '未知'} | {scanned} | {finding['scan_key']}")
+    
+    async def rebuild_findings(self):
+        """重新建立发现索引"""
+        print("正在根据已保存的结果文件重新建立发现索引...")
+        indexed = await self.storage.rebuild_findings_index()
+        print(f"已为 {indexed} 个结果文件建立发现索引")
     
     async def load_and_display_result(self, filepath: str):
         """加载并显示保存的结果文件"""
@@ -129,6 +266,12 @@ class InformationGatheringCLI:
             print(f"\n已加载 {target} 的结果（扫描时间 {timestamp}）")
             print("=" * 60)
             
+            if results.get("type") == "delta":
+                print(f"增量结果，基准文件: {results.get('base')}")
+                self._print_diff(results.get("diff", {}))
+                results = await self.storage.resolve_results(filepath)
+                print("-" * 60)
+            
             # 显示摘要
             result_data = results.get("results", {})
             for module_name, module_results in result_data.items():
@@ -140,7 +283,26 @@ class InformationGatheringCLI:
         except Exception as e:
             print(f"加载结果时出错: {str(e)}")
     
-    async def run_scan(self, target: str, modules: List[str] = None, output_format: str = "text"):
+    def _print_diff(self, diff):
+        """显示与上一次结果的差异摘要"""
+        summary = summarize_diff(diff)
+        if not summary:
+            print("与上一次结果相比没有变化")
+            return
+        print("与上一次结果的差异:")
+        for module_name, fields in summary.items():
+            for field, counts in fields.items():
+                changes = ", ".join(f"{change} {count}" for change, count in counts.items())
+                print(f"  {module_name}.{field}: {changes}")
+    
+    async def _load_carried(self, target: str, modules: List[str] = None):
+        """加载目标的上一次结果，返回 (上一次结果, 可以沿用的模块结果)"""
+        previous = await self.storage.load_latest_results(target)
+        fresh = self.agent.fresh_modules(previous, modules)
+        return previous, {name: previous["results"][name] for name in fresh}
+    
+    async def run_scan(self, target: str, modules: List[str] = None, output_format: str = "text",
+                       incremental: bool = False):
         """对目标运行扫描"""
         if not target:
             print("错误: 需要目标。使用 -t/--target 指定目标。")
@@ -148,15 +310,38 @@ class InformationGatheringCLI:
         
         print(f"开始对 {target} 进行信息收集")
         
+        writer = None
         try:
+            on_module_complete = None
+            if output_format == "jsonl" and not incremental:
+                # 每个模块完成后立即写入，不需要在最后序列化整个结果文档
+                writer = self.storage.open_result_stream(target)
+                
+                async def on_module_complete(_target, module_name, module_results):
+                    await writer.write_module(module_name, module_results)
+            
+            previous, carried = None, {}
+            if incremental:
+                previous, carried = await self._load_carried(target, modules)
+                if carried:
+                    print(f"沿用上一次结果中仍然有效的模块: {', '.join(carried)}")
+            
             # 运行扫描
             if modules:
-                results = await self.agent.run_specific_modules(target, modules)
+                results = await self.agent.run_specific_modules(target, modules, carried, on_module_complete)
             else:
-                results = await self.agent.run_scan(target)
+                results = await self.agent.run_scan(target, carried, on_module_complete)
             
             # 保存结果
-            if output_format == "json":
+            if incremental:
+                filepath, diff = await self.storage.save_incremental_results(target, results, previous, list(carried))
+                print(f"结果已保存到: {filepath}")
+                if previous is not None:
+                    self._print_diff(diff)
+            elif writer is not None:
+                filepath = await self.storage.close_result_stream(writer)
+                print(f"结果已保存到: {filepath}")
+            elif output_format == "json":
                 filepath = await self.storage.save_results(target, results)
                 print(f"结果已保存到: {filepath}")
             else:
@@ -177,6 +362,86 @@ class InformationGatheringCLI:
         except Exception as e:
             print(f"扫描过程中出错: {str(e)}")
             logger.error(f"扫描 {target} 时出错: {str(e)}")
+            if writer is not None:
+                await writer.close()
+    
+    def _read_targets(self, filepath: str):
+        """逐行读取目标文件，忽略空行和注释"""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield line
+    
+    async def run_batch_scan(self, targets_file: str, modules: List[str] = None, output_format: str = "text",
+                             incremental: bool = False):
+        """对目标文件中的所有目标运行批量扫描"""
+        if not os.path.exists(targets_file):
+            print(f"错误: 未找到目标文件: {targets_file}")
+            return
+        
+        print(f"开始批量扫描 {targets_file} 中的目标")
+        completed = 0
+        failed = 0
+        unchanged = 0
+        # 增量扫描时每个目标的 (上一次结果, 沿用的模块)，保存后移除
+        previous_scans = {}
+        # jsonl 输出时每个目标的流式写入器，目标完成后关闭
+        writers = {}
+        streaming = output_format == "jsonl" and not incremental
+        
+        async def stream_module(target: str, module_name: str, module_results):
+            if target not in writers:
+                writers[target] = self.storage.open_result_stream(target)
+            await writers[target].write_module(module_name, module_results)
+        
+        async def load_carried(target: str):
+            previous, carried = await self._load_carried(target, modules)
+            previous_scans[target] = (previous, list(carried))
+            return carried
+        
+        async def save_target(target: str, results):
+            nonlocal completed, failed, unchanged
+            if incremental:
+                previous, skipped = previous_scans.pop(target, (None, []))
+                filepath, diff = await self.storage.save_incremental_results(target, results, previous, skipped)
+                if previous is not None and not diff:
+                    unchanged += 1
+            elif streaming:
+                writer = writers.pop(target, None) or self.storage.open_result_stream(target)
+                filepath = await self.storage.close_result_stream(writer)
+            elif output_format == "json":
+                filepath = await self.storage.save_results(target, results)
+            else:
+                filepath = await self.storage.save_results_as_text(target, results)
+            
+            errors = [name for name, result in results.items() if "error" in result]
+            completed += 1
+            if errors:
+                failed += 1
+                print(f"[{completed}] {target}: 模块出错 {', '.join(errors)} -> {filepath}")
+            else:
+                print(f"[{completed}] {target}: 成功完成 -> {filepath}")
+        
+        try:
+            await self.agent.run_batch(
+                self._read_targets(targets_file),
+                module_names=modules,
+                on_target_complete=save_target,
+                carried_results=load_carried if incremental else None,
+                on_module_complete=stream_module if streaming else None
+            )
+        except Exception as e:
+            print(f"批量扫描过程中出错: {str(e)}")
+            logger.error(f"批量扫描 {targets_file} 时出错: {str(e)}")
+        finally:
+            # 中途出错时关闭尚未完成的目标的文件
+            for writer in writers.values():
+                await writer.close()
+        
+        print(f"\n批量扫描完成: {completed} 个目标，其中 {failed} 个存在模块错误")
+        if incremental:
+            print(f"与上一次结果相比没有变化的目标: {unchanged} 个")
     
     async def run(self):
         """运行CLI应用程序"""
@@ -191,16 +456,33 @@ class InformationGatheringCLI:
             self.list_modules()
             return
         
+        if args.rebuild_catalog:
+            self.rebuild_catalog()
+            return
+        
+        if args.rebuild_findings:
+            await self.rebuild_findings()
+            return
+        
+        if args.search:
+            self.search_findings(args.search, args.kind, args.target, args.since, args.until, args.scans,
+                                 args.page, args.page_size)
+            return
+        
         if args.list_results:
-            self.list_results()
+            self.list_results(args.target, args.since, args.until, args.has_open_ports, args.page, args.page_size)
             return
         
         if args.load_result:
             await self.load_and_display_result(args.load_result)
             return
         
-        # 运行扫描
-        await self.run_scan(args.target, args.modules, args.output)
+        # 运行扫描，结束后关闭代理的共享连接池
+        async with self.agent:
+            if args.targets_file:
+                await self.run_batch_scan(args.targets_file, args.modules, args.output, args.incremental)
+            else:
+                await self.run_scan(args.target, args.modules, args.output, args.incremental)
 
 
 def main():
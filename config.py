@@ -8,6 +8,86 @@ class Settings(BaseSettings):
     # HTTP设置
     timeout: int = 30
     max_concurrent_requests: int = 10
+    # 连接池设置
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    max_connections_per_host: int = 10
+    
+    # 限速设置（modules.yaml 的 rate_limits 可按主机和来源覆盖）
+    host_rate_limit: float = 20.0
+    host_rate_burst: float = 40.0
+    rate_limit_min_rate: float = 0.2
+    rate_limit_backoff: float = 1.0
+    rate_limit_max_backoff: float = 300.0
+    
+    # 重试和熔断设置
+    retry_attempts: int = 3
+    retry_backoff_base: float = 0.5
+    retry_backoff_max: float = 10.0
+    circuit_breaker_threshold: int = 5
+    circuit_breaker_reset: float = 30.0
+    
+    # HTTP响应缓存设置（modules.yaml 的 http_cache 可按来源设置TTL）
+    http_cache_enabled: bool = False
+    http_cache_path: str = "cache/http_cache.db"
+    http_cache_ttl: float = 3600.0
+    http_cache_max_bytes: int = 512 * 1024 * 1024
+    http_cache_max_age: float = 7 * 24 * 3600.0
+    
+    # 模块任务设置
+    task_timeout: float = 60.0
+    task_deadline: float = 300.0
+    max_concurrent_tasks: int = 50
+    
+    # 批量扫描设置
+    batch_max_concurrency: int = 20
+    batch_per_target_concurrency: int = 2
+    
+    # 端口扫描设置
+    port_scan_timeout: float = 3.0
+    port_scan_min_timeout: float = 0.3
+    port_scan_max_sockets: int = 1000
+    port_scan_per_host_concurrency: int = 100
+    port_scan_max_hosts: int = 32
+    port_scan_dead_host_threshold: int = 20
+    port_scan_banner_timeout: float = 1.0
+    
+    # DNS解析设置（dns_nameservers 为空时读取系统配置）
+    dns_nameservers: List[str] = []
+    dns_timeout: float = 2.0
+    dns_retries: int = 2
+    dns_cache_size: int = 100000
+    dns_negative_ttl: int = 60
+    dns_max_ttl: int = 86400
+    dns_max_inflight: int = 500
+    
+    # WHOIS查询设置（未配置 rate_limits.sources.whois 时每个服务器按 whois_rate_limit 限速）
+    whois_timeout: float = 10.0
+    whois_max_referrals: int = 2
+    whois_rate_limit: float = 1.0
+    whois_rate_burst: int = 2
+    whois_max_connections_per_server: int = 2
+    whois_cache_size: int = 10000
+    whois_cache_ttl: int = 86400
+    whois_negative_ttl: int = 3600
+    whois_max_bytes: int = 262144
+    
+    # 子域名爆破设置
+    subdomain_bruteforce_qps: float = 5000.0
+    subdomain_bruteforce_concurrency: int = 1000
+    subdomain_wildcard_probes: int = 3
+    
+    # 敏感路径探测设置（GET 使用 Range 只读取前 path_probe_sample_bytes 字节，HEAD 不读取正文）
+    path_probe_method: str = "GET"
+    path_probe_sample_bytes: int = 4096
+    path_probe_concurrency: int = 50
+    path_probe_baseline_probes: int = 2
+    path_probe_simhash_distance: int = 6
+    
+    # 密钥检测设置（每个文档最多扫描的字节数，以及从首页提取并扫描的脚本数）
+    secret_scan_max_bytes: int = 8 * 1024 * 1024
+    secret_scan_max_scripts: int = 20
     user_agents: List[str] = [
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
         "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
@@ -16,8 +96,18 @@ class Settings(BaseSettings):
     
     # 输出设置
     output_dir: str = "results"
+    # 结果索引数据库，默认为 output_dir 下的 catalog.db
+    results_catalog_path: Optional[str] = None
+    # 发现全文索引数据库，默认为 output_dir 下的 findings.db（ai_agent_framework 也写入该文件）
+    findings_index_path: Optional[str] = None
+    # 流式结果（-o jsonl）的压缩方式: zstd（未安装 zstandard 时退回 gzip）、gzip 或 none
+    result_compression: str = "zstd"
     log_level: str = "INFO"
     
+    # 增量扫描设置（模块结果的默认有效期，以及写入完整结果之前最多连续保存的增量数）
+    incremental_default_ttl: float = 86400.0
+    incremental_max_chain: int = 30
+    
     # API密钥（如果需要）
     github_token: Optional[str] = None
     fofa_email: Optional[str] = None
@@ -35,11 +125,7 @@ class ModuleConfig:
     def _load_modules(self) -> Dict:
         default_config = {
             "whois": {
-                "enabled": True,
-                "sources": [
-                    "https://whois.chinaz.com",
-                    "https://bgp.he.net"
-                ]
+                "enabled": True
             },
             "domain": {
                 "enabled": True,
@@ -75,6 +161,35 @@ class ModuleConfig:
                 "sources": [
                     "https://github.com/search?type=code&q={}"
                 ]
+            },
+            "rate_limits": {
+                "default": {"rate": 20, "burst": 40},
+                "hosts": {},
+                "sources": {
+                    "github": {
+                        "rate": 0.5,
+                        "burst": 5,
+                        "hosts": ["github.com", "api.github.com"]
+                    },
+                    "whois": {
+                        "rate": 1,
+                        "burst": 2
+                    }
+                }
+            },
+            "http_cache": {
+                "sources": {
+                    "github": {"ttl": 600}
+                }
+            },
+            "incremental": {
+                "ttls": {
+                    "whois": 604800,
+                    "domain": 86400,
+                    "port": 43200,
+                    "sensitive": 86400,
+                    "github": 43200
+                }
             }
         }
         
@@ -92,6 +207,15 @@ class ModuleConfig:
     
     def get_module_config(self, module_name: str) -> Dict:
         return self.modules.get(module_name, {})
+    
+    def get_rate_limits(self) -> Dict:
+        return self.modules.get("rate_limits") or {}
+    
+    def get_http_cache_config(self) -> Dict:
+        return self.modules.get("http_cache") or {}
+    
+    def get_incremental_config(self) -> Dict:
+        return self.modules.get("incremental") or {}
 
 
 settings = Settings()
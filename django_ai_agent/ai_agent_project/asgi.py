@@ -3,6 +3,10 @@ ASGI config for ai_agent_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project with an ASGI server (e.g. ``uvicorn ai_agent_project.asgi:application``)
+so that the scan progress stream (``api/scan/<id>/events/``) does not hold a worker thread
+per connected client.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
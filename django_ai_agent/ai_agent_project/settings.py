@@ -128,3 +128,36 @@ STATICFILES_DIRS = [
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Background scan jobs (run the workers with `python manage.py run_scan_workers`)
+SCAN_WORKER_CONCURRENCY = 4
+# Seconds an idle worker waits before checking the queue again
+SCAN_JOB_POLL_INTERVAL = 1.0
+# Seconds between heartbeats (and cancellation checks) of a running job
+SCAN_JOB_HEARTBEAT_INTERVAL = 5
+# A running job without a heartbeat for this many seconds is requeued
+SCAN_JOB_STALE_AFTER = 60
+# Attempts before a job whose worker keeps disappearing is marked failed
+SCAN_JOB_MAX_ATTEMPTS = 3
+
+# Scan progress events (streamed by api/scan/<id>/events/)
+# Events a worker buffers per job; modules wait for the database when the buffer is full
+SCAN_EVENT_QUEUE_SIZE = 1000
+# Events written per INSERT by a worker, and sent per database read by the stream
+SCAN_EVENT_BATCH_SIZE = 200
+# Seconds the stream waits before checking for new events
+SCAN_EVENT_POLL_INTERVAL = 0.5
+# Seconds of silence after which the stream sends a keep-alive comment
+SCAN_EVENT_KEEPALIVE = 15
+
+# Worker processes that render Word reports and precompress report files in the background
+# (reports_app.utils.submit_*)
+REPORT_RENDER_WORKERS = 2
+
+# keywords_app API
+# Records per page of the searches and person-info lists, and the most a client may request with ?page_size=
+KEYWORDS_API_PAGE_SIZE = 100
+KEYWORDS_API_MAX_PAGE_SIZE = 1000
+# Profiles accepted by one person-info/bulk/ request, and rows written per INSERT
+PERSON_INFO_BULK_MAX_ITEMS = 10000
+PERSON_INFO_BULK_BATCH_SIZE = 1000
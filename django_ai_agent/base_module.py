@@ -1,19 +1,53 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Awaitable, Callable, Iterator
+from config import settings
 from http_client import AsyncHTTPClient
+from contextvars import ContextVar
+from contextlib import contextmanager
 import logging
 import asyncio
 
 logger = logging.getLogger(__name__)
 
+# 当前执行上下文中接收模块事件的协程函数，由代理在运行模块时设置
+_event_handler: ContextVar[Optional[Callable[[Dict[str, Any]], Awaitable[None]]]] = \
+    ContextVar("module_event_handler", default=None)
+
+
+@contextmanager
+def module_events(handler: Optional[Callable[[Dict[str, Any]], Awaitable[None]]]) -> Iterator[None]:
+    """
+    在当前执行上下文中把模块上报的事件交给 handler，退出时恢复原来的处理函数
+    
+    参数:
+        handler: 接收事件字典的协程函数，None表示丢弃事件
+    """
+    token = _event_handler.set(handler)
+    try:
+        yield
+    finally:
+        _event_handler.reset(token)
+
 
 class BaseModule(ABC):
     """所有信息收集模块的基类"""
     
-    def __init__(self, name: str):
+    def __init__(self, name: str, http_client: Optional[AsyncHTTPClient] = None):
         self.name = name
-        self.http_client = AsyncHTTPClient()
-        self.results = {}
+        # 由代理传入共享的HTTP客户端，以便所有模块复用同一个连接池
+        self.http_client = http_client or AsyncHTTPClient()
+        # 结果保存在上下文变量中，同一模块实例被多个目标并发执行时互不干扰
+        self._results_var: ContextVar[Dict[str, Any]] = ContextVar(f"{name}_results_{id(self)}")
+    
+    @property
+    def results(self) -> Dict[str, Any]:
+        """当前执行上下文（asyncio任务）中的结果字典"""
+        try:
+            return self._results_var.get()
+        except LookupError:
+            results = {}
+            self._results_var.set(results)
+            return results
     
     @abstractmethod
     async def execute(self, target: str) -> Dict[str, Any]:
@@ -28,26 +62,80 @@ class BaseModule(ABC):
         """
         pass
     
-    async def run_tasks(self, tasks: List[asyncio.Task]) -> List[Any]:
+    async def run_tasks(self, tasks: List[Awaitable], timeout: Optional[float] = None,
+                        deadline: Optional[float] = None,
+                        max_concurrency: Optional[int] = None) -> List[Any]:
         """
-        并发运行多个异步任务
+        并发运行多个异步任务，结果顺序与输入顺序一致
         
         参数:
-            tasks: 要运行的异步任务列表
+            tasks: 要运行的协程或任务列表
+            timeout: 单个任务的超时时间（秒），默认为 settings.task_timeout
+            deadline: 全部任务的总截止时间（秒），默认为 settings.task_deadline
+            max_concurrency: 同时运行的任务数上限，默认为 settings.max_concurrent_tasks
             
         返回:
-            来自任务的结果列表
+            与 tasks 一一对应的结果列表；出错、超时或超过总截止时间的任务对应 None
         """
-        results = []
-        for task in asyncio.as_completed(tasks):
+        timeout = timeout if timeout is not None else settings.task_timeout
+        deadline = deadline if deadline is not None else settings.task_deadline
+        semaphore = asyncio.Semaphore(max_concurrency or settings.max_concurrent_tasks)
+        results: List[Any] = [None] * len(tasks)
+        
+        async def run_one(index: int, task: Awaitable):
+            started = False
             try:
-                result = await task
-                results.append(result)
+                async with semaphore:
+                    started = True
+                    if timeout:
+                        results[index] = await asyncio.wait_for(task, timeout)
+                    else:
+                        results[index] = await task
+            except asyncio.TimeoutError:
+                logger.warning(f"任务 {index} 超过 {timeout} 秒未完成，已取消")
             except Exception as e:
                 logger.error(f"任务中出现错误: {str(e)}")
-                results.append(None)
+            finally:
+                # 未开始就被取消的协程需要显式关闭，避免 "never awaited" 警告
+                if not started and asyncio.iscoroutine(task):
+                    task.close()
+        
+        runners = [asyncio.create_task(run_one(i, task)) for i, task in enumerate(tasks)]
+        if not runners:
+            return results
+        
+        try:
+            _, pending = await asyncio.wait(runners, timeout=deadline or None)
+        finally:
+            pending = [runner for runner in runners if not runner.done()]
+            for runner in pending:
+                runner.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        if pending:
+            logger.warning(f"{self.name} 模块的 {len(pending)}/{len(runners)} 个任务超过总截止时间 {deadline} 秒，返回部分结果")
         return results
     
+    async def emit_finding(self, field: str, value: Any):
+        """
+        上报一个刚发现的结果，调用者不必等模块完成就能看到它
+        
+        没有设置事件处理函数时什么也不做。处理函数可能因为下游来不及处理而等待，
+        发现结果的协程也随之放慢，因此模块应在发现结果的地方直接 await 本方法。
+        
+        参数:
+            field: 结果最终所在的字段（如 open_ports），与 store_result 的键一致
+            value: 发现的条目
+        """
+        handler = _event_handler.get()
+        if handler is None:
+            return
+        try:
+            await handler({"type": "finding", "field": field, "value": value})
+        except Exception as e:
+            logger.error(f"上报 {self.name} 模块的发现时出错: {str(e)}")
+    
     def store_result(self, key: str, value: Any):
         """
         在模块的结果字典中存储结果
@@ -69,4 +157,5 @@ class BaseModule(ABC):
     
     def clear_results(self):
         """清除所有存储的结果"""
-        self.results.clear()
+        # 换成新的字典而不是原地清空，已返回给调用者的结果不会被下一次执行清掉
+        self._results_var.set({})
@@ -1,3 +1,8 @@
 from django.contrib import admin
+from .models import ScanJob
 
-# Register your models here.
+@admin.register(ScanJob)
+class ScanJobAdmin(admin.ModelAdmin):
+    list_display = ('target', 'status', 'modules_done', 'modules_total', 'attempts', 'worker_id', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('target',)
@@ -0,0 +1,300 @@
+"""
+Background scan worker pool for ScanJob
+
+The pool runs in its own process (`python manage.py run_scan_workers`), separate from the
+web workers: api_scan only inserts a queued ScanJob and returns. Each of the pool's asyncio
+workers claims the oldest queued job with a conditional UPDATE, so several pool processes can
+share one queue, and runs it with a shared InformationGatheringAgent. Running jobs refresh
+their heartbeat periodically; jobs whose heartbeat stops (the process running them crashed or
+was killed) are put back in the queue by any live pool, up to SCAN_JOB_MAX_ATTEMPTS attempts.
+
+While a job runs, its status changes, module starts and completions and the findings reported by
+the modules are stored as ScanEvents for the api_scan_events stream.
+"""
+import asyncio
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ScanJob, ScanEvent
+
+logger = logging.getLogger(__name__)
+
+
+class ScanEventWriter:
+    """
+    Stores the progress events of one job in batches
+
+    Events wait in a bounded queue and a background task inserts them with bulk_create.
+    When the database falls behind and the queue is full, put() waits, which slows down
+    the module reporting the events instead of buffering without limit.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.batch_size = settings.SCAN_EVENT_BATCH_SIZE
+        self._queue = asyncio.Queue(maxsize=settings.SCAN_EVENT_QUEUE_SIZE)
+        self._task = asyncio.create_task(self._drain())
+        self._closed = False
+
+    async def put(self, event, module='', data=None):
+        await self._queue.put(ScanEvent(job_id=self.job.pk, event=event, module=module, data=data or {}))
+
+    async def close(self):
+        """Store the queued events and stop the background task"""
+        if self._closed:
+            return
+        self._closed = True
+        await self._queue.put(None)
+        await self._task
+
+    async def _drain(self):
+        done = False
+        while not done:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if batch[-1] is None:
+                batch.pop()
+                done = True
+            if not batch:
+                continue
+            try:
+                await ScanEvent.objects.abulk_create(batch)
+            except Exception as e:
+                logger.error(f"Failed to store {len(batch)} event(s) of scan job {self.job.pk}: {str(e)}")
+
+
+class ScanWorkerPool:
+    """Bounded pool of asyncio workers that run queued ScanJobs"""
+
+    def __init__(self, concurrency=None):
+        self.concurrency = concurrency or settings.SCAN_WORKER_CONCURRENCY
+        self.poll_interval = settings.SCAN_JOB_POLL_INTERVAL
+        self.heartbeat_interval = settings.SCAN_JOB_HEARTBEAT_INTERVAL
+        self.stale_after = settings.SCAN_JOB_STALE_AFTER
+        self.max_attempts = settings.SCAN_JOB_MAX_ATTEMPTS
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = asyncio.Event()
+        self._agent = None
+        self._storage = None
+
+    def stop(self):
+        """Stop claiming new jobs; running jobs are interrupted and requeued"""
+        self._stopping.set()
+
+    async def run(self):
+        """Run the workers and the stale job reaper until stop() is called"""
+        # Imported here so that the web process never loads the agent and its modules
+        from agent import InformationGatheringAgent
+        from storage import ResultsStorage
+
+        self._storage = ResultsStorage()
+        async with InformationGatheringAgent() as agent:
+            self._agent = agent
+            logger.info(f"Scan worker pool {self.worker_id} started with {self.concurrency} worker(s)")
+            reaper = asyncio.create_task(self._reaper())
+            workers = [asyncio.create_task(self._worker(index)) for index in range(self.concurrency)]
+            try:
+                # Workers return once stop() is called, after handing their running jobs back
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers + [reaper]:
+                    task.cancel()
+                await asyncio.gather(*workers, reaper, return_exceptions=True)
+        logger.info(f"Scan worker pool {self.worker_id} stopped")
+
+    async def _sleep(self, seconds):
+        """Sleep, returning early when the pool is stopping"""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _claim(self):
+        """Claim the oldest queued job, or return None when the queue is empty"""
+        while True:
+            job = await ScanJob.objects.filter(status=ScanJob.STATUS_QUEUED).order_by('created_at').afirst()
+            if job is None:
+                return None
+            now = timezone.now()
+            # Another worker may have claimed the same job in the meantime
+            claimed = await ScanJob.objects.filter(pk=job.pk, status=ScanJob.STATUS_QUEUED).aupdate(
+                status=ScanJob.STATUS_RUNNING,
+                worker_id=self.worker_id,
+                attempts=F('attempts') + 1,
+                modules_done=0,
+                started_at=now,
+                heartbeat_at=now,
+            )
+            if claimed:
+                return await ScanJob.objects.aget(pk=job.pk)
+
+    async def _worker(self, index):
+        while not self._stopping.is_set():
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Worker {index} failed to claim a job: {str(e)}")
+                job = None
+            if job is None:
+                await self._sleep(self.poll_interval)
+                continue
+            try:
+                await self._run_job(job)
+            except Exception as e:
+                logger.error(f"Scan job {job.pk} failed: {str(e)}")
+                await self._finish(job, ScanJob.STATUS_FAILED, error_message=str(e))
+
+    async def _run_job(self, job):
+        """Run a claimed job, keeping its heartbeat fresh and watching for cancellation"""
+        module_names = [name for name in (job.modules or self._agent.modules) if name in self._agent.modules]
+        await ScanJob.objects.filter(pk=job.pk).aupdate(modules_total=len(module_names))
+        logger.info(f"Running scan job {job.pk} for {job.target} (attempt {job.attempts})")
+
+        events = ScanEventWriter(job)
+        try:
+            await events.put(ScanEvent.EVENT_STATUS, data={
+                'status': ScanJob.STATUS_RUNNING,
+                'attempt': job.attempts,
+                'modules': module_names,
+            })
+            await self._run_scan(job, module_names, events)
+        finally:
+            await events.close()
+
+    async def _run_scan(self, job, module_names, events):
+        writer = self._storage.open_result_stream(job.target)
+
+        async def on_module_complete(target, module_name, module_results):
+            await writer.write_module(module_name, module_results)
+            await ScanJob.objects.filter(pk=job.pk).aupdate(modules_done=F('modules_done') + 1,
+                                                           heartbeat_at=timezone.now())
+
+        async def on_event(target, module_name, event):
+            event = dict(event)
+            await events.put(event.pop('type'), module_name, event)
+
+        scan = asyncio.create_task(self._agent.run_batch(
+            [job.target],
+            module_names=module_names,
+            max_concurrency=max(len(module_names), 1),
+            per_target_concurrency=max(len(module_names), 1),
+            on_module_complete=on_module_complete,
+            on_event=on_event,
+        ))
+        reason = await self._watch(job, scan)
+
+        if reason is None:
+            try:
+                results = scan.result()
+                result_path = await self._storage.close_result_stream(writer)
+            except Exception as e:
+                await writer.close()
+                logger.error(f"Scan job {job.pk} failed: {str(e)}")
+                await self._finish(job, ScanJob.STATUS_FAILED, error_message=str(e), events=events)
+                return
+            errors = [name for name, result in results.get(job.target, {}).items() if 'error' in result]
+            await self._finish(job, ScanJob.STATUS_COMPLETED, result_path=result_path,
+                               error_message=f"Modules failed: {', '.join(errors)}" if errors else None,
+                               events=events)
+            logger.info(f"Scan job {job.pk} completed: {result_path}")
+            return
+
+        # Partial results of an interrupted scan are discarded
+        await writer.close()
+        if os.path.exists(writer.filepath):
+            os.remove(writer.filepath)
+        if reason == 'cancelled':
+            await self._finish(job, ScanJob.STATUS_CANCELLED, events=events)
+            logger.info(f"Scan job {job.pk} cancelled")
+        elif reason == 'stopping':
+            # Shutting down: hand the job back to the queue for another worker
+            await events.put(ScanEvent.EVENT_STATUS, data={'status': ScanJob.STATUS_QUEUED})
+            await events.close()
+            await ScanJob.objects.filter(pk=job.pk, worker_id=self.worker_id).aupdate(
+                status=ScanJob.STATUS_QUEUED, worker_id='', heartbeat_at=None, attempts=F('attempts') - 1
+            )
+            logger.info(f"Scan job {job.pk} returned to the queue")
+        else:
+            logger.warning(f"Scan job {job.pk} was taken over by another worker, stopped locally")
+
+    async def _watch(self, job, scan):
+        """
+        Wait for the scan task, refreshing the heartbeat
+
+        Returns None when the scan finished, otherwise the reason it was interrupted:
+        'cancelled', 'stopping' or 'lost' (the job was requeued by a reaper).
+        """
+        stopping = asyncio.create_task(self._stopping.wait())
+        try:
+            while True:
+                done, _ = await asyncio.wait({scan, stopping}, timeout=self.heartbeat_interval,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if scan in done:
+                    return None
+                reason = 'stopping' if stopping in done else await self._heartbeat(job)
+                if reason is not None:
+                    scan.cancel()
+                    await asyncio.gather(scan, return_exceptions=True)
+                    return reason
+        finally:
+            stopping.cancel()
+
+    async def _heartbeat(self, job):
+        alive = await ScanJob.objects.filter(
+            pk=job.pk, status=ScanJob.STATUS_RUNNING, worker_id=self.worker_id
+        ).aupdate(heartbeat_at=timezone.now())
+        if not alive:
+            return 'lost'
+        if await ScanJob.objects.filter(pk=job.pk, cancel_requested=True).aexists():
+            return 'cancelled'
+        return None
+
+    async def _finish(self, job, status, result_path='', error_message=None, events=None):
+        if events is not None:
+            # The stream ends once the job is finished, so its last events are stored first
+            await events.put(ScanEvent.EVENT_STATUS, data={'status': status, 'error_message': error_message})
+            await events.close()
+        await ScanJob.objects.filter(pk=job.pk, worker_id=self.worker_id).aupdate(
+            status=status,
+            result_path=result_path,
+            error_message=error_message,
+            finished_at=timezone.now(),
+            heartbeat_at=None,
+        )
+
+    async def _reaper(self):
+        """Requeue running jobs whose worker stopped sending heartbeats"""
+        while not self._stopping.is_set():
+            try:
+                await self.requeue_stale_jobs()
+            except Exception as e:
+                logger.error(f"Failed to requeue stale scan jobs: {str(e)}")
+            await self._sleep(self.heartbeat_interval)
+
+    async def requeue_stale_jobs(self):
+        """
+        Put jobs of crashed workers back in the queue, or fail them after too many attempts
+
+        Returns the number of requeued jobs.
+        """
+        cutoff = timezone.now() - timedelta(seconds=self.stale_after)
+        stale = ScanJob.objects.filter(status=ScanJob.STATUS_RUNNING, heartbeat_at__lt=cutoff)
+        failed = await stale.filter(attempts__gte=self.max_attempts).aupdate(
+            status=ScanJob.STATUS_FAILED,
+            error_message='Worker stopped responding too many times',
+            finished_at=timezone.now(),
+            heartbeat_at=None,
+        )
+        requeued = await stale.filter(attempts__lt=self.max_attempts).aupdate(
+            status=ScanJob.STATUS_QUEUED, worker_id='', heartbeat_at=None
+        )
+        if failed or requeued:
+            logger.warning(f"Requeued {requeued} and failed {failed} scan job(s) of unresponsive workers")
+        return requeued
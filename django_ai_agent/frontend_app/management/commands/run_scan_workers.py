@@ -0,0 +1,38 @@
+import asyncio
+import signal
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from frontend_app.jobs import ScanWorkerPool
+
+class Command(BaseCommand):
+    help = 'Run the background worker pool that executes scans queued through the web API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.SCAN_WORKER_CONCURRENCY,
+            help='Number of scan jobs run at the same time'
+        )
+
+    def handle(self, *args, **options):
+        pool = ScanWorkerPool(options['concurrency'])
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(sig, pool.stop)
+                except NotImplementedError:
+                    # Not supported on Windows, Ctrl+C still interrupts the process
+                    pass
+            await pool.run()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Starting scan worker pool with {pool.concurrency} worker(s)')
+        )
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('Scan worker pool stopped'))
@@ -1,3 +1,112 @@
+import json
 from django.db import models
 
-# Create your models here.
+class ScanJob(models.Model):
+    """
+    Model to store a background scan requested through the web API
+
+    Jobs are created by api_scan and picked up by the worker pool started with
+    `python manage.py run_scan_workers`, which runs them with InformationGatheringAgent.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_CANCELLED, 'Cancelled'),
+    ]
+
+    FINISHED_STATUSES = (STATUS_COMPLETED, STATUS_FAILED, STATUS_CANCELLED)
+
+    target = models.CharField(max_length=255)
+    modules = models.JSONField(default=list, blank=True, help_text="Requested modules, empty for all enabled modules")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    modules_total = models.IntegerField(default=0)
+    modules_done = models.IntegerField(default=0)
+    cancel_requested = models.BooleanField(default=False)
+    attempts = models.IntegerField(default=0)
+    worker_id = models.CharField(max_length=100, blank=True, default='')
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    result_path = models.CharField(max_length=500, blank=True, default='')
+    error_message = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Workers claim the oldest queued job and look for stale running jobs
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'heartbeat_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.target} ({self.status})"
+
+    @property
+    def progress(self):
+        """Fraction of the job's modules that have finished, between 0 and 1"""
+        if self.status == self.STATUS_COMPLETED:
+            return 1.0
+        if not self.modules_total:
+            return 0.0
+        return min(self.modules_done / self.modules_total, 1.0)
+
+    def to_dict(self):
+        """Serialize the job for the status API"""
+        return {
+            'scan_id': self.pk,
+            'target': self.target,
+            'modules': self.modules,
+            'status': self.status,
+            'progress': round(self.progress, 3),
+            'modules_done': self.modules_done,
+            'modules_total': self.modules_total,
+            'cancel_requested': self.cancel_requested,
+            'attempts': self.attempts,
+            'result_path': self.result_path,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+class ScanEvent(models.Model):
+    """
+    Progress event of a scan job, written by the worker pool and streamed by api_scan_events
+
+    The primary key is the server-sent event id: a client reconnecting with Last-Event-ID
+    resumes right after the last event it received.
+    """
+    EVENT_STATUS = 'status'
+    EVENT_MODULE_STARTED = 'module_started'
+    EVENT_FINDING = 'finding'
+    EVENT_MODULE_COMPLETED = 'module_completed'
+
+    job = models.ForeignKey(ScanJob, on_delete=models.CASCADE, related_name='events')
+    event = models.CharField(max_length=30)
+    module = models.CharField(max_length=50, blank=True, default='')
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # The stream reads the events of one job after a given id
+            models.Index(fields=['job', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id} {self.event} {self.module}"
+
+    def to_sse(self):
+        """Format the event as a server-sent event message"""
+        data = json.dumps({'module': self.module, **self.data}, ensure_ascii=False)
+        return f"id: {self.pk}\nevent: {self.event}\ndata: {data}\n\n"
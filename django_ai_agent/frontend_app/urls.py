@@ -9,5 +9,9 @@ urlpatterns = [
     path('reports/', views.reports, name='reports'),
     path('config/', views.config, name='config'),
     path('api/scan/', views.api_scan, name='api_scan'),
+    path('api/scan/<int:scan_id>/', views.api_scan_status, name='api_scan_status'),
+    path('api/scan/<int:scan_id>/cancel/', views.api_scan_cancel, name='api_scan_cancel'),
+    path('api/scan/<int:scan_id>/results/', views.api_scan_results, name='api_scan_results'),
+    path('api/scan/<int:scan_id>/events/', views.api_scan_events, name='api_scan_events'),
     path('health/', views.health_check, name='health_check'),
 ]
@@ -1,7 +1,13 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.conf import settings
+from django.utils import timezone
+import asyncio
 import json
+import os
+import time
+from .models import ScanJob, ScanEvent
 
 def index(request):
     """
@@ -48,18 +54,24 @@ def api_scan(request):
         try:
             # Parse the JSON data
             data = json.loads(request.body)
-            target = data.get('target', '')
+            target = data.get('target', '').strip()
             modules = data.get('modules', [])
             
-            # In a real implementation, you would call the actual scanning modules
-            # For now, we'll simulate a response
+            if not target:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Target is required'
+                }, status=400)
+            
+            # Queue the scan; the run_scan_workers process picks it up
+            job = ScanJob.objects.create(target=target, modules=modules)
             response_data = {
                 'status': 'success',
-                'message': f'Scan started on {target} with modules: {", ".join(modules)}',
-                'scan_id': '12345'
+                'message': f'Scan queued on {target} with modules: {", ".join(modules) or "all enabled"}',
+                'scan_id': job.pk
             }
             
-            return JsonResponse(response_data)
+            return JsonResponse(response_data, status=202)
         except Exception as e:
             return JsonResponse({
                 'status': 'error',
@@ -71,6 +83,143 @@ def api_scan(request):
         'message': 'Invalid request method'
     })
 
+def api_scan_status(request, scan_id):
+    """
+    Return the status and progress of a scan job
+    """
+    job = ScanJob.objects.filter(pk=scan_id).first()
+    if job is None:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Scan {scan_id} not found'
+        }, status=404)
+    
+    return JsonResponse({
+        'status': 'success',
+        'scan': job.to_dict()
+    })
+
+@csrf_exempt
+def api_scan_cancel(request, scan_id):
+    """
+    Cancel a scan job: queued jobs are cancelled at once, running jobs are stopped by their worker
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid request method'
+        }, status=405)
+    
+    now = timezone.now()
+    if ScanJob.objects.filter(pk=scan_id, status=ScanJob.STATUS_QUEUED).update(
+            status=ScanJob.STATUS_CANCELLED, cancel_requested=True, finished_at=now):
+        message = 'Scan cancelled'
+    elif ScanJob.objects.filter(pk=scan_id, status=ScanJob.STATUS_RUNNING).update(cancel_requested=True):
+        message = 'Cancellation requested, the scan stops at its next heartbeat'
+    elif ScanJob.objects.filter(pk=scan_id).exists():
+        message = 'Scan already finished'
+    else:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Scan {scan_id} not found'
+        }, status=404)
+    
+    return JsonResponse({
+        'status': 'success',
+        'message': message,
+        'scan': ScanJob.objects.get(pk=scan_id).to_dict()
+    })
+
+def api_scan_results(request, scan_id):
+    """
+    Return the results of a completed scan job
+    """
+    job = ScanJob.objects.filter(pk=scan_id).first()
+    if job is None:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Scan {scan_id} not found'
+        }, status=404)
+    
+    if job.status != ScanJob.STATUS_COMPLETED or not os.path.exists(job.result_path):
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Scan {scan_id} has no results (status: {job.status})',
+            'scan': job.to_dict()
+        }, status=409)
+    
+    from result_stream import build_document, iter_records
+    document = build_document(iter_records(job.result_path))
+    return JsonResponse({
+        'status': 'success',
+        'scan': job.to_dict(),
+        'results': document['results']
+    })
+
+async def api_scan_events(request, scan_id):
+    """
+    Stream the progress events of a scan job as server-sent events
+
+    Every event carries its id, so an EventSource reconnecting with Last-Event-ID (or a client
+    passing ?last_event_id=) resumes after the last event it received. The stream ends with a
+    `done` event once the job has finished and all of its events have been sent.
+    """
+    job = await ScanJob.objects.filter(pk=scan_id).afirst()
+    if job is None:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Scan {scan_id} not found'
+        }, status=404)
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id') or 0
+    try:
+        last_event_id = int(last_event_id)
+    except ValueError:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid last event id'
+        }, status=400)
+    
+    response = StreamingHttpResponse(_scan_event_stream(scan_id, last_event_id),
+                                      content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+async def _scan_event_stream(scan_id, last_event_id):
+    """
+    Yield the events of a job after last_event_id until the job has finished
+
+    The generator only reads the next batch once the previous one has been sent, so a slow
+    client holds back the database reads instead of filling server memory.
+    """
+    batch_size = settings.SCAN_EVENT_BATCH_SIZE
+    # Reconnect delay for EventSource, in milliseconds
+    yield "retry: 3000\n\n"
+    last_sent = time.monotonic()
+    while True:
+        # Read the status first: workers store a job's last events before finishing it
+        job = await ScanJob.objects.aget(pk=scan_id)
+        events = [
+            event async for event in
+            ScanEvent.objects.filter(job_id=scan_id, pk__gt=last_event_id).order_by('pk')[:batch_size]
+        ]
+        for event in events:
+            last_event_id = event.pk
+            yield event.to_sse()
+        if events:
+            last_sent = time.monotonic()
+            if len(events) == batch_size:
+                continue
+        if job.status in ScanJob.FINISHED_STATUSES and not events:
+            yield f"event: done\ndata: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n"
+            return
+        if time.monotonic() - last_sent >= settings.SCAN_EVENT_KEEPALIVE:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(settings.SCAN_EVENT_POLL_INTERVAL)
+
 def health_check(request):
     """
     Health check endpoint
@@ -0,0 +1,305 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional, Dict, Any, List
+from config import settings, module_config
+
+logger = logging.getLogger(__name__)
+
+# 缓存的状态码：正常响应、重定向以及探测中大量出现的 404/410
+CACHEABLE_STATUS_CODES = {200, 203, 204, 206, 300, 301, 308, 404, 410}
+# 范围请求的应答只是资源的一部分，这些请求头总是并入缓存键，部分内容不会被当作完整响应返回
+RANGE_HEADERS = ("range", "if-range")
+# 缓存的是解码后的响应体，这些头部不再适用
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+# 小于该大小的响应体不压缩
+COMPRESS_MIN_BYTES = 512
+# 每写入多少条记录检查一次淘汰
+EVICT_EVERY = 200
+
+
+class ResponseCache:
+    """
+    基于SQLite的磁盘HTTP响应缓存
+    
+    缓存键由方法、URL、响应 Vary 头所列的请求头以及 Range/If-Range 请求头的取值组成。条目按来源设置TTL，
+    过期后如有 ETag/Last-Modified 则通过条件请求重新验证。响应体使用 zlib 压缩存储，
+    超过最大保存时间或总大小上限的条目按最近最少访问的顺序淘汰。
+    
+    所有数据库操作在线程池中执行，不会阻塞事件循环。
+    """
+    
+    def __init__(self, path: Optional[str] = None,
+                 default_ttl: Optional[float] = None,
+                 source_ttls: Optional[Dict[str, float]] = None,
+                 max_bytes: Optional[int] = None,
+                 max_age: Optional[float] = None):
+        self.path = path or settings.http_cache_path
+        self.default_ttl = default_ttl if default_ttl is not None else settings.http_cache_ttl
+        if source_ttls is None:
+            sources = module_config.get_http_cache_config().get("sources") or {}
+            source_ttls = {name: config["ttl"] for name, config in sources.items() if "ttl" in config}
+        self.source_ttls = source_ttls
+        self.max_bytes = max_bytes or settings.http_cache_max_bytes
+        self.max_age = max_age or settings.http_cache_max_age
+        self.stats = {
+            "hits": 0,
+            "stale": 0,
+            "revalidated": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0
+        }
+        self._lock = threading.Lock()
+        self._writes = 0
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS vary (
+                base TEXT PRIMARY KEY,
+                names TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                base TEXT NOT NULL,
+                method TEXT NOT NULL,
+                url TEXT NOT NULL,
+                status_code INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                encoding TEXT,
+                body BLOB NOT NULL,
+                compressed INTEGER NOT NULL,
+                truncated INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses(accessed_at);
+            CREATE INDEX IF NOT EXISTS idx_responses_stored_at ON responses(stored_at);
+        """)
+        self._conn.commit()
+    
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """获取命中、未命中、重新验证和淘汰计数"""
+        return dict(self.stats)
+    
+    def ttl_for(self, source: Optional[str]) -> float:
+        """获取来源对应的TTL（秒）"""
+        return self.source_ttls.get(source, self.default_ttl) if source else self.default_ttl
+    
+    def _base_key(self, method: str, url: str) -> str:
+        return hashlib.sha256(f"{method.upper()} {url}".encode("utf-8")).hexdigest()
+    
+    def _key(self, base: str, names: List[str], request_headers: Dict[str, str]) -> str:
+        names = list(names) + [name for name in RANGE_HEADERS if name in request_headers and name not in names]
+        if not names:
+            return base
+        values = "\n".join(f"{name}:{request_headers.get(name, '')}" for name in names)
+        return hashlib.sha256(f"{base}\n{values}".encode("utf-8")).hexdigest()
+    
+    def _normalize_headers(self, headers: Optional[Dict[str, str]]) -> Dict[str, str]:
+        return {name.lower(): value for name, value in (headers or {}).items()}
+    
+    async def get(self, method: str, url: str, request_headers: Optional[Dict[str, str]] = None,
+                  max_body_bytes: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        查找缓存条目
+        
+        参数:
+            method: HTTP方法
+            url: 请求的URL
+            request_headers: 调用方提供的请求头，用于匹配 Vary
+            max_body_bytes: 本次请求需要的最大响应体字节数
+            
+        返回:
+            缓存条目字典（"fresh" 表示是否仍在TTL内），没有可用条目时返回None；
+            缓存的截断响应体不足以满足本次请求时也返回None
+        """
+        return await asyncio.to_thread(self._get, method, url,
+                                       self._normalize_headers(request_headers), max_body_bytes)
+    
+    def _get(self, method: str, url: str, request_headers: Dict[str, str],
+             max_body_bytes: Optional[int]) -> Optional[Dict[str, Any]]:
+        base = self._base_key(method, url)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT names FROM vary WHERE base = ?", (base,)).fetchone()
+            key = self._key(base, json.loads(row[0]) if row else [], request_headers)
+            row = self._conn.execute(
+                "SELECT status_code, headers, encoding, body, compressed, truncated, etag, last_modified, "
+                "expires_at, size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            
+            status_code, headers, encoding, body, compressed, truncated, etag, last_modified, expires_at, size = row
+            if truncated and (max_body_bytes is None or max_body_bytes > size):
+                self.stats["misses"] += 1
+                return None
+            
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        
+        fresh = expires_at > now
+        self.stats["hits" if fresh else "stale"] += 1
+        return {
+            "key": key,
+            "status_code": status_code,
+            "headers": json.loads(headers),
+            "encoding": encoding,
+            "body": zlib.decompress(body) if compressed else body,
+            "truncated": bool(truncated),
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": fresh
+        }
+    
+    def conditional_headers(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        """根据缓存条目的验证器构造条件请求头"""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+    
+    async def touch(self, entry: Dict[str, Any], ttl: float):
+        """
+        条件请求返回304后刷新条目的过期时间
+        
+        参数:
+            entry: get 返回的缓存条目
+            ttl: 新的TTL（秒）
+        """
+        await asyncio.to_thread(self._touch, entry["key"], ttl)
+    
+    def _touch(self, key: str, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET stored_at = ?, expires_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now + ttl, now, key)
+            )
+            self._conn.commit()
+        self.stats["revalidated"] += 1
+    
+    async def put(self, method: str, url: str, request_headers: Optional[Dict[str, str]],
+                  status_code: int, headers: Dict[str, str], body: bytes,
+                  encoding: Optional[str] = None, truncated: bool = False, ttl: Optional[float] = None):
+        """
+        写入缓存条目，不可缓存的响应会被忽略
+        
+        参数:
+            method: HTTP方法
+            url: 请求的URL
+            request_headers: 调用方提供的请求头
+            status_code: 响应状态码
+            headers: 响应头
+            body: 响应体（已解码）
+            encoding: 响应体的字符编码
+            truncated: 响应体是否被截断
+            ttl: TTL（秒），默认为 default_ttl
+        """
+        if status_code not in CACHEABLE_STATUS_CODES:
+            return
+        response_headers = self._normalize_headers(headers)
+        if "no-store" in response_headers.get("cache-control", "").lower():
+            return
+        vary = sorted({name.strip().lower() for name in response_headers.get("vary", "").split(",") if name.strip()})
+        if "*" in vary:
+            return
+        
+        await asyncio.to_thread(
+            self._put, method, url, self._normalize_headers(request_headers), status_code,
+            {name: value for name, value in response_headers.items() if name not in DROPPED_HEADERS},
+            body, encoding, truncated, ttl if ttl is not None else self.default_ttl, vary
+        )
+    
+    def _put(self, method: str, url: str, request_headers: Dict[str, str], status_code: int,
+             headers: Dict[str, str], body: bytes, encoding: Optional[str], truncated: bool,
+             ttl: float, vary: List[str]):
+        base = self._base_key(method, url)
+        key = self._key(base, vary, request_headers)
+        compressed = len(body) >= COMPRESS_MIN_BYTES
+        stored_body = zlib.compress(body, 1) if compressed else body
+        now = time.time()
+        
+        with self._lock:
+            if vary:
+                self._conn.execute("INSERT OR REPLACE INTO vary (base, names) VALUES (?, ?)",
+                                   (base, json.dumps(vary)))
+            else:
+                self._conn.execute("DELETE FROM vary WHERE base = ?", (base,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, base, method, url, status_code, headers, encoding, body, "
+                "compressed, truncated, etag, last_modified, stored_at, expires_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, base, method.upper(), url, status_code, json.dumps(headers), encoding,
+                 stored_body, int(compressed), int(truncated), headers.get("etag"),
+                 headers.get("last-modified"), now, now + ttl, now, len(body))
+            )
+            self._conn.commit()
+            self._writes += 1
+            evict = self._writes % EVICT_EVERY == 0
+        
+        self.stats["stores"] += 1
+        if evict:
+            self._evict()
+    
+    async def evict(self) -> int:
+        """
+        淘汰过旧的条目，并在总大小超限时按最近最少访问淘汰
+        
+        返回:
+            淘汰的条目数
+        """
+        return await asyncio.to_thread(self._evict)
+    
+    def _evict(self) -> int:
+        evicted = 0
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM responses WHERE stored_at < ?",
+                                        (time.time() - self.max_age,))
+            evicted += cursor.rowcount
+            
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                # 淘汰到上限的90%，避免每次写入都触发淘汰
+                excess = total - int(self.max_bytes * 0.9)
+                keys = []
+                for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                    keys.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+                evicted += len(keys)
+            
+            if evicted:
+                self._conn.execute("DELETE FROM vary WHERE base NOT IN (SELECT base FROM responses)")
+            self._conn.commit()
+        
+        if evicted:
+            self.stats["evictions"] += evicted
+            logger.info(f"HTTP缓存淘汰了 {evicted} 个条目")
+        return evicted
@@ -27,6 +27,13 @@ class KeywordSearch(models.Model):
     is_successful = models.BooleanField(default=True)
     error_message = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # The API filters by keyword and platform and lists the newest searches first
+            models.Index(fields=['keyword', 'platform']),
+            models.Index(fields=['search_date']),
+        ]
+
     def __str__(self):
         return f"{self.keyword.name} on {self.platform}"
 
@@ -47,5 +54,12 @@ class PersonInformation(models.Model):
     collected_at = models.DateTimeField(auto_now_add=True)
     last_updated = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['keyword', 'platform']),
+            # import_data.py matches imported profiles to existing ones by URL
+            models.Index(fields=['profile_url']),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.nickname}) on {self.platform}"
@@ -0,0 +1,23 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class CollectedRecordsPagination(CursorPagination):
+    """
+    Cursor pagination for the searches and person-info lists
+
+    Each page is a single indexed query that continues after the last row of the previous page,
+    so deep pages cost the same as the first one and no COUNT query is run.
+    """
+    page_size = settings.KEYWORDS_API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.KEYWORDS_API_MAX_PAGE_SIZE
+
+
+class KeywordSearchPagination(CollectedRecordsPagination):
+    ordering = ('-search_date', '-id')
+
+
+class PersonInformationPagination(CollectedRecordsPagination):
+    # Profiles ingested in bulk share their collected_at, the primary key keeps the order stable
+    ordering = '-id'
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Keyword, KeywordSearch, PersonInformation
 
@@ -22,3 +23,33 @@ class PersonInformationSerializer(serializers.ModelSerializer):
         model = PersonInformation
         fields = '__all__'
         read_only_fields = ('collected_at', 'last_updated')
+
+class PersonInformationBulkListSerializer(serializers.ListSerializer):
+    """Validates and stores a list of profiles with a constant number of queries"""
+
+    def validate(self, attrs):
+        # One query checks that every referenced keyword belongs to the current user
+        keyword_ids = {item['keyword_id'] for item in attrs}
+        owned = set(Keyword.objects.filter(
+            created_by=self.context['request'].user, pk__in=keyword_ids
+        ).values_list('pk', flat=True))
+        unknown = sorted(keyword_ids - owned)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown keyword id(s): {', '.join(map(str, unknown))}")
+        return attrs
+
+    def create(self, validated_data):
+        return PersonInformation.objects.bulk_create(
+            [PersonInformation(**item) for item in validated_data],
+            batch_size=settings.PERSON_INFO_BULK_BATCH_SIZE,
+        )
+
+class PersonInformationBulkSerializer(serializers.ModelSerializer):
+    # A plain id, so that validating a profile does not load its keyword
+    keyword = serializers.IntegerField(source='keyword_id')
+    
+    class Meta:
+        model = PersonInformation
+        fields = ('keyword', 'name', 'nickname', 'platform', 'profile_url', 'bio', 'location',
+                  'followers_count', 'following_count', 'posts_count')
+        list_serializer_class = PersonInformationBulkListSerializer
@@ -1,9 +1,36 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from .models import Keyword, KeywordSearch, PersonInformation
-from .serializers import KeywordSerializer, KeywordSearchSerializer, PersonInformationSerializer
+from .pagination import KeywordSearchPagination, PersonInformationPagination
+from .serializers import (
+    KeywordSerializer, KeywordSearchSerializer, PersonInformationSerializer, PersonInformationBulkSerializer
+)
+
+def with_keyword_name(queryset):
+    """
+    Join the keyword of each row and load only its name
+
+    The serializers show keyword.name, without the join every row would load its keyword separately.
+    """
+    fields = [field.name for field in queryset.model._meta.concrete_fields]
+    return queryset.select_related('keyword').only(*fields, 'keyword__name')
+
+def filter_by_keyword(queryset, params):
+    """Apply the optional ?keyword=<id> and ?platform= filters of the list endpoints"""
+    keyword = params.get('keyword')
+    if keyword is not None:
+        if not keyword.isdigit():
+            raise ValidationError({'keyword': 'A keyword id is required.'})
+        queryset = queryset.filter(keyword_id=int(keyword))
+    platform = params.get('platform')
+    if platform:
+        queryset = queryset.filter(platform=platform)
+    return queryset
 
 class KeywordViewSet(viewsets.ModelViewSet):
     """
@@ -36,10 +63,12 @@ class KeywordSearchViewSet(viewsets.ReadOnlyModelViewSet):
     """
     queryset = KeywordSearch.objects.all()
     serializer_class = KeywordSearchSerializer
+    pagination_class = KeywordSearchPagination
 
     def get_queryset(self):
         # Only return searches for the current user's keywords
-        return KeywordSearch.objects.filter(keyword__created_by=self.request.user)
+        queryset = KeywordSearch.objects.filter(keyword__created_by=self.request.user)
+        return with_keyword_name(filter_by_keyword(queryset, self.request.query_params))
 
 class PersonInformationViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -47,7 +76,33 @@ class PersonInformationViewSet(viewsets.ReadOnlyModelViewSet):
     """
     queryset = PersonInformation.objects.all()
     serializer_class = PersonInformationSerializer
+    pagination_class = PersonInformationPagination
 
     def get_queryset(self):
         # Only return information for the current user's keywords
-        return PersonInformation.objects.filter(keyword__created_by=self.request.user)
+        queryset = PersonInformation.objects.filter(keyword__created_by=self.request.user)
+        return with_keyword_name(filter_by_keyword(queryset, self.request.query_params))
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Store a list of collected profiles
+
+        The profiles are validated together and inserted with bulk_create in batches of
+        PERSON_INFO_BULK_BATCH_SIZE rows, all or none of them are stored.
+        """
+        serializer = PersonInformationBulkSerializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=settings.PERSON_INFO_BULK_MAX_ITEMS,
+            context=self.get_serializer_context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            created = serializer.save()
+        return Response({
+            'status': 'success',
+            'message': f'Stored {len(created)} profiles',
+            'created': len(created),
+        }, status=status.HTTP_201_CREATED)
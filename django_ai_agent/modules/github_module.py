@@ -1,5 +1,7 @@
 from base_module import BaseModule
-from typing import Dict, Any, List
+from http_client import AsyncHTTPClient
+from secret_scanner import SecretScanner
+from typing import Dict, Any, List, Optional
 import asyncio
 import logging
 from urllib.parse import quote_plus
@@ -10,8 +12,8 @@ logger = logging.getLogger(__name__)
 class GithubModule(BaseModule):
     """在GitHub上搜索敏感信息和代码的模块"""
     
-    def __init__(self):
-        super().__init__("github")
+    def __init__(self, http_client: Optional[AsyncHTTPClient] = None):
+        super().__init__("github", http_client)
         self.github_search_url = "https://github.com/search"
         self.search_patterns = [
             "@{}.com password",
@@ -30,6 +32,7 @@ class GithubModule(BaseModule):
             "@{}.com ssh2_auth_password",
             "@{}.com send_keys"
         ]
+        self.scanner = SecretScanner()
     
     async def execute(self, target: str) -> Dict[str, Any]:
         """
@@ -101,7 +104,7 @@ class GithubModule(BaseModule):
             query: 搜索查询
             
         返回:
-            搜索结果列表
+            搜索结果列表，每个结果的 "secrets" 为片段中检测到的密钥
         """
         try:
             # 出于演示目的，我们正在模拟响应
@@ -110,7 +113,7 @@ class GithubModule(BaseModule):
             
             # 模拟搜索结果
             if "password" in query or "pass" in query:
-                return [
+                results = [
                     {
                         "url": "https://github.com/example/repo/blob/main/config.py",
                         "snippet": "password = 'supersecretpassword123'",
@@ -127,7 +130,7 @@ class GithubModule(BaseModule):
                     }
                 ]
             elif "secret" in query or "token" in query:
-                return [
+                results = [
                     {
                         "url": "https://github.com/dev/application/blob/main/.env",
                         "snippet": "API_SECRET=sk-1234567890abcdef",
@@ -144,7 +147,7 @@ class GithubModule(BaseModule):
                     }
                 ]
             elif "credentials" in query:
-                return [
+                results = [
                     {
                         "url": "https://github.com/org/project/blob/main/src/db.py",
                         "snippet": "creds = {'user': 'admin', 'password': 'dbpass456'}",
@@ -154,7 +157,7 @@ class GithubModule(BaseModule):
                     }
                 ]
             elif "config" in query:
-                return [
+                results = [
                     {
                         "url": "https://github.com/user/webapp/blob/master/config.xml",
                         "snippet": "<database><host>prod.db.internal</host><pass>prodpass789</pass></database>",
@@ -164,7 +167,7 @@ class GithubModule(BaseModule):
                     }
                 ]
             else:
-                return [
+                results = [
                     {
                         "url": f"https://github.com/search?q={quote_plus(query)}",
                         "snippet": f"'{query}' 的搜索结果",
@@ -173,6 +176,11 @@ class GithubModule(BaseModule):
                         "stars": 0
                     }
                 ]
+            
+            # 对代码片段做密钥检测
+            for result in results:
+                result["secrets"] = self.scanner.scan(result["snippet"])
+            return results
                 
         except Exception as e:
             logger.error(f"执行 '{query}' 的GitHub搜索时出错: {str(e)}")
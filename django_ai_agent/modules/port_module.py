@@ -1,6 +1,11 @@
 from base_module import BaseModule
-from typing import Dict, Any, List
+from http_client import AsyncHTTPClient
+from config import module_config
+from dns_resolver import DNSResolver
+from port_scanner import AsyncPortScanner, parse_port_spec
+from typing import Dict, Any, List, Optional
 import asyncio
+import ipaddress
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,8 +14,9 @@ logger = logging.getLogger(__name__)
 class PortModule(BaseModule):
     """端口扫描和C段信息收集模块"""
     
-    def __init__(self):
-        super().__init__("port")
+    def __init__(self, http_client: Optional[AsyncHTTPClient] = None,
+                 resolver: Optional[DNSResolver] = None):
+        super().__init__("port", http_client)
         self.tools = [
             "https://nmap.org",
             "https://github.com/robertdavidgraham/masscan"
@@ -20,6 +26,12 @@ class PortModule(BaseModule):
             21, 22, 23, 25, 53, 80, 110, 111, 135, 139, 143, 443, 445, 993, 995,
             1723, 3306, 3389, 5900, 8080, 8443
         ]
+        # modules.yaml 中可通过 ports 指定扫描范围，例如 "1-65535"
+        port_spec = module_config.get_module_config("port").get("ports")
+        self.ports = parse_port_spec(port_spec) if port_spec else self.common_ports
+        # C段存活探测使用的端口
+        self.c_segment_probe_ports = [22, 80, 443, 445, 3389]
+        self.scanner = AsyncPortScanner(resolver=resolver)
     
     async def execute(self, target: str) -> Dict[str, Any]:
         """
@@ -51,7 +63,7 @@ class PortModule(BaseModule):
     
     async def _scan_ports(self, target: str) -> List[Dict[str, Any]]:
         """
-        扫描目标上的常见端口
+        扫描目标上的端口
         
         参数:
             target: 目标IP或域名
@@ -59,88 +71,69 @@ class PortModule(BaseModule):
         返回:
             包含开放端口和服务信息的列表
         """
-        # 为扫描不同端口创建任务
-        tasks = []
-        for port in self.common_ports:
-            task = self._scan_port(target, port)
-            tasks.append(task)
+        async def on_open(port_result: Dict[str, Any]):
+            await self.emit_finding("open_ports", self._port_entry(port_result))
         
-        # 并发运行所有任务
-        results = await self.run_tasks(tasks)
+        scan_result = await self.scanner.scan_host(target, self.ports, on_open)
+        if scan_result.get("error"):
+            logger.error(f"扫描 {target} 的端口时出错: {scan_result['error']}")
         
-        # 过滤掉关闭的端口和None结果
-        open_ports = [result for result in results if result and result.get("status") == "open"]
-        
-        return open_ports
+        return [self._port_entry(port_result) for port_result in scan_result["open_ports"]]
     
-    async def _scan_port(self, target: str, port: int) -> Dict[str, Any]:
+    def _port_entry(self, port_result: Dict[str, Any]) -> Dict[str, Any]:
         """
-        扫描目标上的特定端口
+        把端口扫描器的探测结果转换为模块结果中的开放端口条目
         
         参数:
-            target: 目标IP或域名
-            port: 要扫描的端口
+            port_result: PortScanner 返回的开放端口
             
         返回:
-            包含端口扫描结果的字典
+            包含端口、服务、横幅和往返时间的字典
         """
-        try:
-            # 出于演示目的，我们正在模拟响应
-            # 在实际实现中，您将使用实际的端口扫描工具
-            # 如nmap或masscan并解析其输出
-            
-            # 模拟端口扫描结果
-            # 实际上，您会检查端口是否真的开放
-            simulated_open_ports = {80, 443, 22, 3306}
-            
-            if port in simulated_open_ports:
-                service_info = self._identify_service(port)
-                return {
-                    "port": port,
-                    "status": "open",
-                    "service": service_info["service"],
-                    "banner": service_info["banner"],
-                    "confidence": "high"
-                }
-            else:
-                return {
-                    "port": port,
-                    "status": "closed"
-                }
-                
-        except Exception as e:
-            logger.error(f"扫描 {target} 的端口 {port} 时出错: {str(e)}")
-            return {
-                "port": port,
-                "status": "error",
-                "error": str(e)
-            }
+        return {
+            "port": port_result["port"],
+            "status": "open",
+            "service": self._identify_service(port_result["port"]),
+            "banner": port_result["banner"],
+            "rtt": round(port_result["rtt"], 4),
+            "confidence": "high"
+        }
     
-    def _identify_service(self, port: int) -> Dict[str, str]:
+    def _identify_service(self, port: int) -> str:
         """
-        识别端口上运行的服务
+        根据端口号推断端口上运行的服务
         
         参数:
             port: 端口号
             
         返回:
-            包含服务信息的字典
+            服务名称
         """
         service_map = {
-            21: {"service": "FTP", "banner": "vsftpd 2.3.4"},
-            22: {"service": "SSH", "banner": "OpenSSH 7.9p1"},
-            23: {"service": "Telnet", "banner": "Linux telnetd"},
-            25: {"service": "SMTP", "banner": "Postfix smtpd"},
-            53: {"service": "DNS", "banner": "BIND 9.11.4"},
-            80: {"service": "HTTP", "banner": "Apache httpd 2.4.41"},
-            443: {"service": "HTTPS", "banner": "nginx 1.18.0"},
-            3306: {"service": "MySQL", "banner": "MySQL 5.7.31"},
-            3389: {"service": "RDP", "banner": "Microsoft Terminal Services"},
-            5900: {"service": "VNC", "banner": "TightVNC 1.3.10"},
-            8080: {"service": "HTTP-Alt", "banner": "Apache Tomcat 9.0.37"}
+            21: "FTP",
+            22: "SSH",
+            23: "Telnet",
+            25: "SMTP",
+            53: "DNS",
+            80: "HTTP",
+            110: "POP3",
+            111: "RPC",
+            135: "MSRPC",
+            139: "NetBIOS",
+            143: "IMAP",
+            443: "HTTPS",
+            445: "SMB",
+            993: "IMAPS",
+            995: "POP3S",
+            1723: "PPTP",
+            3306: "MySQL",
+            3389: "RDP",
+            5900: "VNC",
+            8080: "HTTP-Alt",
+            8443: "HTTPS-Alt"
         }
         
-        return service_map.get(port, {"service": "未知", "banner": "无banner"})
+        return service_map.get(port, "未知")
     
     async def _scan_c_segment(self, target: str) -> Dict[str, Any]:
         """
@@ -153,26 +146,38 @@ class PortModule(BaseModule):
             包含C段扫描结果的字典
         """
         try:
-            # 出于演示目的，我们正在模拟响应
-            # 在实际实现中，您将执行实际的C段扫描
+            address = await self.scanner.resolve(target)
+            if address is None:
+                return {"error": f"无法解析 {target}"}
+            
+            ip = ipaddress.ip_address(address)
+            if ip.version != 4:
+                return {"error": f"C段扫描仅支持IPv4地址: {address}"}
+            
+            network = ipaddress.ip_network(f"{address}/24", strict=False)
+            hosts = [str(host) for host in network.hosts()]
+            
+            # 使用少量探测端口判断存活，任意端口有响应（开放或拒绝）即视为存活
+            host_results = await self.scanner.scan_hosts(hosts, self.c_segment_probe_ports)
+            
+            alive_hosts = []
+            services = {}
+            for host in hosts:
+                host_result = host_results.get(host, {})
+                if not host_result.get("alive"):
+                    continue
+                alive_hosts.append(host)
+                services[host] = [
+                    self._identify_service(port_result["port"])
+                    for port_result in host_result["open_ports"]
+                ]
             
-            # 模拟C段结果
             return {
-                "network": "192.168.1.0/24",
-                "alive_hosts": [
-                    "192.168.1.1",
-                    "192.168.1.10",
-                    "192.168.1.25",
-                    "192.168.1.100"
-                ],
-                "services": {
-                    "192.168.1.1": ["DNS", "HTTP"],
-                    "192.168.1.10": ["SSH", "HTTP", "MySQL"],
-                    "192.168.1.25": ["FTP", "Telnet"],
-                    "192.168.1.100": ["RDP"]
-                }
+                "network": str(network),
+                "alive_hosts": alive_hosts,
+                "services": services
             }
             
         except Exception as e:
             logger.error(f"扫描 {target} 的C段时出错: {str(e)}")
-            return {"error": str(e)}
+            return {"error": str(e)}
\ No newline at end of file
@@ -0,0 +1,318 @@
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Callable, Awaitable, Sized
+from config import settings
+from dns_resolver import DNSResolver
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# 为日志文件、数据库和HTTP连接池预留的文件描述符
+FD_RESERVE = 64
+
+
+def parse_port_spec(spec) -> List[int]:
+    """
+    解析端口描述
+    
+    参数:
+        spec: 端口列表，或 "22,80,8000-8100" 形式的字符串
+        
+    返回:
+        去重并排序后的端口列表
+    """
+    if isinstance(spec, int):
+        spec = [spec]
+    if isinstance(spec, str):
+        spec = [part.strip() for part in spec.split(",") if part.strip()]
+    
+    ports = set()
+    for item in spec:
+        if isinstance(item, int):
+            ports.add(item)
+            continue
+        if "-" in str(item):
+            start, end = str(item).split("-", 1)
+            ports.update(range(int(start), int(end) + 1))
+        else:
+            ports.add(int(item))
+    
+    invalid = [port for port in ports if not 0 < port < 65536]
+    if invalid:
+        raise ValueError(f"无效的端口: {invalid[:5]}")
+    return sorted(ports)
+
+
+def default_socket_budget() -> int:
+    """根据进程的文件描述符上限计算默认的并发套接字预算"""
+    budget = settings.port_scan_max_sockets
+    if resource is not None:
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY:
+            budget = min(budget, max(soft - FD_RESERVE, 1))
+    return budget
+
+
+class HostScanState:
+    """单个主机的扫描状态，包括RTT估计和存活判断"""
+    
+    def __init__(self, host: str, address: str, initial_timeout: float,
+                 min_timeout: float, max_timeout: float):
+        self.host = host
+        self.address = address
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.initial_timeout = initial_timeout
+        self.srtt: Optional[float] = None
+        self.rttvar: Optional[float] = None
+        self.responses = 0
+        self.timeouts = 0
+        self.dead = False
+        self.workers: List[asyncio.Task] = []
+    
+    @property
+    def timeout(self) -> float:
+        """按 RFC 6298 的方式由平滑RTT推导连接超时"""
+        if self.srtt is None:
+            return self.initial_timeout
+        return max(self.min_timeout, min(self.max_timeout, self.srtt + 4 * self.rttvar))
+    
+    def record_rtt(self, rtt: float):
+        """记录一次有响应的连接（开放或被拒绝）的往返时间"""
+        self.responses += 1
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+
+class AsyncPortScanner:
+    """
+    基于 asyncio.open_connection 的非阻塞TCP连接扫描引擎
+    
+    所有主机共享一个全局套接字预算，每个主机另有并发上限。
+    每个主机只启动固定数量的工作协程从端口迭代器中取端口，
+    因此即使扫描 1-65535 全端口也不会一次性创建大量任务或耗尽文件描述符。
+    """
+    
+    def __init__(self, max_sockets: Optional[int] = None,
+                 per_host_concurrency: Optional[int] = None,
+                 max_hosts: Optional[int] = None,
+                 timeout: Optional[float] = None,
+                 min_timeout: Optional[float] = None,
+                 dead_host_threshold: Optional[int] = None,
+                 banner_timeout: Optional[float] = None,
+                 resolver: Optional[DNSResolver] = None):
+        self.max_sockets = max_sockets or default_socket_budget()
+        self.per_host_concurrency = per_host_concurrency or settings.port_scan_per_host_concurrency
+        self.max_hosts = max_hosts or settings.port_scan_max_hosts
+        self.timeout = timeout or settings.port_scan_timeout
+        self.min_timeout = min_timeout or settings.port_scan_min_timeout
+        self.dead_host_threshold = (dead_host_threshold if dead_host_threshold is not None
+                                    else settings.port_scan_dead_host_threshold)
+        self.banner_timeout = banner_timeout if banner_timeout is not None else settings.port_scan_banner_timeout
+        self.resolver = resolver
+        self._socket_budget: Optional[asyncio.Semaphore] = None
+    
+    def _get_socket_budget(self) -> asyncio.Semaphore:
+        """延迟创建全局套接字信号量，使其绑定到当前事件循环"""
+        if self._socket_budget is None:
+            self._socket_budget = asyncio.Semaphore(self.max_sockets)
+        return self._socket_budget
+    
+    async def resolve(self, host: str) -> Optional[str]:
+        """将主机名解析为一个IP地址，失败时返回None；配置了DNS解析器时使用其缓存"""
+        try:
+            ipaddress.ip_address(host)
+            return host
+        except ValueError:
+            pass
+        
+        if self.resolver is not None:
+            address = await self.resolver.resolve_address(host)
+            if address is None:
+                logger.warning(f"无法解析 {host}")
+            return address
+        
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            logger.warning(f"无法解析 {host}: {str(e)}")
+            return None
+        return infos[0][4][0] if infos else None
+    
+    async def scan_host(self, host: str, ports: Iterable[int],
+                        on_open: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None) -> Dict[str, Any]:
+        """
+        扫描单个主机的端口
+        
+        参数:
+            host: 目标主机名或IP
+            ports: 要扫描的端口（可以是惰性迭代器）
+            on_open: 每发现一个开放端口就调用的协程函数，参数为该端口的探测结果；
+                调用期间发现它的工作协程暂停探测
+                
+        返回:
+            包含开放端口、统计信息和主机存活状态的字典
+        """
+        address = await self.resolve(host)
+        result = {
+            "host": host,
+            "address": address,
+            "open_ports": [],
+            "closed": 0,
+            "filtered": 0,
+            "errors": 0,
+            "alive": False,
+            "dead": False
+        }
+        if address is None:
+            result["error"] = "无法解析主机"
+            return result
+        
+        state = HostScanState(host, address, self.timeout, self.min_timeout, self.timeout)
+        # 端口数少于并发数时不创建多余的工作协程；惰性迭代器的长度未知，按并发数创建
+        worker_count = self.per_host_concurrency
+        if isinstance(ports, Sized):
+            worker_count = min(worker_count, len(ports))
+        port_iter = iter(ports)
+        started = time.monotonic()
+        
+        state.workers = [
+            asyncio.create_task(self._host_worker(state, port_iter, result, on_open))
+            for _ in range(worker_count)
+        ]
+        try:
+            outcomes = await asyncio.gather(*state.workers, return_exceptions=True)
+        finally:
+            for worker in state.workers:
+                worker.cancel()
+            # 扫描本身被取消时也要等工作协程退出，释放它们占用的套接字
+            await asyncio.gather(*state.workers, return_exceptions=True)
+        
+        # 主机被判定为不存活时其余工作协程会被取消，取消不算错误；其他异常使该工作协程提前退出
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                result["errors"] += 1
+                logger.error(f"扫描 {host} 的工作协程出错: {str(outcome)}")
+        
+        result["open_ports"].sort(key=lambda item: item["port"])
+        result["alive"] = state.responses > 0
+        result["dead"] = state.dead
+        result["rtt"] = state.srtt
+        result["duration"] = time.monotonic() - started
+        return result
+    
+    async def scan_hosts(self, hosts: Iterable[str], ports: Iterable[int]) -> Dict[str, Dict[str, Any]]:
+        """
+        并发扫描多个主机
+        
+        参数:
+            hosts: 目标主机列表
+            ports: 要对每个主机扫描的端口
+            
+        返回:
+            以主机为键的扫描结果字典
+        """
+        ports = list(ports)
+        host_iter = iter(hosts)
+        results: Dict[str, Dict[str, Any]] = {}
+        
+        async def host_runner():
+            for host in host_iter:
+                results[host] = await self.scan_host(host, ports)
+        
+        await asyncio.gather(*(host_runner() for _ in range(self.max_hosts)))
+        return results
+    
+    async def _host_worker(self, state: HostScanState, port_iter: Iterator[int],
+                           result: Dict[str, Any],
+                           on_open: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None):
+        """从共享端口迭代器中依次取端口并探测，直到端口耗尽或主机被判定为不存活"""
+        for port in port_iter:
+            if state.dead:
+                return
+            
+            port_result = await self._probe(state, port)
+            status = port_result["status"]
+            if status == "open":
+                result["open_ports"].append(port_result)
+                if on_open is not None:
+                    await on_open(port_result)
+            elif status == "closed":
+                result["closed"] += 1
+            elif status == "filtered":
+                result["filtered"] += 1
+            else:
+                result["errors"] += 1
+            
+            if (self.dead_host_threshold and state.responses == 0
+                    and state.timeouts >= self.dead_host_threshold and not state.dead):
+                state.dead = True
+                logger.info(f"{state.host} 连续 {state.timeouts} 次超时且无任何响应，停止扫描该主机")
+                # 取消仍在等待超时的探测，释放它们占用的套接字预算
+                current = asyncio.current_task()
+                for worker in state.workers:
+                    if worker is not current:
+                        worker.cancel()
+                return
+    
+    async def _probe(self, state: HostScanState, port: int) -> Dict[str, Any]:
+        """
+        对单个端口执行一次TCP连接探测
+        
+        参数:
+            state: 主机扫描状态
+            port: 端口号
+            
+        返回:
+            包含端口状态的字典
+        """
+        async with self._get_socket_budget():
+            timeout = state.timeout
+            started = time.monotonic()
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(state.address, port), timeout
+                )
+            except asyncio.TimeoutError:
+                state.timeouts += 1
+                return {"port": port, "status": "filtered"}
+            except ConnectionRefusedError:
+                state.record_rtt(time.monotonic() - started)
+                return {"port": port, "status": "closed"}
+            except OSError as e:
+                return {"port": port, "status": "error", "error": str(e)}
+            
+            rtt = time.monotonic() - started
+            state.record_rtt(rtt)
+            try:
+                banner = await self._grab_banner(reader)
+            finally:
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except (ConnectionError, OSError):
+                    pass
+            
+            return {"port": port, "status": "open", "rtt": rtt, "banner": banner}
+    
+    async def _grab_banner(self, reader: asyncio.StreamReader) -> str:
+        """读取服务主动发送的banner（如SSH、FTP、SMTP），没有则返回空字符串"""
+        if not self.banner_timeout:
+            return ""
+        try:
+            data = await asyncio.wait_for(reader.read(1024), self.banner_timeout)
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            return ""
+        return data.decode("utf-8", errors="replace").strip()
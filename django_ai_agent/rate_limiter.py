@@ -0,0 +1,60 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    异步令牌桶限速器
+    
+    令牌按 rate 个/秒的速度补充，最多累积 burst 个。令牌不足时调用方预留未来的令牌并睡眠到其可用，
+    因此每次获取最多只睡眠一次，等待者按到达顺序获得令牌，高频调用（每秒上万次）也不会反复唤醒。
+    
+    服务端限流时可调用 backoff 将速率减半并暂停一段时间，之后每次成功调用 recover 逐步恢复到配置的速率。
+    """
+    
+    def __init__(self, rate: float, burst: Optional[float] = None, min_rate: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("速率必须大于0")
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate) if min_rate else rate / 64
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    async def acquire(self, tokens: float = 1.0):
+        """
+        获取令牌，令牌不足时等待
+        
+        参数:
+            tokens: 要获取的令牌数
+        """
+        self._refill()
+        self._tokens -= tokens
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+    
+    def backoff(self, delay: float = 0.0):
+        """
+        服务端限流（429/503）后降低速率
+        
+        参数:
+            delay: 至少暂停的秒数（通常来自 Retry-After）
+        """
+        self._refill()
+        self.rate = max(self.min_rate, self.rate / 2)
+        if delay > 0:
+            # 令牌变为负数，之后的获取者需要等待 delay 秒才能拿到令牌
+            self._tokens = min(self._tokens, 0) - delay * self.rate
+    
+    def recover(self):
+        """请求成功后以加性方式恢复速率"""
+        if self.rate < self.max_rate:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 16)
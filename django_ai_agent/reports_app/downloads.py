@@ -0,0 +1,219 @@
+"""
+Streaming delivery of report files
+
+Files are sent in chunks instead of being read into memory. Single byte-range requests are
+honoured so interrupted downloads can resume, ETag/Last-Modified validators answer conditional
+requests with 304, and precompressed variants stored next to a file (report.json.br,
+report.json.gz) are sent to clients that accept them.
+"""
+import gzip
+import mimetypes
+import os
+import re
+import shutil
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+try:
+    import brotli
+except ImportError:  # brotli is only needed to create .br variants
+    brotli = None
+
+# (Content-Encoding, file suffix) of the precompressed variants, in order of preference
+PRECOMPRESSED_VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+# Report formats that are already compressed containers
+COMPRESSED_FORMATS = ('pdf', 'docx', 'xlsx')
+# Bytes read per chunk when sending a range
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class UnsatisfiableRange(Exception):
+    """The requested range starts beyond the end of the file"""
+
+
+def accepted_encodings(request):
+    """Return the content codings the client accepts with a non-zero quality"""
+    accepted = set()
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        quality = 1.0
+        params = params.strip().lower()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def select_variant(request, path):
+    """
+    Choose between a file and its precompressed variants
+
+    A variant is only used when the client accepts its encoding and it is not older than the file.
+    Returns (path to send, content coding or None for the file itself).
+    """
+    accepted = accepted_encodings(request)
+    mtime = os.path.getmtime(path)
+    for encoding, suffix in PRECOMPRESSED_VARIANTS:
+        if encoding not in accepted:
+            continue
+        try:
+            if os.path.getmtime(path + suffix) >= mtime:
+                return path + suffix, encoding
+        except OSError:
+            continue
+    return path, None
+
+
+def parse_range(header, size):
+    """
+    Parse a Range header for a file of the given size
+
+    Only a single `bytes=` range is supported; other forms return None and the whole file is sent,
+    as allowed for servers that ignore Range. Returns the inclusive (start, end) of the range and
+    raises UnsatisfiableRange when it lies outside the file.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if start:
+        start = int(start)
+        if end and int(end) < start:
+            return None
+        if start >= size:
+            raise UnsatisfiableRange()
+        end = min(int(end), size - 1) if end else size - 1
+        return start, end
+    # Suffix range: the last N bytes
+    length = int(end)
+    if length == 0 or size == 0:
+        raise UnsatisfiableRange()
+    return max(size - length, 0), size - 1
+
+
+def if_range_matches(request, etag, last_modified):
+    """Whether a range request may be served partially according to its If-Range header"""
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        # Weak validators never match for ranges
+        return value == etag
+    return parse_http_date_safe(value) == int(last_modified)
+
+
+def _read_range(f, length):
+    try:
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def serve_file(request, path, filename=None, content_type=None, as_attachment=True):
+    """
+    Stream a file, answering conditional and range requests
+
+    Args:
+        request: The request being answered
+        path (str): Path of the file
+        filename (str, optional): Download file name, defaults to the file's name
+        content_type (str, optional): Content type, guessed from the file name by default
+        as_attachment (bool): Whether the browser should save the file instead of showing it
+
+    Returns:
+        HttpResponseBase: 200 or 206 with the file content, 304, 412 or 416
+    """
+    filename = filename or os.path.basename(path)
+    content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    path, encoding = select_variant(request, path)
+    stat = os.stat(path)
+    etag = quote_etag(f"{stat.st_mtime_ns:x}-{stat.st_size:x}" + (f"-{encoding}" if encoding else ''))
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Accept-Ranges'] = 'bytes'
+        response['Vary'] = 'Accept-Encoding'
+        # Reports belong to their user, shared caches must not keep them
+        response['Cache-Control'] = 'private, no-cache'
+        if encoding and response.status_code in (200, 206):
+            response['Content-Encoding'] = encoding
+        return response
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        return finish(response)
+
+    byte_range = None
+    if 'Range' in request.headers and if_range_matches(request, etag, stat.st_mtime):
+        try:
+            byte_range = parse_range(request.headers['Range'], stat.st_size)
+        except UnsatisfiableRange:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return finish(response)
+
+    f = open(path, 'rb')
+    if byte_range is None:
+        # FileResponse lets the server use sendfile (wsgi.file_wrapper) where available
+        response = FileResponse(f, content_type=content_type, as_attachment=as_attachment, filename=filename)
+        return finish(response)
+
+    start, end = byte_range
+    f.seek(start)
+    response = StreamingHttpResponse(_read_range(f, end - start + 1), status=206, content_type=content_type)
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    return finish(response)
+
+
+def precompress_file(path):
+    """
+    Write precompressed variants of a file next to it
+
+    A gzip variant is always written, a brotli variant when the brotli package is installed.
+    Variants that are not smaller than the file are discarded.
+
+    Args:
+        path (str): Path of the file
+
+    Returns:
+        list: Paths of the variants written
+    """
+    size = os.path.getsize(path)
+    written = []
+    for encoding, suffix in PRECOMPRESSED_VARIANTS:
+        if encoding == 'br' and brotli is None:
+            continue
+        variant = path + suffix
+        tmp_path = variant + '.tmp'
+        with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            if encoding == 'gzip':
+                with gzip.GzipFile(fileobj=dst, mode='wb', compresslevel=9) as gz:
+                    shutil.copyfileobj(src, gz, CHUNK_SIZE)
+            else:
+                compressor = brotli.Compressor(quality=11)
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                    dst.write(compressor.process(chunk))
+                dst.write(compressor.finish())
+        if os.path.getsize(tmp_path) < size:
+            os.replace(tmp_path, variant)
+            written.append(variant)
+        else:
+            os.remove(tmp_path)
+    return written
@@ -0,0 +1,41 @@
+import os
+from django.core.management.base import BaseCommand
+from reports_app.downloads import COMPRESSED_FORMATS, PRECOMPRESSED_VARIANTS, precompress_file
+from reports_app.models import Report
+
+class Command(BaseCommand):
+    help = 'Write the precompressed (.gz/.br) variants of report files that are missing or out of date'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rewrite the variants even when they are up to date'
+        )
+
+    def handle(self, *args, **options):
+        written = skipped = failed = 0
+        reports = Report.objects.exclude(format__in=COMPRESSED_FORMATS).only('pk', 'file_path')
+        for report in reports.iterator():
+            path = report.file_path
+            if not os.path.exists(path):
+                continue
+            if not options['force'] and self._up_to_date(path):
+                skipped += 1
+                continue
+            try:
+                precompress_file(path)
+                written += 1
+            except OSError as e:
+                failed += 1
+                self.stderr.write(f'Could not precompress report {report.pk}: {str(e)}')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Precompressed {written} report(s), {skipped} already up to date, {failed} failed')
+        )
+
+    @staticmethod
+    def _up_to_date(path):
+        mtime = os.path.getmtime(path)
+        variants = [path + suffix for _, suffix in PRECOMPRESSED_VARIANTS]
+        return any(os.path.exists(variant) and os.path.getmtime(variant) >= mtime for variant in variants)
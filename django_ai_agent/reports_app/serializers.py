@@ -1,11 +1,22 @@
+import os
 from rest_framework import serializers
 from .models import Report, ReportTemplate
+from .utils import get_reports_dir
 
 class ReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = Report
         fields = '__all__'
-        read_only_fields = ('generated_at', 'size')
+        read_only_fields = ('generated_by', 'generated_at', 'size')
+
+    def validate_file_path(self, value):
+        # Report files are served and precompressed in place, so only files in the reports
+        # directory may be registered; relative paths are relative to that directory
+        reports_dir = os.path.realpath(get_reports_dir())
+        path = os.path.realpath(os.path.join(reports_dir, value))
+        if path == reports_dir or os.path.commonpath([reports_dir, path]) != reports_dir:
+            raise serializers.ValidationError('The report file must be inside the reports directory.')
+        return path
 
 class ReportTemplateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -1,15 +1,75 @@
 from docx import Document
 from docx.shared import Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from concurrent.futures import Future, ProcessPoolExecutor
+from xml.sax.saxutils import escape
+import asyncio
+import hashlib
 import json
+import logging
 import os
+import re
+import threading
 from datetime import datetime
 from django.conf import settings
+from .downloads import precompress_file
+
+logger = logging.getLogger(__name__)
+
+# Bump when the document layout changes so that cached reports are rendered again
+REPORT_LAYOUT_VERSION = 2
+
+# Characters that cannot appear in a Word document (XML 1.0)
+INVALID_XML_CHARS_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+_executor = None
+_executor_lock = threading.Lock()
+# Report path -> Future of the rendering in progress, shared by identical requests
+_pending = {}
+
+def report_cache_key(*parts):
+    """
+    Hash the content a report is rendered from
+    
+    Args:
+        *parts: JSON-serializable report inputs (title, data, template...)
+        
+    Returns:
+        str: SHA-256 hex digest of the inputs and the layout version
+    """
+    payload = json.dumps([REPORT_LAYOUT_VERSION, *parts], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def get_reports_dir():
+    """
+    Return the reports directory, creating it if it doesn't exist
+    """
+    reports_dir = os.path.join(settings.MEDIA_ROOT, 'reports')
+    os.makedirs(reports_dir, exist_ok=True)
+    return reports_dir
+
+def word_report_path(title, data, template=None, reports_dir=None):
+    """
+    Return the cached path of a Word report; the file exists once the report has been rendered
+    """
+    key = report_cache_key('word', title, data, template)
+    return os.path.join(reports_dir or get_reports_dir(), f"{title.replace(' ', '_')}_{key[:16]}.docx")
+
+def combined_report_path(scan_data, keyword_data, reports_dir=None):
+    """
+    Return the cached path of a combined report; the file exists once the report has been rendered
+    """
+    key = report_cache_key('combined', scan_data, keyword_data)
+    return os.path.join(reports_dir or get_reports_dir(), f"combined_report_{key[:16]}.docx")
 
 def generate_word_report(title, data, template=None):
     """
     Generate a Word document report from data
     
+    Identical title, data and template reuse the report rendered before.
+    
     Args:
         title (str): Report title
         data (dict): Data to include in the report
@@ -18,6 +78,22 @@ def generate_word_report(title, data, template=None):
     Returns:
         str: Path to the generated report file
     """
+    return render_word_report(word_report_path(title, data, template), title, data, template)
+
+def render_word_report(filepath, title, data, template=None):
+    """
+    Render a Word report to filepath unless it already exists
+    
+    Runs without Django settings so that it can be executed in a worker process. An
+    existing file is returned as is, so its "Generated on" date is the time the report
+    was first rendered, not the time of the request.
+    
+    Returns:
+        str: filepath
+    """
+    if os.path.exists(filepath):
+        return filepath
+    
     # Create a new Document
     doc = Document()
     
@@ -44,23 +120,13 @@ def generate_word_report(title, data, template=None):
             if isinstance(content, str):
                 doc.add_paragraph(content)
             elif isinstance(content, list):
-                # Create a bulleted list
-                for item in content:
-                    if isinstance(item, dict):
-                        # For dict items, create a table
-                        add_dict_to_table(doc, item)
-                    else:
-                        doc.add_paragraph(str(item), style='List Bullet')
+                add_items(doc, content)
             elif isinstance(content, dict):
                 # For nested dicts, create subsections
                 for subsection, subcontent in content.items():
                     doc.add_heading(subsection.replace('_', ' ').title(), level=2)
                     if isinstance(subcontent, list):
-                        for item in subcontent:
-                            if isinstance(item, dict):
-                                add_dict_to_table(doc, item)
-                            else:
-                                doc.add_paragraph(str(item), style='List Bullet')
+                        add_items(doc, subcontent)
                     else:
                         doc.add_paragraph(str(subcontent))
             else:
@@ -68,17 +134,69 @@ def generate_word_report(title, data, template=None):
             
             doc.add_paragraph()  # Empty paragraph for spacing
     
-    # Create reports directory if it doesn't exist
-    reports_dir = os.path.join(settings.MEDIA_ROOT, 'reports')
-    if not os.path.exists(reports_dir):
-        os.makedirs(reports_dir)
+    save_document(doc, filepath)
+    return filepath
+
+def save_document(doc, filepath):
+    """
+    Save a document atomically, so that a cached report is never read half-written
+    """
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    doc.save(tmp_path)
+    os.replace(tmp_path, filepath)
+
+def _xml_text(value):
+    return escape(INVALID_XML_CHARS_RE.sub('', str(value)))
+
+def _paragraph_xml(text, style_id=None, bold=False):
+    style = f'<w:pPr><w:pStyle w:val="{style_id}"/></w:pPr>' if style_id else ''
+    run_props = '<w:rPr><w:b/></w:rPr>' if bold else ''
+    return f'<w:p>{style}<w:r>{run_props}<w:t xml:space="preserve">{_xml_text(text)}</w:t></w:r></w:p>'
+
+def add_rows_to_table(table, rows, bold=False):
+    """
+    Append rows of text to a table in bulk
     
-    # Save the document
-    filename = f"{title.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
-    filepath = os.path.join(reports_dir, filename)
-    doc.save(filepath)
+    The rows are written as one WordprocessingML fragment and parsed once; calling
+    table.add_row().cells per row gets slower as the table grows.
     
-    return filepath
+    Args:
+        table (Table): Table to append to
+        rows (iterable): Rows, each a sequence of values (one per column)
+        bold (bool): Whether to set the text in bold (header rows)
+    """
+    tbl = table._tbl
+    widths = [grid_col.w for grid_col in tbl.tblGrid.gridCol_lst]
+    xml = []
+    for row in rows:
+        xml.append('<w:tr>')
+        for value, width in zip(row, widths):
+            xml.append(f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width.twips if width else 0}"/></w:tcPr>'
+                       f'{_paragraph_xml(value, bold=bold)}</w:tc>')
+        xml.append('</w:tr>')
+    fragment = parse_xml(f'<w:tbl {nsdecls("w")}>{"".join(xml)}</w:tbl>')
+    for tr in list(fragment):
+        tbl.append(tr)
+
+def add_bullets(doc, items):
+    """
+    Add items as a bulleted list, in bulk
+    
+    Args:
+        doc (Document): The Document object
+        items (iterable): Items to list
+    """
+    style_id = doc.styles['List Bullet'].style_id
+    xml = ''.join(_paragraph_xml(item, style_id) for item in items)
+    if not xml:
+        return
+    fragment = parse_xml(f'<w:body {nsdecls("w")}>{xml}</w:body>')
+    sect_pr = doc.element.body.sectPr
+    for paragraph in list(fragment):
+        if sect_pr is not None:
+            sect_pr.addprevious(paragraph)
+        else:
+            doc.element.body.append(paragraph)
 
 def add_dict_to_table(doc, data_dict):
     """
@@ -92,21 +210,67 @@ def add_dict_to_table(doc, data_dict):
         return
     
     # Create table with 2 columns
-    table = doc.add_table(rows=1, cols=2)
+    table = doc.add_table(rows=0, cols=2)
     table.style = 'Table Grid'
     
     # Add data to table
-    for key, value in data_dict.items():
-        row_cells = table.add_row().cells
-        row_cells[0].text = str(key)
-        row_cells[1].text = str(value)
+    add_rows_to_table(table, ((key, value) for key, value in data_dict.items()))
+    
+    doc.add_paragraph()  # Empty paragraph for spacing
+
+def add_records_to_table(doc, records):
+    """
+    Add a list of dictionaries as one table, with a column per key
+    
+    Args:
+        doc (Document): The Document object
+        records (list): Dictionaries to add, one row each
+    """
+    if not records:
+        return
+    
+    columns = list(dict.fromkeys(key for record in records for key in record))
+    table = doc.add_table(rows=0, cols=len(columns))
+    table.style = 'Table Grid'
+    
+    add_rows_to_table(table, [columns], bold=True)
+    add_rows_to_table(table, ([record.get(column, '') for column in columns] for record in records))
     
     doc.add_paragraph()  # Empty paragraph for spacing
 
+def add_items(doc, items):
+    """
+    Add a list of results: runs of dictionaries become tables, other items bullets
+    
+    Args:
+        doc (Document): The Document object
+        items (list): Items to add
+    """
+    run = []
+    for item in items:
+        if run and isinstance(item, dict) != isinstance(run[0], dict):
+            _add_run(doc, run)
+            run = []
+        run.append(item)
+    _add_run(doc, run)
+
+def _add_run(doc, run):
+    if not run:
+        return
+    if not isinstance(run[0], dict):
+        add_bullets(doc, run)
+    elif len(run) == 1:
+        add_dict_to_table(doc, run[0])
+    else:
+        add_records_to_table(doc, run)
+
 def generate_combined_report(scan_data, keyword_data, output_filename=None):
     """
     Generate a combined report from scan and keyword data
     
+    Identical scan and keyword data reuse the report rendered before, unless
+    an output filename is given.
+    
     Args:
         scan_data (dict): Scan results data
         keyword_data (dict): Keyword analysis data
@@ -115,6 +279,28 @@ def generate_combined_report(scan_data, keyword_data, output_filename=None):
     Returns:
         str: Path to the generated report file
     """
+    if output_filename:
+        filepath = os.path.join(get_reports_dir(), output_filename)
+        if os.path.exists(filepath):
+            os.remove(filepath)
+    else:
+        filepath = combined_report_path(scan_data, keyword_data)
+    return render_combined_report(filepath, scan_data, keyword_data)
+
+def render_combined_report(filepath, scan_data, keyword_data):
+    """
+    Render a combined report to filepath unless it already exists
+    
+    Runs without Django settings so that it can be executed in a worker process. An
+    existing file is returned as is, so its "Generated on" date is the time the report
+    was first rendered, not the time of the request.
+    
+    Returns:
+        str: filepath
+    """
+    if os.path.exists(filepath):
+        return filepath
+    
     # Create a new Document
     doc = Document()
     
@@ -134,11 +320,7 @@ def generate_combined_report(scan_data, keyword_data, output_filename=None):
             if isinstance(results, dict):
                 add_dict_to_table(doc, results)
             elif isinstance(results, list):
-                for item in results:
-                    if isinstance(item, dict):
-                        add_dict_to_table(doc, item)
-                    else:
-                        doc.add_paragraph(str(item), style='List Bullet')
+                add_items(doc, results)
             else:
                 doc.add_paragraph(str(results))
             doc.add_paragraph()  # Empty paragraph for spacing
@@ -153,27 +335,102 @@ def generate_combined_report(scan_data, keyword_data, output_filename=None):
             if isinstance(results, dict):
                 add_dict_to_table(doc, results)
             elif isinstance(results, list):
-                for item in results:
-                    if isinstance(item, dict):
-                        add_dict_to_table(doc, item)
-                    else:
-                        doc.add_paragraph(str(item), style='List Bullet')
+                add_items(doc, results)
             else:
                 doc.add_paragraph(str(results))
             doc.add_paragraph()  # Empty paragraph for spacing
     else:
         doc.add_paragraph("No keyword analysis data available.")
     
-    # Create reports directory if it doesn't exist
-    reports_dir = os.path.join(settings.MEDIA_ROOT, 'reports')
-    if not os.path.exists(reports_dir):
-        os.makedirs(reports_dir)
+    save_document(doc, filepath)
+    return filepath
+
+def _get_executor():
+    with _executor_lock:
+        return _get_executor_locked()
+
+def _get_executor_locked():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.REPORT_RENDER_WORKERS)
+    return _executor
+
+def _submit(filepath, render, *args):
+    """
+    Render a report in the worker processes, sharing the rendering of identical pending reports
+    """
+    if os.path.exists(filepath):
+        future = Future()
+        future.set_result(filepath)
+        return future
+    # Look up and submit under one lock hold so that concurrent callers never render the same report twice
+    with _executor_lock:
+        future = _pending.get(filepath)
+        if future is not None:
+            return future
+        future = _get_executor_locked().submit(render, filepath, *args)
+        _pending[filepath] = future
     
-    # Determine filename
-    if not output_filename:
-        output_filename = f"combined_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
+    def forget(done):
+        with _executor_lock:
+            # A later rendering of the same path may have replaced this entry
+            if _pending.get(filepath) is done:
+                del _pending[filepath]
     
-    filepath = os.path.join(reports_dir, output_filename)
-    doc.save(filepath)
+    future.add_done_callback(forget)
+    return future
+
+def submit_word_report(title, data, template=None):
+    """
+    Render a Word report in a background worker process
     
-    return filepath
+    Args: see generate_word_report
+    
+    Returns:
+        Future: Resolves to the path of the report file
+    """
+    return _submit(word_report_path(title, data, template), render_word_report, title, data, template)
+
+def submit_combined_report(scan_data, keyword_data):
+    """
+    Render a combined report in a background worker process
+    
+    Args: see generate_combined_report
+    
+    Returns:
+        Future: Resolves to the path of the report file
+    """
+    return _submit(combined_report_path(scan_data, keyword_data), render_combined_report, scan_data, keyword_data)
+
+def submit_precompression(filepath):
+    """
+    Write the precompressed variants of a report file in a background worker process
+    
+    Failures are logged; the file itself is then sent uncompressed.
+    
+    Args:
+        filepath (str): Path of the report file
+        
+    Returns:
+        Future: Resolves to the paths of the variants written
+    """
+    future = _get_executor().submit(precompress_file, filepath)
+    
+    def log_failure(done):
+        if done.exception() is not None:
+            logger.warning(f"Could not precompress report {filepath}: {str(done.exception())}")
+    
+    future.add_done_callback(log_failure)
+    return future
+
+async def agenerate_word_report(title, data, template=None):
+    """
+    Async version of generate_word_report, rendering in a background worker process
+    """
+    return await asyncio.wrap_future(submit_word_report(title, data, template))
+
+async def agenerate_combined_report(scan_data, keyword_data):
+    """
+    Async version of generate_combined_report, rendering in a background worker process
+    """
+    return await asyncio.wrap_future(submit_combined_report(scan_data, keyword_data))
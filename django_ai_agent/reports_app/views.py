@@ -2,12 +2,12 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse, Http404
-from django.core.files.storage import default_storage
 from django.db import models
 import os
+from .downloads import COMPRESSED_FORMATS, serve_file
 from .models import Report, ReportTemplate
 from .serializers import ReportSerializer, ReportTemplateSerializer
+from .utils import submit_precompression
 
 class ReportViewSet(viewsets.ModelViewSet):
     """
@@ -21,10 +21,17 @@ class ReportViewSet(viewsets.ModelViewSet):
         return Report.objects.filter(generated_by=self.request.user)
 
     def perform_create(self, serializer):
-        # Associate the report with the current user
-        serializer.save(generated_by=self.request.user)
+        # Associate the report with the current user; the size is read from the file
+        file_path = serializer.validated_data['file_path']
+        size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        report = serializer.save(generated_by=self.request.user, size=size)
+        
+        # Precompressed variants are sent to clients that accept them, see downloads.serve_file.
+        # They are written by the render workers so that the request does not wait for them.
+        if report.format not in COMPRESSED_FORMATS and os.path.exists(report.file_path):
+            submit_precompression(report.file_path)
 
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get', 'head'])
     def download(self, request, pk=None):
         report = get_object_or_404(Report, pk=pk)
         
@@ -42,11 +49,8 @@ class ReportViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Serve the file
-        with open(report.file_path, 'rb') as f:
-            response = HttpResponse(f.read(), content_type='application/octet-stream')
-            response['Content-Disposition'] = f'attachment; filename="{os.path.basename(report.file_path)}"'
-            return response
+        # Stream the file, with range and conditional request support
+        return serve_file(request, report.file_path, content_type='application/octet-stream')
 
 class ReportTemplateViewSet(viewsets.ModelViewSet):
     """
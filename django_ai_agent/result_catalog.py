@@ -0,0 +1,286 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+from result_stream import STREAM_EXTENSIONS, is_stream_file, iter_records
+
+logger = logging.getLogger(__name__)
+
+# 目录中记录的结果文件类型
+RESULT_EXTENSIONS = (".json", ".txt") + tuple(STREAM_EXTENSIONS.values())
+# 重建索引时每批写入的条目数
+REBUILD_BATCH_SIZE = 1000
+# 摘要计数的列
+SUMMARY_COLUMNS = ("subdomains", "open_ports", "sensitive_files", "credentials", "errors")
+# 摘要计数对应的 (模块, 字段)
+SUMMARY_FIELDS = {
+    "subdomains": ("domain", "subdomains"),
+    "open_ports": ("port", "open_ports"),
+    "sensitive_files": ("sensitive", "sensitive_files"),
+    "credentials": ("sensitive", "exposed_credentials")
+}
+
+
+def summarize_results(results: Dict[str, Any]) -> Dict[str, int]:
+    """
+    统计扫描结果中的主要发现数量
+    
+    参数:
+        results: 模块名 -> 模块结果
+        
+    返回:
+        子域名、开放端口、敏感文件、暴露凭证和出错模块的数量
+    """
+    summary = {}
+    for name, (module_name, field) in SUMMARY_FIELDS.items():
+        value = (results.get(module_name) or {}).get(field)
+        summary[name] = len(value) if isinstance(value, (list, dict)) else 0
+    summary["errors"] = sum(1 for module_results in results.values()
+                            if isinstance(module_results, dict) and "error" in module_results)
+    return summary
+
+
+class ResultCatalog:
+    """
+    扫描结果文件的SQLite索引
+    
+    每次保存结果时记录目标、扫描时间、模块、文件路径、大小和摘要计数，列出和筛选结果时只查询索引，
+    不再遍历结果目录；目录中已有的文件（或在外部被删除、复制的文件）可以通过 rebuild 重新建立索引。
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.created = not os.path.exists(self.path)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS results (
+                filename TEXT PRIMARY KEY,
+                filepath TEXT NOT NULL,
+                target TEXT,
+                scan_timestamp TEXT NOT NULL,
+                type TEXT NOT NULL,
+                modules TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                modified REAL NOT NULL,
+                subdomains INTEGER NOT NULL DEFAULT 0,
+                open_ports INTEGER NOT NULL DEFAULT 0,
+                sensitive_files INTEGER NOT NULL DEFAULT 0,
+                credentials INTEGER NOT NULL DEFAULT 0,
+                errors INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_target_time ON results(target, scan_timestamp);
+            CREATE INDEX IF NOT EXISTS idx_results_time ON results(scan_timestamp);
+            CREATE INDEX IF NOT EXISTS idx_results_open_ports ON results(open_ports, scan_timestamp);
+        """)
+        self._conn.commit()
+    
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+    
+    def _row(self, filepath: str, target: Optional[str], scan_timestamp: str, result_type: str,
+             modules: Iterable[str], summary: Optional[Dict[str, int]]) -> Tuple:
+        stat = os.stat(filepath)
+        summary = summary or {}
+        return (os.path.basename(filepath), filepath, target, scan_timestamp, result_type,
+                ",".join(sorted(modules)), stat.st_size, stat.st_mtime,
+                *(int(summary.get(column, 0)) for column in SUMMARY_COLUMNS))
+    
+    def _insert(self, rows: List[Tuple]):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO results (filename, filepath, target, scan_timestamp, type, modules, size, "
+            "modified, subdomains, open_ports, sensitive_files, credentials, errors) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+    
+    def record(self, filepath: str, target: Optional[str], scan_timestamp: str, result_type: str,
+               modules: Iterable[str], summary: Optional[Dict[str, int]] = None):
+        """
+        记录一个刚保存的结果文件
+        
+        参数:
+            filepath: 结果文件的路径
+            target: 目标域名/IP
+            scan_timestamp: 扫描时间（ISO格式）
+            result_type: 文件类型（full、delta、jsonl 或 text）
+            modules: 结果包含的模块
+            summary: summarize_results 返回的摘要计数
+        """
+        row = self._row(filepath, target, scan_timestamp, result_type, modules, summary)
+        with self._lock:
+            self._insert([row])
+            self._conn.commit()
+    
+    def remove(self, filename: str):
+        """从索引中移除一个结果文件"""
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE filename = ?", (os.path.basename(filename),))
+            self._conn.commit()
+    
+    def _where(self, target: Optional[str], since: Optional[str], until: Optional[str],
+               has_open_ports: Optional[bool], result_type: Optional[str]) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        if target:
+            clauses.append("target = ?")
+            params.append(target)
+        if since:
+            clauses.append("scan_timestamp >= ?")
+            params.append(since)
+        if until:
+            # 只给出日期时包含当天
+            clauses.append("scan_timestamp <= ?")
+            params.append(until + "T23:59:59.999999" if len(until) == 10 else until)
+        if has_open_ports is not None:
+            clauses.append("open_ports > 0" if has_open_ports else "open_ports = 0")
+        if result_type:
+            clauses.append("type = ?")
+            params.append(result_type)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+    
+    def query(self, target: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+              has_open_ports: Optional[bool] = None, result_type: Optional[str] = None,
+              limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        按条件查询结果文件，按扫描时间从新到旧排序
+        
+        参数:
+            target: 只返回该目标的结果
+            since: 扫描时间下限（ISO格式日期或时间）
+            until: 扫描时间上限（只给出日期时包含当天）
+            has_open_ports: True 只返回有开放端口的结果，False 只返回没有的
+            result_type: 只返回该类型（full、delta、jsonl、text）的结果
+            limit: 最多返回的条数，None表示不限制
+            offset: 跳过的条数（分页）
+            
+        返回:
+            结果文件信息列表
+        """
+        where, params = self._where(target, since, until, has_open_ports, result_type)
+        sql = f"SELECT * FROM results{where} ORDER BY scan_timestamp DESC, filename DESC"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        
+        entries = []
+        for row in rows:
+            entry = dict(row)
+            entry["modules"] = entry["modules"].split(",") if entry["modules"] else []
+            entry["modified"] = datetime.fromtimestamp(entry["modified"]).isoformat()
+            entries.append(entry)
+        return entries
+    
+    def latest(self, target: str, result_types: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """
+        查找目标最近一次的指定类型结果文件（使用 (target, scan_timestamp) 索引）
+        
+        参数:
+            target: 目标域名/IP
+            result_types: 允许的文件类型
+            
+        返回:
+            结果文件信息，没有时返回None
+        """
+        result_types = list(result_types)
+        placeholders = ", ".join("?" * len(result_types))
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT filepath, scan_timestamp, type FROM results WHERE target = ? AND type IN ({placeholders}) "
+                "ORDER BY scan_timestamp DESC, filename DESC LIMIT 1", [target, *result_types]
+            ).fetchone()
+        return dict(row) if row is not None else None
+    
+    def count(self, target: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+              has_open_ports: Optional[bool] = None, result_type: Optional[str] = None) -> int:
+        """统计满足条件的结果文件数，参数同 query"""
+        where, params = self._where(target, since, until, has_open_ports, result_type)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM results{where}", params).fetchone()[0]
+    
+    def _describe_file(self, filepath: str) -> Optional[Tuple]:
+        """读取已有结果文件的元数据，无法识别的文件返回None"""
+        modified = datetime.fromtimestamp(os.path.getmtime(filepath)).isoformat()
+        if filepath.endswith(".txt"):
+            # 文本报告的头部包含目标，见 ResultsStorage._format_results_as_text
+            target = None
+            with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
+                for _, line in zip(range(10), f):
+                    if line.startswith("目标: "):
+                        target = line[len("目标: "):].strip()
+                        break
+            return self._row(filepath, target, modified, "text", [], None)
+        
+        if is_stream_file(filepath):
+            # 头部和尾部分别在文件的首尾，逐条读取而不载入整个文件
+            header, footer = None, {}
+            for record in iter_records(filepath):
+                if record["type"] == "header":
+                    header = record
+                elif record["type"] == "footer":
+                    footer = record
+            if header is None:
+                return None
+            return self._row(filepath, header.get("target"), header["scan_timestamp"], "jsonl",
+                             footer.get("module_timestamps", {}), footer.get("summary"))
+        
+        with open(filepath, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or "scan_timestamp" not in data:
+            return None
+        if data.get("type") == "delta":
+            return self._row(filepath, data.get("target"), data["scan_timestamp"], "delta",
+                             data.get("module_timestamps", {}), data.get("summary"))
+        results = data.get("results", {})
+        return self._row(filepath, data.get("target"), data["scan_timestamp"], "full",
+                         results, summarize_results(results))
+    
+    def rebuild(self, directory: str) -> int:
+        """
+        清空索引并重新索引目录中已有的结果文件
+        
+        参数:
+            directory: 结果目录
+            
+        返回:
+            索引的文件数
+        """
+        started = time.monotonic()
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            indexed = 0
+            batch = []
+            for entry in os.scandir(directory):
+                if not entry.is_file() or not entry.name.endswith(RESULT_EXTENSIONS):
+                    continue
+                try:
+                    row = self._describe_file(entry.path)
+                except Exception as e:
+                    logger.warning(f"索引结果文件 {entry.path} 时出错: {str(e)}")
+                    continue
+                if row is None:
+                    continue
+                batch.append(row)
+                if len(batch) >= REBUILD_BATCH_SIZE:
+                    self._insert(batch)
+                    indexed += len(batch)
+                    batch = []
+            self._insert(batch)
+            indexed += len(batch)
+            self._conn.commit()
+        
+        logger.info(f"已重建结果索引: {indexed} 个文件，用时 {time.monotonic() - started:.1f} 秒")
+        return indexed
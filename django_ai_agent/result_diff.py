@@ -0,0 +1,259 @@
+import copy
+import json
+from typing import Dict, Any, List, Optional, Tuple
+
+# 按条目比较的列表字段及条目的标识字段；未列出的列表按整个条目比较
+COLLECTION_KEYS = {
+    ("port", "open_ports"): ("port",),
+    ("sensitive", "google_dorks"): ("dork",),
+    ("sensitive", "sensitive_files"): ("url",),
+    ("sensitive", "exposed_credentials"): ("url", "rule", "value"),
+    ("github", "sensitive_info"): ("url", "snippet"),
+    ("github", "code_snippets"): ("url", "snippet"),
+    ("github", "config_files"): ("url", "snippet"),
+}
+# 每次扫描都会变化的测量字段，比较条目时忽略（增量中不记录其变化）
+VOLATILE_FIELDS = {"rtt"}
+# 不参与比较的模块字段
+IGNORED_FIELDS = {"target"}
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _identity(item: Any, key_fields: Optional[Tuple[str, ...]]) -> str:
+    if key_fields and isinstance(item, dict):
+        return _canonical([item.get(field) for field in key_fields])
+    return _canonical(item)
+
+
+def _comparable(item: Any) -> str:
+    if isinstance(item, dict):
+        return _canonical({key: value for key, value in item.items() if key not in VOLATILE_FIELDS})
+    return _canonical(item)
+
+
+def _tags(items: List[Any], key_fields: Optional[Tuple[str, ...]]) -> List[Tuple[str, int]]:
+    """条目的标识加上它是第几个相同标识的条目，使重复的条目也能一一对应"""
+    seen: Dict[str, int] = {}
+    tags = []
+    for item in items:
+        key = _identity(item, key_fields)
+        tags.append((key, seen.get(key, 0)))
+        seen[key] = seen.get(key, 0) + 1
+    return tags
+
+
+def _diff_list(old: List[Any], new: List[Any], key_fields: Optional[Tuple[str, ...]]) -> Dict[str, Any]:
+    """
+    比较列表字段
+    
+    新增条目记录其在新列表中的位置，删除和更新的条目记录其在旧列表中的位置，
+    保留的条目顺序改变时记录新的顺序，因此应用差异后能按本次扫描的顺序（包括重复条目）还原列表。
+    """
+    old_positions = {tag: index for index, tag in enumerate(_tags(old, key_fields))}
+    diff: Dict[str, Any] = {"kind": "list"}
+    added, added_at, updated, updated_at, kept = [], [], [], [], []
+    for position, (tag, item) in enumerate(zip(_tags(new, key_fields), new)):
+        index = old_positions.get(tag)
+        if index is None:
+            added.append(item)
+            added_at.append(position)
+            continue
+        kept.append(index)
+        if key_fields and _comparable(item) != _comparable(old[index]):
+            updated.append(item)
+            updated_at.append(index)
+    kept_set = set(kept)
+    removed_at = [index for index in range(len(old)) if index not in kept_set]
+    
+    if added:
+        diff["added"] = added
+        diff["added_at"] = added_at
+    if removed_at:
+        diff["removed"] = [old[index] for index in removed_at]
+        diff["removed_at"] = removed_at
+    if updated:
+        diff["updated"] = updated
+        diff["updated_at"] = updated_at
+    if kept != sorted(kept):
+        # 保留的条目按旧顺序编号，记录它们在新列表中的先后
+        rank = {index: number for number, index in enumerate(sorted(kept))}
+        diff["order"] = [rank[index] for index in kept]
+    return diff
+
+
+def _diff_mapping(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    diff: Dict[str, Any] = {"kind": "mapping"}
+    added = {key: value for key, value in new.items() if key not in old}
+    removed = [key for key in old if key not in new]
+    updated = {
+        key: value for key, value in new.items()
+        if key in old and _canonical(value) != _canonical(old[key])
+    }
+    if added:
+        diff["added"] = added
+    if removed:
+        diff["removed"] = removed
+    if updated:
+        diff["updated"] = updated
+    return diff
+
+
+def diff_module(module_name: str, old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    比较一个模块前后两次的结果
+    
+    参数:
+        module_name: 模块名称
+        old: 上一次的模块结果
+        new: 本次的模块结果
+        
+    返回:
+        以字段为键的差异字典，没有变化的字段不出现
+    """
+    diff = {}
+    for field in list(old) + [field for field in new if field not in old]:
+        if field in IGNORED_FIELDS:
+            continue
+        if field not in new:
+            diff[field] = {"kind": "deleted"}
+            continue
+        old_value, new_value = old.get(field), new[field]
+        if isinstance(old_value, list) and isinstance(new_value, list):
+            field_diff = _diff_list(old_value, new_value, COLLECTION_KEYS.get((module_name, field)))
+        elif isinstance(old_value, dict) and isinstance(new_value, dict):
+            field_diff = _diff_mapping(old_value, new_value)
+        elif field not in old or _canonical(old_value) != _canonical(new_value):
+            field_diff = {"kind": "value", "value": new_value}
+        else:
+            continue
+        if len(field_diff) > 1 or field_diff["kind"] == "value":
+            diff[field] = field_diff
+    return diff
+
+
+def diff_results(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    比较两次扫描的全部模块结果
+    
+    参数:
+        old: 上一次扫描的结果（模块名 -> 模块结果）
+        new: 本次扫描的结果
+        
+    返回:
+        以模块名为键的差异字典；新增的模块记录完整结果，消失的模块记录删除，没有变化的模块不出现
+    """
+    diff = {}
+    for module_name, module_results in new.items():
+        if module_name not in old:
+            diff[module_name] = {"kind": "added", "value": module_results}
+            continue
+        module_diff = diff_module(module_name, old[module_name], module_results)
+        if module_diff:
+            diff[module_name] = {"kind": "changed", "fields": module_diff}
+    for module_name in old:
+        if module_name not in new:
+            diff[module_name] = {"kind": "deleted"}
+    return diff
+
+
+def _apply_list(old: List[Any], diff: Dict[str, Any], key_fields: Optional[Tuple[str, ...]]) -> List[Any]:
+    if ("removed" in diff and "removed_at" not in diff) or ("updated" in diff and "updated_at" not in diff):
+        return _apply_list_by_identity(old, diff, key_fields)
+    
+    removed_at = set(diff.get("removed_at", []))
+    updated = dict(zip(diff.get("updated_at", []), copy.deepcopy(diff.get("updated", []))))
+    items = [updated.get(index, item) for index, item in enumerate(old) if index not in removed_at]
+    if "order" in diff:
+        items = [items[number] for number in diff["order"]]
+    added = copy.deepcopy(diff.get("added", []))
+    if "added_at" not in diff:
+        return items + added
+    # 位置按从小到大的顺序记录，依次插入时之前的条目都已在最终位置上
+    for position, item in zip(diff["added_at"], added):
+        items.insert(position, item)
+    return items
+
+
+def _apply_list_by_identity(old: List[Any], diff: Dict[str, Any],
+                            key_fields: Optional[Tuple[str, ...]]) -> List[Any]:
+    """应用不带位置信息的旧格式差异：按标识删除和更新，新增条目追加到末尾"""
+    removed = {_identity(item, key_fields) for item in diff.get("removed", [])}
+    updated = {_identity(item, key_fields): item for item in diff.get("updated", [])}
+    items = []
+    for item in old:
+        key = _identity(item, key_fields)
+        if key in removed:
+            continue
+        items.append(updated.get(key, item))
+    items.extend(diff.get("added", []))
+    return items
+
+
+def apply_diff(base: Dict[str, Any], diff: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    把 diff_results 产生的差异应用到基准结果上
+    
+    参数:
+        base: 基准扫描的结果（不会被修改）
+        diff: 差异字典
+        
+    返回:
+        新的完整结果
+    """
+    results = copy.deepcopy(base)
+    for module_name, module_diff in diff.items():
+        kind = module_diff["kind"]
+        if kind == "added":
+            results[module_name] = copy.deepcopy(module_diff["value"])
+        elif kind == "deleted":
+            results.pop(module_name, None)
+        else:
+            module_results = results.setdefault(module_name, {})
+            for field, field_diff in module_diff["fields"].items():
+                field_kind = field_diff["kind"]
+                if field_kind == "deleted":
+                    module_results.pop(field, None)
+                elif field_kind == "value":
+                    module_results[field] = copy.deepcopy(field_diff["value"])
+                elif field_kind == "list":
+                    module_results[field] = _apply_list(module_results.get(field, []), field_diff,
+                                                        COLLECTION_KEYS.get((module_name, field)))
+                else:
+                    mapping = module_results.setdefault(field, {})
+                    for key in field_diff.get("removed", []):
+                        mapping.pop(key, None)
+                    mapping.update(copy.deepcopy(field_diff.get("added", {})))
+                    mapping.update(copy.deepcopy(field_diff.get("updated", {})))
+    return results
+
+
+def summarize_diff(diff: Dict[str, Any]) -> Dict[str, Dict[str, Dict[str, int]]]:
+    """
+    统计差异中每个模块每个字段新增、删除和更新的条目数
+    
+    参数:
+        diff: diff_results 产生的差异字典
+        
+    返回:
+        模块名 -> 字段 -> {"added", "removed", "updated"} 计数
+    """
+    summary = {}
+    for module_name, module_diff in diff.items():
+        if module_diff["kind"] != "changed":
+            summary[module_name] = {"*": {module_diff["kind"]: 1}}
+            continue
+        fields = {}
+        for field, field_diff in module_diff["fields"].items():
+            if field_diff["kind"] in ("value", "deleted"):
+                fields[field] = {"updated": 1}
+                continue
+            fields[field] = {
+                change: len(field_diff[change])
+                for change in ("added", "removed", "updated")
+                if change in field_diff
+            }
+        summary[module_name] = fields
+    return summary
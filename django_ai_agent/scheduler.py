@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class FairScheduler:
+    """
+    有界并发的公平调度器
+    
+    工作项按键（通常是扫描目标）分组，调度时在各键之间轮转，
+    使连续启动的工作项尽量落在不同的目标上；每个键同时运行的工作项数也有上限，
+    从而在保持整体并发饱和的同时不会压垮任何单个主机。
+    分组来自迭代器并按需读取，成千上万个目标也不会一次性全部载入调度队列。
+    """
+    
+    def __init__(self, max_concurrency: int, per_key_concurrency: int = 1):
+        if max_concurrency < 1 or per_key_concurrency < 1:
+            raise ValueError("并发上限必须大于0")
+        self.max_concurrency = max_concurrency
+        self.per_key_concurrency = per_key_concurrency
+    
+    async def run(self, groups: Iterable[Tuple[str, Iterable[Any]]],
+                  handler: Callable[[str, Any], Awaitable[None]],
+                  on_key_complete: Optional[Callable[[str], Awaitable[None]]] = None):
+        """
+        运行所有工作项
+        
+        参数:
+            groups: (键, 工作项列表) 的可迭代对象
+            handler: 处理单个工作项的协程函数，参数为 (键, 工作项)
+            on_key_complete: 某个键的全部工作项完成后调用的协程函数
+            
+        单个工作项或 on_key_complete 出错时只记录日志，不影响其余工作项和键
+        """
+        group_iter = iter(groups)
+        exhausted = False
+        queues: "OrderedDict[str, Deque[Any]]" = OrderedDict()
+        active: Dict[str, int] = {}
+        running: Dict[asyncio.Task, str] = {}
+        
+        def admit():
+            # 待调度的键保持在并发上限左右，既能填满并发又不会预读全部分组
+            nonlocal exhausted
+            while not exhausted and len(queues) < self.max_concurrency:
+                group = next(group_iter, None)
+                if group is None:
+                    exhausted = True
+                    break
+                key, items = group
+                queue = queues.setdefault(key, deque())
+                queue.extend(items)
+                if not queue:
+                    del queues[key]
+        
+        def next_item() -> Optional[Tuple[str, Any]]:
+            # 从轮转位置开始寻找一个未达到单键并发上限的键
+            for _ in range(len(queues)):
+                key = next(iter(queues))
+                queues.move_to_end(key)
+                if active.get(key, 0) < self.per_key_concurrency:
+                    queue = queues[key]
+                    item = queue.popleft()
+                    if not queue:
+                        del queues[key]
+                    return key, item
+            return None
+        
+        try:
+            while True:
+                admit()
+                while len(running) < self.max_concurrency:
+                    item = next_item()
+                    if item is None:
+                        break
+                    key, payload = item
+                    active[key] = active.get(key, 0) + 1
+                    running[asyncio.create_task(handler(key, payload))] = key
+                    admit()
+                
+                if not running:
+                    break
+                
+                done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    key = running.pop(task)
+                    active[key] -= 1
+                    try:
+                        task.result()
+                    except Exception as e:
+                        logger.error(f"处理 {key} 的工作项时出错: {str(e)}")
+                    if active[key] == 0:
+                        del active[key]
+                        if key not in queues and on_key_complete is not None:
+                            try:
+                                await on_key_complete(key)
+                            except Exception as e:
+                                logger.error(f"完成 {key} 的处理时出错: {str(e)}")
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
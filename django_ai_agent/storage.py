@@ -1,13 +1,21 @@
+import asyncio
 import json
 import aiofiles
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator, Iterator
 from config import settings
 from datetime import datetime
+from result_diff import diff_results, apply_diff
+from findings_index import FindingsIndex, extract_findings
+from result_catalog import ResultCatalog, RESULT_EXTENSIONS, SUMMARY_FIELDS, summarize_results
+from result_stream import STREAM_EXTENSIONS, ResultStreamWriter, aiter_records, build_document, is_stream_file, iter_records, stream_extension
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 可以还原出完整结果的文件类型（文本报告除外）
+RESTORABLE_TYPES = ("full", "delta", "jsonl")
+
 
 class ResultsStorage:
     """处理扫描结果的存储"""
@@ -15,6 +23,11 @@ class ResultsStorage:
     def __init__(self):
         self.output_dir = settings.output_dir
         self._ensure_output_directory()
+        self.catalog = ResultCatalog(settings.results_catalog_path or os.path.join(self.output_dir, "catalog.db"))
+        if self.catalog.created and any(name.endswith(RESULT_EXTENSIONS) for name in os.listdir(self.output_dir)):
+            # 首次使用索引时为已有的结果文件建立索引
+            self.catalog.rebuild(self.output_dir)
+        self.findings = FindingsIndex(settings.findings_index_path or os.path.join(self.output_dir, "findings.db"))
     
     def _ensure_output_directory(self):
         """确保存储目录存在"""
@@ -22,33 +35,52 @@ class ResultsStorage:
             os.makedirs(self.output_dir)
             logger.info(f"已创建存储目录: {self.output_dir}")
     
-    async def save_results(self, target: str, results: Dict[str, Any]) -> str:
+    def _new_result_path(self, target: str, suffix: str = ".json") -> str:
+        """生成带时间戳的结果文件路径，同一秒内的多个文件（包括完整和增量文件）追加序号"""
+        prefix = f"{target.replace('.', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        name = prefix
+        seq = 1
+        while any(os.path.exists(os.path.join(self.output_dir, name + extension))
+                  for extension in {suffix, ".json", ".delta.json", *STREAM_EXTENSIONS.values()}):
+            name = f"{prefix}_{seq}"
+            seq += 1
+        return os.path.join(self.output_dir, name + suffix)
+    
+    async def _write_json(self, filepath: str, data: Dict[str, Any]):
+        async with aiofiles.open(filepath, 'w', encoding='utf-8') as f:
+            await f.write(json.dumps(data, indent=2, ensure_ascii=False))
+    
+    async def save_results(self, target: str, results: Dict[str, Any],
+                           module_timestamps: Optional[Dict[str, str]] = None) -> str:
         """
         将扫描结果保存到JSON文件
         
         参数:
             target: 被扫描的目标域名/IP
             results: 扫描结果字典
+            module_timestamps: 各模块结果的获取时间，默认均为当前时间（供增量扫描判断是否过期）
             
         返回:
             保存文件的路径
         """
         try:
             # 使用时间戳创建文件名
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{target.replace('.', '_')}_{timestamp}.json"
-            filepath = os.path.join(self.output_dir, filename)
+            filepath = self._new_result_path(target)
+            scan_timestamp = datetime.now().isoformat()
             
             # 添加元数据
             output_data = {
                 "target": target,
-                "scan_timestamp": datetime.now().isoformat(),
+                "scan_timestamp": scan_timestamp,
+                "module_timestamps": module_timestamps or {name: scan_timestamp for name in results},
                 "results": results
             }
             
             # 异步写入文件
-            async with aiofiles.open(filepath, 'w', encoding='utf-8') as f:
-                await f.write(json.dumps(output_data, indent=2, ensure_ascii=False))
+            await self._write_json(filepath, output_data)
+            await asyncio.to_thread(self.catalog.record, filepath, target, scan_timestamp, "full",
+                                    results, summarize_results(results))
+            await self._index_findings(filepath, target, scan_timestamp, results)
             
             logger.info(f"结果已保存到 {filepath}")
             return filepath
@@ -57,6 +89,206 @@ class ResultsStorage:
             logger.error(f"保存 {target} 的结果时出错: {str(e)}")
             raise
     
+    def open_result_stream(self, target: str, compression: Optional[str] = None) -> ResultStreamWriter:
+        """
+        创建流式结果写入器，模块完成后即可逐个写入，完成后调用 close_result_stream
+        
+        参数:
+            target: 被扫描的目标域名/IP
+            compression: 压缩方式（zstd、gzip 或 none），默认为 settings.result_compression
+            
+        返回:
+            ResultStreamWriter，第一次写入时创建文件
+        """
+        return ResultStreamWriter(self._new_result_path(target, stream_extension(compression)), target)
+    
+    async def close_result_stream(self, writer: ResultStreamWriter) -> str:
+        """
+        关闭流式结果写入器并记录到结果索引
+        
+        参数:
+            writer: open_result_stream 返回的写入器
+            
+        返回:
+            保存文件的路径
+        """
+        summary = {name: writer.length(module_name, field) for name, (module_name, field) in SUMMARY_FIELDS.items()}
+        summary["errors"] = writer.errors
+        await writer.close(summary)
+        await asyncio.to_thread(self.catalog.record, writer.filepath, writer.target, writer.scan_timestamp,
+                                "jsonl", writer.module_timestamps, summary)
+        # 从刚写入的文件中逐条读取发现，不需要在内存中保留整个结果
+        await self._index_findings(writer.filepath, writer.target, writer.scan_timestamp)
+        logger.info(f"流式结果已保存到 {writer.filepath}")
+        return writer.filepath
+    
+    async def save_results_stream(self, target: str, results: Dict[str, Any],
+                                  compression: Optional[str] = None) -> str:
+        """
+        将已有的扫描结果保存为压缩的 JSON Lines 文件
+        
+        参数:
+            target: 被扫描的目标域名/IP
+            results: 扫描结果字典
+            compression: 压缩方式，默认为 settings.result_compression
+            
+        返回:
+            保存文件的路径
+        """
+        try:
+            writer = self.open_result_stream(target, compression)
+            await writer.open()
+            await writer.write_results(results)
+            return await self.close_result_stream(writer)
+            
+        except Exception as e:
+            logger.error(f"保存 {target} 的流式结果时出错: {str(e)}")
+            raise
+    
+    async def iter_result_records(self, filepath: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        逐条读取流式结果文件中的记录（每个子域名、端口、文件、凭证各为一条），不会一次性载入整个文件
+        
+        参数:
+            filepath: 流式结果文件的路径
+            
+        产出:
+            记录字典，格式见 ResultStreamWriter
+        """
+        async for record in aiter_records(filepath):
+            yield record
+    
+    async def save_incremental_results(self, target: str, results: Dict[str, Any],
+                                       previous: Optional[Dict[str, Any]],
+                                       skipped: Optional[List[str]] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        增量保存扫描结果：只写入与上一次结果的差异以及指向基准文件的指针
+        
+        没有上一次结果，或增量链已达到 settings.incremental_max_chain 时写入完整结果。
+        本次出错而上一次成功的模块沿用上一次的结果，不会被记录为全部删除。
+        
+        参数:
+            target: 被扫描的目标域名/IP
+            results: 本次的完整扫描结果（包括沿用的模块）
+            previous: load_latest_results 返回的上一次结果，没有时为None
+            skipped: 因结果仍然新鲜而沿用、未重新运行的模块
+            
+        返回:
+            (保存文件的路径, 差异字典) 元组
+        """
+        try:
+            scan_timestamp = datetime.now().isoformat()
+            previous_results = previous["results"] if previous else {}
+            previous_timestamps = previous.get("module_timestamps", {}) if previous else {}
+            carried = set(skipped or [])
+            
+            merged = {}
+            errors = {}
+            for name, module_results in results.items():
+                old = previous_results.get(name)
+                if "error" in module_results and old is not None and "error" not in old:
+                    errors[name] = module_results["error"]
+                    merged[name] = old
+                    carried.add(name)
+                else:
+                    merged[name] = module_results
+            # 本次未运行的模块保持不变
+            for name, old in previous_results.items():
+                if name not in merged:
+                    merged[name] = old
+                    carried.add(name)
+            
+            module_timestamps = {
+                name: previous_timestamps.get(name, scan_timestamp) if name in carried else scan_timestamp
+                for name in merged
+            }
+            diff = diff_results(previous_results, merged) if previous else {}
+            
+            chain_length = previous.get("chain_length", 0) + 1 if previous else 0
+            if previous is None or chain_length > settings.incremental_max_chain:
+                filepath = await self.save_results(target, merged, module_timestamps)
+                return filepath, diff
+            
+            filepath = self._new_result_path(target, ".delta.json")
+            summary = summarize_results(merged)
+            await self._write_json(filepath, {
+                "target": target,
+                "scan_timestamp": scan_timestamp,
+                "type": "delta",
+                "base": os.path.basename(previous["filepath"]),
+                "chain_length": chain_length,
+                "module_timestamps": module_timestamps,
+                "skipped": sorted(carried & set(merged)),
+                "errors": errors,
+                "summary": summary,
+                "diff": diff
+            })
+            await asyncio.to_thread(self.catalog.record, filepath, target, scan_timestamp, "delta",
+                                    merged, summary)
+            await self._index_findings(filepath, target, scan_timestamp, merged)
+            
+            logger.info(f"增量结果已保存到 {filepath}（基于 {previous['filepath']}）")
+            return filepath, diff
+            
+        except Exception as e:
+            logger.error(f"增量保存 {target} 的结果时出错: {str(e)}")
+            raise
+    
+    async def resolve_results(self, filepath: str) -> Dict[str, Any]:
+        """
+        加载结果文件，增量文件会沿基准指针回溯并依次应用差异，得到完整结果
+        
+        参数:
+            filepath: 结果文件的路径
+            
+        返回:
+            包含完整 "results"、"module_timestamps" 和 "chain_length" 的结果字典
+        """
+        chain = []
+        current = filepath
+        while True:
+            data = await self.load_results(current)
+            if data.get("type") != "delta":
+                break
+            chain.append(data)
+            current = os.path.join(os.path.dirname(current), data["base"])
+        
+        results = data.get("results", {})
+        module_timestamps = dict(data.get("module_timestamps")
+                                 or {name: data.get("scan_timestamp") for name in results})
+        for delta in reversed(chain):
+            results = apply_diff(results, delta["diff"])
+            module_timestamps.update(delta.get("module_timestamps", {}))
+        
+        latest = chain[0] if chain else data
+        return {
+            "target": latest.get("target"),
+            "scan_timestamp": latest.get("scan_timestamp"),
+            "module_timestamps": module_timestamps,
+            "results": results,
+            "chain_length": len(chain),
+            "filepath": filepath
+        }
+    
+    async def load_latest_results(self, target: str) -> Optional[Dict[str, Any]]:
+        """
+        加载目标最近一次的完整结果（见 resolve_results）
+        
+        参数:
+            target: 目标域名/IP
+            
+        返回:
+            结果字典，没有保存过结果或结果无法还原时返回None
+        """
+        latest = await asyncio.to_thread(self.catalog.latest, target, RESTORABLE_TYPES)
+        if latest is None:
+            return None
+        try:
+            return await self.resolve_results(latest["filepath"])
+        except Exception as e:
+            logger.warning(f"还原 {target} 的上一次结果时出错，将执行完整扫描: {str(e)}")
+            return None
+    
     async def save_results_as_text(self, target: str, results: Dict[str, Any]) -> str:
         """
         将扫描结果保存为人类可读的文本文件
@@ -70,9 +302,7 @@ class ResultsStorage:
         """
         try:
             # 使用时间戳创建文件名
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{target.replace('.', '_')}_{timestamp}.txt"
-            filepath = os.path.join(self.output_dir, filename)
+            filepath = self._new_result_path(target, ".txt")
             
             # 将结果格式化为文本
             text_content = self._format_results_as_text(target, results)
@@ -80,6 +310,10 @@ class ResultsStorage:
             # 异步写入文件
             async with aiofiles.open(filepath, 'w', encoding='utf-8') as f:
                 await f.write(text_content)
+            scan_timestamp = datetime.now().isoformat()
+            await asyncio.to_thread(self.catalog.record, filepath, target, scan_timestamp, "text",
+                                    results, summarize_results(results))
+            await self._index_findings(filepath, target, scan_timestamp, results)
             
             logger.info(f"文本结果已保存到 {filepath}")
             return filepath
@@ -118,11 +352,13 @@ class ResultsStorage:
                 # 根据模块类型格式化
                 if module_name == "whois":
                     whois_data = module_results.get("whois_data", {})
-                    lines.append(f"查询的来源: {len(whois_data)}")
-                    for source, data in whois_data.items():
-                        lines.append(f"  来源: {source}")
-                        for key, value in data.items():
-                            lines.append(f"    {key}: {value}")
+                    lines.append(f"查询的WHOIS服务器: {', '.join(whois_data.get('servers', []))}")
+                    for key, value in whois_data.items():
+                        if key in ("servers", "raw"):
+                            continue
+                        if isinstance(value, list):
+                            value = ", ".join(value)
+                        lines.append(f"  {key}: {value}")
                 
                 elif module_name == "domain":
                     subdomains = module_results.get("subdomains", [])
@@ -207,15 +443,17 @@ class ResultsStorage:
     
     async def load_results(self, filepath: str) -> Dict[str, Any]:
         """
-        从JSON文件加载扫描结果
+        从JSON文件或流式结果文件加载扫描结果
         
         参数:
-            filepath: JSON文件的路径
+            filepath: 结果文件的路径（.json 或 .jsonl、.jsonl.gz、.jsonl.zst）
             
         返回:
             包含扫描结果的字典
         """
         try:
+            if is_stream_file(filepath):
+                return await asyncio.to_thread(lambda: build_document(iter_records(filepath)))
             async with aiofiles.open(filepath, 'r', encoding='utf-8') as f:
                 content = await f.read()
                 return json.loads(content)
@@ -224,26 +462,117 @@ class ResultsStorage:
             logger.error(f"从 {filepath} 加载结果时出错: {str(e)}")
             raise
     
-    def list_saved_results(self) -> list:
+    def list_saved_results(self, target: Optional[str] = None, since: Optional[str] = None,
+                           until: Optional[str] = None, has_open_ports: Optional[bool] = None,
+                           limit: Optional[int] = None, offset: int = 0) -> list:
         """
-        列出所有保存的结果文件
+        列出保存的结果文件（查询结果索引，不遍历结果目录）
         
+        参数:
+            target: 只列出该目标的结果
+            since: 扫描时间下限（ISO格式日期或时间）
+            until: 扫描时间上限（只给出日期时包含当天）
+            has_open_ports: True 只列出有开放端口的结果，False 只列出没有的
+            limit: 最多返回的条数，None表示不限制
+            offset: 跳过的条数（分页）
+            
         返回:
-            保存的结果文件列表
+            按扫描时间从新到旧排序的结果文件列表，包含文件名、路径、目标、类型、模块、大小和摘要计数
         """
         try:
-            files = []
-            if os.path.exists(self.output_dir):
-                for filename in os.listdir(self.output_dir):
-                    if filename.endswith('.json') or filename.endswith('.txt'):
-                        filepath = os.path.join(self.output_dir, filename)
-                        files.append({
-                            "filename": filename,
-                            "filepath": filepath,
-                            "modified": datetime.fromtimestamp(os.path.getmtime(filepath)).isoformat()
-                        })
-            return files
+            return self.catalog.query(target, since, until, has_open_ports, limit=limit, offset=offset)
             
         except Exception as e:
             logger.error(f"列出保存的结果时出错: {str(e)}")
             return []
+    
+    def count_saved_results(self, target: Optional[str] = None, since: Optional[str] = None,
+                            until: Optional[str] = None, has_open_ports: Optional[bool] = None) -> int:
+        """统计满足条件的结果文件数，参数同 list_saved_results"""
+        return self.catalog.count(target, since, until, has_open_ports)
+    
+    @staticmethod
+    def _stream_findings(filepath: str) -> Iterator[Tuple[str, str, str, str]]:
+        for record in iter_records(filepath):
+            if record["type"] in ("item", "value"):
+                for kind, value, context in extract_findings(record["module"], record["field"], record["value"]):
+                    yield record["module"], kind, value, context
+    
+    async def _index_findings(self, filepath: str, target: str, scan_timestamp: str,
+                              results: Optional[Dict[str, Any]] = None):
+        """把结果文件中的发现写入全文索引，索引出错不影响结果的保存"""
+        scan_key = os.path.basename(filepath)
+        try:
+            if results is None:
+                await asyncio.to_thread(self.findings.add, scan_key, "agent", target, scan_timestamp,
+                                        self._stream_findings(filepath))
+            else:
+                await asyncio.to_thread(self.findings.add_results, scan_key, "agent", target, scan_timestamp, results)
+        except Exception as e:
+            logger.warning(f"为 {filepath} 建立发现索引时出错: {str(e)}")
+    
+    def search_findings(self, query: str, kind: Optional[str] = None, target: Optional[str] = None,
+                        since: Optional[str] = None, until: Optional[str] = None,
+                        limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        在所有已保存扫描（包括 ai_agent_framework 写入的任务）的发现中按子串查询
+        
+        参数:
+            query: 要查找的文本，如 ".git/config" 或令牌的一部分
+            kind: 只返回该类型（subdomain、url、banner、snippet、credential）的发现
+            target: 只返回该目标的发现
+            since: 扫描时间下限（ISO格式日期或时间）
+            until: 扫描时间上限（只给出日期时包含当天）
+            limit: 最多返回的条数
+            offset: 跳过的条数（分页）
+            
+        返回:
+            发现列表，见 FindingsIndex.search
+        """
+        return self.findings.search(query, kind, target, since, until, limit=limit, offset=offset)
+    
+    def count_findings(self, query: str, kind: Optional[str] = None, target: Optional[str] = None,
+                       since: Optional[str] = None, until: Optional[str] = None) -> int:
+        """统计匹配的发现数，参数同 search_findings"""
+        return self.findings.count(query, kind, target, since, until)
+    
+    def search_scans(self, query: str, kind: Optional[str] = None, target: Optional[str] = None,
+                     since: Optional[str] = None, until: Optional[str] = None,
+                     limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """列出出现过匹配发现的扫描（如哪些扫描暴露过 .git/config），参数同 search_findings"""
+        return self.findings.scans(query, kind, target, since, until, limit=limit, offset=offset)
+    
+    async def rebuild_findings_index(self) -> int:
+        """
+        根据结果索引中的全部结果文件重新建立发现索引（不影响 ai_agent_framework 写入的发现；
+        文本结果无法重新解析，不会被重新索引）
+        
+        返回:
+            建立索引的结果文件数
+        """
+        await asyncio.to_thread(self.findings.clear, "agent")
+        indexed = 0
+        for entry in self.catalog.query():
+            try:
+                if entry["type"] == "jsonl":
+                    await self._index_findings(entry["filepath"], entry["target"], entry["scan_timestamp"])
+                elif entry["type"] in ("full", "delta"):
+                    data = await self.resolve_results(entry["filepath"])
+                    await self._index_findings(entry["filepath"], entry["target"], entry["scan_timestamp"],
+                                               data["results"])
+                else:
+                    continue
+                indexed += 1
+            except Exception as e:
+                logger.warning(f"为 {entry['filepath']} 建立发现索引时出错: {str(e)}")
+        logger.info(f"已重建发现索引: {indexed} 个结果文件")
+        return indexed
+    
+    def rebuild_catalog(self) -> int:
+        """
+        重新索引结果目录中的所有结果文件
+        
+        返回:
+            索引的文件数
+        """
+        return self.catalog.rebuild(self.output_dir)
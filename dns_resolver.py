@@ -0,0 +1,499 @@
+import asyncio
+import ipaddress
+import logging
+import os
+import random
+import socket
+import struct
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+RECORD_TYPES = {
+    "A": 1,
+    "NS": 2,
+    "CNAME": 5,
+    "SOA": 6,
+    "MX": 15,
+    "TXT": 16,
+    "AAAA": 28
+}
+RECORD_NAMES = {value: key for key, value in RECORD_TYPES.items()}
+
+RCODES = {
+    0: "NOERROR",
+    1: "FORMERR",
+    2: "SERVFAIL",
+    3: "NXDOMAIN",
+    4: "NOTIMP",
+    5: "REFUSED"
+}
+
+# EDNS0 通告的UDP报文大小，避免大多数TXT/MX应答被截断
+EDNS_UDP_SIZE = 1232
+FALLBACK_NAMESERVERS = ["8.8.8.8", "1.1.1.1"]
+# 大量并发查询的应答会同时到达，放大接收缓冲区以免内核丢包
+UDP_RECEIVE_BUFFER = 4 * 1024 * 1024
+
+
+class DNSError(Exception):
+    """DNS查询失败（超时、所有服务器均返回错误等）"""
+
+
+def encode_name(name: str) -> bytes:
+    """将域名编码为DNS报文中的标签序列"""
+    encoded = b""
+    for label in name.rstrip(".").split("."):
+        if not label:
+            continue
+        try:
+            raw = label.encode("ascii")
+        except UnicodeEncodeError:
+            raw = label.encode("idna")
+        if len(raw) > 63:
+            raise DNSError(f"标签过长: {label}")
+        encoded += bytes([len(raw)]) + raw
+    return encoded + b"\x00"
+
+
+def build_query(query_id: int, name: str, qtype: int) -> bytes:
+    """构造一个期望递归（RD）并带EDNS0的DNS查询报文"""
+    header = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 1)
+    question = encode_name(name) + struct.pack("!HH", qtype, 1)
+    opt = b"\x00" + struct.pack("!HHIH", 41, EDNS_UDP_SIZE, 0, 0)
+    return header + question + opt
+
+
+def _read_name(data: bytes, offset: int) -> Tuple[str, int]:
+    """读取（可能经过压缩的）域名，返回域名和之后的偏移"""
+    labels = []
+    end_offset = None
+    jumps = 0
+    while True:
+        if offset >= len(data):
+            raise DNSError("报文中的域名越界")
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end_offset is None:
+                end_offset = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            jumps += 1
+            if jumps > 64:
+                raise DNSError("报文中的域名压缩指针循环")
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(data[offset:offset + length].decode("ascii", errors="replace"))
+        offset += length
+    return ".".join(labels).lower(), end_offset if end_offset is not None else offset
+
+
+def _parse_rdata(data: bytes, rtype: int, offset: int, length: int) -> Any:
+    """按记录类型解析RDATA"""
+    rdata = data[offset:offset + length]
+    if rtype == RECORD_TYPES["A"] and length == 4:
+        return str(ipaddress.IPv4Address(rdata))
+    if rtype == RECORD_TYPES["AAAA"] and length == 16:
+        return str(ipaddress.IPv6Address(rdata))
+    if rtype in (RECORD_TYPES["CNAME"], RECORD_TYPES["NS"]):
+        return _read_name(data, offset)[0]
+    if rtype == RECORD_TYPES["MX"]:
+        preference = struct.unpack("!H", rdata[:2])[0]
+        return {"preference": preference, "exchange": _read_name(data, offset + 2)[0]}
+    if rtype == RECORD_TYPES["TXT"]:
+        parts = []
+        position = 0
+        while position < length:
+            size = rdata[position]
+            parts.append(rdata[position + 1:position + 1 + size].decode("utf-8", errors="replace"))
+            position += 1 + size
+        return "".join(parts)
+    if rtype == RECORD_TYPES["SOA"]:
+        mname, position = _read_name(data, offset)
+        rname, position = _read_name(data, position)
+        serial, refresh, retry, expire, minimum = struct.unpack("!IIIII", data[position:position + 20])
+        return {"mname": mname, "rname": rname, "serial": serial, "minimum": minimum}
+    return rdata.hex()
+
+
+def parse_response(data: bytes) -> Dict[str, Any]:
+    """
+    解析DNS应答报文
+    
+    参数:
+        data: 原始报文
+        
+    返回:
+        包含ID、响应码、截断标志、问题、应答和授权记录的字典；截断（TC）的应答不解析应答和授权记录
+        
+    异常:
+        DNSError: 报文格式错误
+    """
+    if len(data) < 12:
+        raise DNSError("DNS报文过短")
+    query_id, flags, qdcount, ancount, nscount, _ = struct.unpack("!HHHHHH", data[:12])
+    # 截断的应答会通过TCP重新查询，其中的记录可能在中途被截断，不必解析
+    truncated = bool(flags & 0x0200)
+    offset = 12
+    
+    questions = []
+    sections = [[], []]
+    try:
+        for _ in range(qdcount):
+            name, offset = _read_name(data, offset)
+            qtype, _qclass = struct.unpack("!HH", data[offset:offset + 4])
+            offset += 4
+            questions.append((name, qtype))
+        
+        if not truncated:
+            for records, count in zip(sections, (ancount, nscount)):
+                for _ in range(count):
+                    name, offset = _read_name(data, offset)
+                    rtype, _rclass, ttl, length = struct.unpack("!HHIH", data[offset:offset + 10])
+                    offset += 10
+                    if offset + length > len(data):
+                        raise DNSError("报文中的记录越界")
+                    records.append((name, rtype, ttl, _parse_rdata(data, rtype, offset, length)))
+                    offset += length
+    except (DNSError, struct.error, IndexError, ValueError) as e:
+        if isinstance(e, DNSError) and not truncated:
+            raise
+        if not truncated:
+            raise DNSError(f"DNS报文格式错误: {str(e)}")
+        # 连问题部分都被截断时不再校验问题，直接交给TCP重新查询
+        questions = []
+    
+    return {
+        "id": query_id,
+        "rcode": flags & 0x000F,
+        "truncated": truncated,
+        "questions": questions,
+        "answers": sections[0],
+        "authority": sections[1]
+    }
+
+
+def parse_nameserver(nameserver: str) -> Tuple[str, int]:
+    """解析 "ip"、"ip:port" 或 "[ipv6]:port" 形式的服务器地址"""
+    if nameserver.startswith("["):
+        host, _, port = nameserver[1:].partition("]:")
+        return host, int(port or 53)
+    if nameserver.count(":") == 1:
+        host, port = nameserver.split(":")
+        return host, int(port)
+    return nameserver, 53
+
+
+def system_nameservers() -> List[str]:
+    """读取 /etc/resolv.conf 中的DNS服务器，读取不到时使用公共DNS"""
+    nameservers = []
+    if os.path.exists("/etc/resolv.conf"):
+        with open("/etc/resolv.conf", "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == "nameserver":
+                    nameservers.append(parts[1])
+    return nameservers or list(FALLBACK_NAMESERVERS)
+
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+    """单个DNS服务器的UDP连接，按事务ID复用同一个套接字"""
+    
+    def __init__(self):
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.pending: Dict[int, asyncio.Future] = {}
+    
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RECEIVE_BUFFER)
+            except OSError:
+                pass
+    
+    def datagram_received(self, data, addr):
+        if len(data) < 12:
+            return
+        future = self.pending.pop(int.from_bytes(data[:2], "big"), None)
+        if future is not None and not future.done():
+            future.set_result(data)
+    
+    def error_received(self, exc):
+        # ICMP错误无法对应到具体查询，让所有等待中的查询尽快重试
+        self._fail_pending(exc)
+    
+    def connection_lost(self, exc):
+        self._fail_pending(exc or DNSError("DNS连接已关闭"))
+    
+    def _fail_pending(self, exc):
+        pending, self.pending = self.pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(DNSError(str(exc)))
+
+
+class DNSResolver:
+    """
+    带TTL缓存的异步DNS解析器
+    
+    支持 A/AAAA/CNAME/MX/NS/TXT 查询，按记录TTL缓存肯定应答，按SOA最小TTL缓存否定应答（NXDOMAIN/无数据），
+    相同名称和类型的并发查询只会发出一次请求。查询在配置的服务器池中轮转并在超时后重试。
+    """
+    
+    def __init__(self, nameservers: Optional[List[str]] = None,
+                 timeout: Optional[float] = None,
+                 retries: Optional[int] = None,
+                 cache_size: Optional[int] = None,
+                 negative_ttl: Optional[int] = None,
+                 max_inflight: Optional[int] = None):
+        configured = nameservers or settings.dns_nameservers or system_nameservers()
+        self.nameservers = [parse_nameserver(nameserver) for nameserver in configured]
+        self.timeout = timeout or settings.dns_timeout
+        self.retries = retries if retries is not None else settings.dns_retries
+        self.cache_size = cache_size or settings.dns_cache_size
+        self.negative_ttl = negative_ttl if negative_ttl is not None else settings.dns_negative_ttl
+        self.max_inflight = max_inflight or settings.dns_max_inflight
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._protocols: Dict[Tuple[str, int], _UDPProtocol] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._next_server = 0
+        self.stats = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "queries": 0,
+            "timeouts": 0
+        }
+    
+    async def __aenter__(self) -> "DNSResolver":
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+    
+    async def close(self):
+        """关闭所有到DNS服务器的UDP连接"""
+        for protocol in self._protocols.values():
+            if protocol.transport is not None:
+                protocol.transport.close()
+        self._protocols.clear()
+        self._semaphore = None
+    
+    def get_cache_stats(self) -> Dict[str, int]:
+        """获取缓存命中、未命中和查询统计"""
+        return dict(self.stats, size=len(self._cache))
+    
+    async def resolve(self, name: str, rdtype: str = "A") -> Dict[str, Any]:
+        """
+        解析域名的指定类型记录
+        
+        参数:
+            name: 要解析的域名
+            rdtype: 记录类型（A、AAAA、CNAME、MX、NS、TXT）
+            
+        返回:
+            包含名称、类型、记录列表、CNAME链、TTL和响应码的字典；
+            该字典可能被缓存并与其他调用方共享，调用方不应修改它
+            
+        异常:
+            DNSError: 所有服务器均超时或返回错误
+        """
+        rdtype = rdtype.upper()
+        if rdtype not in RECORD_TYPES:
+            raise ValueError(f"不支持的记录类型: {rdtype}")
+        key = (name.rstrip(".").lower(), rdtype)
+        
+        cached = self._cache.get(key)
+        if cached is not None:
+            expires_at, result = cached
+            if expires_at > time.monotonic():
+                self._cache.move_to_end(key)
+                self.stats["negative_hits" if not result["records"] else "hits"] += 1
+                return result
+            del self._cache[key]
+        
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+        
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._lookup(*key)
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e if isinstance(e, Exception) else DNSError("查询已取消"))
+            # 避免没有其他等待者时出现 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+    
+    async def resolve_address(self, host: str) -> Optional[str]:
+        """
+        将主机名解析为一个IP地址（优先IPv4，DNS中没有记录时回退到系统解析器）
+        
+        参数:
+            host: 主机名或IP
+            
+        返回:
+            IP地址，无法解析时返回None
+        """
+        try:
+            ipaddress.ip_address(host)
+            return host
+        except ValueError:
+            pass
+        
+        for rdtype in ("A", "AAAA"):
+            try:
+                result = await self.resolve(host, rdtype)
+            except DNSError as e:
+                logger.warning(f"解析 {host} 的{rdtype}记录时出错: {str(e)}")
+                continue
+            if result["records"]:
+                return result["records"][0]
+        
+        # /etc/hosts 等本地名称不在DNS中，交给系统解析器
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except socket.gaierror:
+            return None
+        return infos[0][4][0] if infos else None
+    
+    async def _lookup(self, name: str, rdtype: str) -> Dict[str, Any]:
+        """执行一次真实查询并写入缓存"""
+        qtype = RECORD_TYPES[rdtype]
+        response = await self._query(name, qtype)
+        
+        records = []
+        cnames = []
+        ttls = []
+        for _owner, rtype, ttl, value in response["answers"]:
+            if rtype == qtype:
+                records.append(value)
+                ttls.append(ttl)
+            elif rtype == RECORD_TYPES["CNAME"]:
+                cnames.append(value)
+                ttls.append(ttl)
+        
+        if records or (rdtype == "CNAME" and cnames):
+            ttl = min(ttls)
+        else:
+            # RFC 2308: 否定应答的缓存时间取SOA的TTL与MINIMUM中较小者
+            soa = [(ttl, value) for _owner, rtype, ttl, value in response["authority"]
+                   if rtype == RECORD_TYPES["SOA"]]
+            ttl = min(soa[0][0], soa[0][1]["minimum"]) if soa else self.negative_ttl
+        
+        result = {
+            "name": name,
+            "type": rdtype,
+            "records": records,
+            "cnames": cnames,
+            "ttl": ttl,
+            "rcode": RCODES.get(response["rcode"], str(response["rcode"]))
+        }
+        self._store(name, rdtype, result, ttl)
+        return result
+    
+    def _store(self, name: str, rdtype: str, result: Dict[str, Any], ttl: int):
+        """写入LRU缓存"""
+        ttl = min(ttl, settings.dns_max_ttl)
+        if ttl <= 0:
+            return
+        key = (name, rdtype)
+        self._cache[key] = (time.monotonic() + ttl, result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    async def _query(self, name: str, qtype: int) -> Dict[str, Any]:
+        """在服务器池中轮转查询，直到获得NOERROR或NXDOMAIN应答"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_inflight)
+        
+        last_error = None
+        start = self._next_server
+        self._next_server = (self._next_server + 1) % len(self.nameservers)
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                server = self.nameservers[(start + attempt) % len(self.nameservers)]
+                try:
+                    response = await self._query_udp(server, name, qtype)
+                    if response["truncated"]:
+                        response = await self._query_tcp(server, name, qtype)
+                except asyncio.TimeoutError:
+                    self.stats["timeouts"] += 1
+                    last_error = DNSError(f"查询 {name} 超时 ({server[0]}:{server[1]})")
+                    continue
+                except (DNSError, OSError) as e:
+                    last_error = DNSError(f"查询 {name} 失败 ({server[0]}:{server[1]}): {str(e)}")
+                    continue
+                
+                if response["rcode"] in (0, 3):
+                    return response
+                last_error = DNSError(f"{server[0]}:{server[1]} 对 {name} 返回 {RCODES.get(response['rcode'], response['rcode'])}")
+        
+        raise last_error
+    
+    async def _get_protocol(self, server: Tuple[str, int]) -> _UDPProtocol:
+        protocol = self._protocols.get(server)
+        if protocol is None or protocol.transport is None or protocol.transport.is_closing():
+            loop = asyncio.get_running_loop()
+            _, protocol = await loop.create_datagram_endpoint(_UDPProtocol, remote_addr=server)
+            self._protocols[server] = protocol
+        return protocol
+    
+    def _check_response(self, response: Dict[str, Any], name: str, qtype: int):
+        if response["questions"] and response["questions"][0] != (name, qtype):
+            raise DNSError("应答与查询的问题不匹配")
+    
+    async def _query_udp(self, server: Tuple[str, int], name: str, qtype: int) -> Dict[str, Any]:
+        protocol = await self._get_protocol(server)
+        query_id = random.getrandbits(16)
+        while query_id in protocol.pending:
+            query_id = random.getrandbits(16)
+        
+        future = asyncio.get_running_loop().create_future()
+        protocol.pending[query_id] = future
+        self.stats["queries"] += 1
+        try:
+            protocol.transport.sendto(build_query(query_id, name, qtype))
+            data = await asyncio.wait_for(future, self.timeout)
+        finally:
+            protocol.pending.pop(query_id, None)
+        
+        response = parse_response(data)
+        self._check_response(response, name, qtype)
+        return response
+    
+    async def _query_tcp(self, server: Tuple[str, int], name: str, qtype: int) -> Dict[str, Any]:
+        """应答被截断时通过TCP重新查询"""
+        query = build_query(random.getrandbits(16), name, qtype)
+        self.stats["queries"] += 1
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(*server), self.timeout)
+        try:
+            writer.write(struct.pack("!H", len(query)) + query)
+            await writer.drain()
+            length = struct.unpack("!H", await asyncio.wait_for(reader.readexactly(2), self.timeout))[0]
+            data = await asyncio.wait_for(reader.readexactly(length), self.timeout)
+        except asyncio.IncompleteReadError as e:
+            raise DNSError(f"TCP应答不完整: {str(e)}")
+        finally:
+            writer.close()
+        
+        response = parse_response(data)
+        self._check_response(response, name, qtype)
+        return response
@@ -1,115 +1,164 @@
 #!/usr/bin/env python3
 """
 Data export script for AI Information Gathering Agent
+
+Tables are read in chunks with QuerySet.iterator() and written to the output files as they are
+read, so memory use does not grow with the size of a table. JSON and JSONL exports use Django's
+fixture format and can be loaded back with `manage.py loaddata`, compressed or not. Models are
+exported in parallel, each by its own thread with its own database connection.
 """
 
 import os
 import sys
-import json
 import csv
+import bz2
+import gzip
+import lzma
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import django
-from django.core.serializers import serialize
-from django.core.management import execute_from_command_line
+from django.core import serializers
 
 # Add the project directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# The Django project's settings refer to its apps by their top-level names (keywords_app, ...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'django_ai_agent'))
 
 # Set Django settings module
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_ai_agent.ai_agent_project.settings')
 
-def export_to_json(output_dir='exports'):
-    """Export all data to JSON format."""
-    print("Exporting data to JSON format...")
+# (file name, model) of the exported tables
+EXPORT_MODELS = [
+    ('keywords', 'keywords_app.Keyword'),
+    ('keyword_searches', 'keywords_app.KeywordSearch'),
+    ('person_information', 'keywords_app.PersonInformation'),
+    ('reports', 'reports_app.Report'),
+    ('platforms', 'config_app.Platform'),
+    ('ai_models', 'config_app.AIModel'),
+]
+
+# Compression name -> (file suffix, open function); loaddata recognizes the same suffixes
+COMPRESSIONS = {
+    'none': ('', open),
+    'gzip': ('.gz', gzip.open),
+    'bz2': ('.bz2', bz2.open),
+    'xz': ('.xz', lzma.open),
+}
+
+# Rows fetched from the database at a time
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_WORKERS = 4
+
+def _counted(iterable, counter):
+    for item in iterable:
+        counter[0] += 1
+        yield item
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+def write_serialized(queryset, format, stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream a queryset to a file in Django's json or jsonl fixture format, returning the row count"""
+    counter = [0]
+    serializers.serialize(format, _counted(queryset.iterator(chunk_size=chunk_size), counter), stream=stream)
+    if format == 'json':
+        stream.write('\n')
+    return counter[0]
+
+def write_csv(queryset, stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream a queryset to a CSV file with one column per field, returning the row count"""
+    # Foreign keys are written as their ids (keyword_id, created_by_id, ...)
+    columns = [field.attname for field in queryset.model._meta.concrete_fields]
+    writer = csv.writer(stream)
+    writer.writerow(columns)
+    count = 0
+    for row in queryset.values_list(*columns).iterator(chunk_size=chunk_size):
+        writer.writerow([_csv_value(value) for value in row])
+        count += 1
+    return count
+
+def export_model(name, model_label, format, output_dir='exports', compress='none', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Export one model to {output_dir}/{name}.{format}[.gz|.bz2|.xz]
+    
+    The file is written under a temporary name and renamed when complete, so an interrupted
+    export never leaves a truncated file behind. Returns (path, number of rows).
+    """
+    from django.apps import apps
+    from django.db import connection
+    
+    model = apps.get_model(model_label)
+    suffix, open_file = COMPRESSIONS[compress]
+    path = os.path.join(output_dir, f"{name}.{format}{suffix}")
+    tmp_path = path + '.tmp'
+    queryset = model._default_manager.order_by('pk')
     try:
-        # Setup Django
-        django.setup()
-        
-        # Import models
-        from django_ai_agent.keywords_app.models import Keyword
-        from django_ai_agent.reports_app.models import Report
-        from django_ai_agent.config_app.models import Configuration
-        
-        # Create output directory
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Export Keywords
-        keywords = Keyword.objects.all()
-        keywords_data = serialize('json', keywords)
-        with open(os.path.join(output_dir, 'keywords.json'), 'w', encoding='utf-8') as f:
-            f.write(keywords_data)
-        print(f"✓ Exported {keywords.count()} keywords to keywords.json")
-        
-        # Export Reports
-        reports = Report.objects.all()
-        reports_data = serialize('json', reports)
-        with open(os.path.join(output_dir, 'reports.json'), 'w', encoding='utf-8') as f:
-            f.write(reports_data)
-        print(f"✓ Exported {reports.count()} reports to reports.json")
-        
-        # Export Configurations
-        configs = Configuration.objects.all()
-        configs_data = serialize('json', configs)
-        with open(os.path.join(output_dir, 'configurations.json'), 'w', encoding='utf-8') as f:
-            f.write(configs_data)
-        print(f"✓ Exported {configs.count()} configurations to configurations.json")
-        
-        print("✓ JSON export completed successfully")
-        return True
-        
-    except Exception as e:
-        print(f"✗ Failed to export data to JSON: {e}")
-        return False
+        with open_file(tmp_path, 'wt', encoding='utf-8', newline='') as f:
+            if format == 'csv':
+                count = write_csv(queryset, f, chunk_size)
+            else:
+                count = write_serialized(queryset, format, f, chunk_size)
+        os.replace(tmp_path, path)
+        return path, count
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        # Each export thread has its own connection
+        connection.close()
 
-def export_to_csv(output_dir='exports'):
-    """Export all data to CSV format."""
-    print("Exporting data to CSV format...")
+def export_models(format, output_dir='exports', compress='none', chunk_size=DEFAULT_CHUNK_SIZE,
+                  workers=DEFAULT_WORKERS, names=None):
+    """Export the models in EXPORT_MODELS (or the given subset of names) in parallel."""
+    print(f"Exporting data to {format.upper()} format...")
     try:
         # Setup Django
         django.setup()
         
-        # Import models
-        from django_ai_agent.keywords_app.models import Keyword
-        from django_ai_agent.reports_app.models import Report
-        from django_ai_agent.config_app.models import Configuration
-        
         # Create output directory
         os.makedirs(output_dir, exist_ok=True)
         
-        # Export Keywords
-        keywords = Keyword.objects.all()
-        with open(os.path.join(output_dir, 'keywords.csv'), 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['ID', 'Name', 'Created At', 'Updated At'])  # Header
-            for keyword in keywords:
-                writer.writerow([keyword.id, keyword.name, keyword.created_at, keyword.updated_at])
-        print(f"✓ Exported {keywords.count()} keywords to keywords.csv")
-        
-        # Export Reports
-        reports = Report.objects.all()
-        with open(os.path.join(output_dir, 'reports.csv'), 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['ID', 'Title', 'Content', 'Created At', 'Updated At'])  # Header
-            for report in reports:
-                writer.writerow([report.id, report.title, report.content, report.created_at, report.updated_at])
-        print(f"✓ Exported {reports.count()} reports to reports.csv")
-        
-        # Export Configurations
-        configs = Configuration.objects.all()
-        with open(os.path.join(output_dir, 'configurations.csv'), 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['ID', 'Key', 'Value', 'Created At', 'Updated At'])  # Header
-            for config in configs:
-                writer.writerow([config.id, config.key, config.value, config.created_at, config.updated_at])
-        print(f"✓ Exported {configs.count()} configurations to configurations.csv")
-        
-        print("✓ CSV export completed successfully")
-        return True
+        jobs = [(name, label) for name, label in EXPORT_MODELS if not names or name in names]
+        success = True
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as executor:
+            futures = {
+                executor.submit(export_model, name, label, format, output_dir, compress, chunk_size): name
+                for name, label in jobs
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    path, count = future.result()
+                    print(f"✓ Exported {count} {name.replace('_', ' ')} to {os.path.basename(path)}")
+                except Exception as e:
+                    print(f"✗ Failed to export {name.replace('_', ' ')}: {e}")
+                    success = False
+        
+        if success:
+            print(f"✓ {format.upper()} export completed successfully")
+        return success
         
     except Exception as e:
-        print(f"✗ Failed to export data to CSV: {e}")
+        print(f"✗ Failed to export data to {format.upper()}: {e}")
         return False
 
-def export_database(output_dir='exports'):
+def export_to_json(output_dir='exports', **options):
+    """Export all data to JSON format."""
+    return export_models('json', output_dir, **options)
+
+def export_to_jsonl(output_dir='exports', **options):
+    """Export all data to JSON Lines format."""
+    return export_models('jsonl', output_dir, **options)
+
+def export_to_csv(output_dir='exports', **options):
+    """Export all data to CSV format."""
+    return export_models('csv', output_dir, **options)
+
+def export_database(output_dir='exports', compress='none'):
     """Export entire database using Django's dumpdata command."""
     print("Exporting entire database...")
     try:
@@ -119,22 +168,10 @@ def export_database(output_dir='exports'):
         # Create output directory
         os.makedirs(output_dir, exist_ok=True)
         
-        # Export using dumpdata
-        from django.core.management import execute_from_command_line
-        import io
-        from contextlib import redirect_stdout
-        
-        # Capture output
-        stdout_capture = io.StringIO()
-        with redirect_stdout(stdout_capture):
-            execute_from_command_line(['manage.py', 'dumpdata', '--format=json'])
-        
-        db_data = stdout_capture.getvalue()
-        
-        # Write to file
-        db_export_path = os.path.join(output_dir, 'database_dump.json')
-        with open(db_export_path, 'w', encoding='utf-8') as f:
-            f.write(db_data)
+        # dumpdata writes each object to the file as it is read, and compresses by file suffix
+        from django.core.management import call_command
+        db_export_path = os.path.join(output_dir, 'database_dump.json' + COMPRESSIONS[compress][0])
+        call_command('dumpdata', format='json', output=db_export_path, verbosity=0)
         
         print(f"✓ Database exported to {db_export_path}")
         return True
@@ -148,12 +185,26 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Data export utility for AI Information Gathering Agent')
-    parser.add_argument('--format', choices=['json', 'csv', 'database'], default='json',
+    parser.add_argument('--format', choices=['json', 'jsonl', 'csv', 'database'], default='json',
                        help='Export format (default: json)')
     parser.add_argument('--output-dir', default='exports', help='Output directory for exported files')
     parser.add_argument('--all', '-a', action='store_true', help='Export in all formats')
+    parser.add_argument('--compress', choices=list(COMPRESSIONS), default='none',
+                       help='Compress the exported files (default: none)')
+    parser.add_argument('--models', nargs='+', choices=[name for name, _ in EXPORT_MODELS],
+                       help='Only export these tables')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                       help=f'Rows fetched from the database at a time (default: {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                       help=f'Tables exported in parallel (default: {DEFAULT_WORKERS})')
     
     args = parser.parse_args()
+    options = {
+        'compress': args.compress,
+        'chunk_size': args.chunk_size,
+        'workers': args.workers,
+        'names': args.models,
+    }
     
     print("AI Information Gathering Agent - Data Export")
     print("=" * 45)
@@ -166,20 +217,24 @@ def main():
     
     if args.all:
         # Export in all formats
-        if not export_to_json(args.output_dir):
+        if not export_to_json(args.output_dir, **options):
+            success = False
+        if not export_to_jsonl(args.output_dir, **options):
             success = False
-        if not export_to_csv(args.output_dir):
+        if not export_to_csv(args.output_dir, **options):
             success = False
-        if not export_database(args.output_dir):
+        if not export_database(args.output_dir, args.compress):
             success = False
     else:
         # Export in specified format
         if args.format == 'json':
-            success = export_to_json(args.output_dir)
+            success = export_to_json(args.output_dir, **options)
+        elif args.format == 'jsonl':
+            success = export_to_jsonl(args.output_dir, **options)
         elif args.format == 'csv':
-            success = export_to_csv(args.output_dir)
+            success = export_to_csv(args.output_dir, **options)
         elif args.format == 'database':
-            success = export_database(args.output_dir)
+            success = export_database(args.output_dir, args.compress)
     
     print("\n" + "=" * 45)
     if success:
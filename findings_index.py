@@ -0,0 +1,295 @@
+import logging
+import sqlite3
+import threading
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 建立索引的字段: (模块, 字段) -> 发现类型；同时覆盖代理模块和 ai_agent_framework 的示例模块
+FINDING_FIELDS = {
+    ("domain", "subdomains"): "subdomain",
+    ("port", "open_ports"): "banner",
+    ("sensitive", "sensitive_files"): "url",
+    ("sensitive", "exposed_credentials"): "credential",
+    ("github", "sensitive_info"): "snippet",
+    ("github", "code_snippets"): "snippet",
+    ("github", "config_files"): "snippet",
+    ("port_scan", "open_ports"): "banner",
+    ("github_search", "repositories"): "url",
+    ("web_analyzer", "server"): "banner",
+}
+# 字典条目中作为发现取值的字段（按优先级），其余文本字段作为上下文
+VALUE_KEYS = ("url", "subdomain", "host", "port", "name")
+CONTEXT_KEYS = ("snippet", "banner", "service", "value", "rule", "type", "repo", "source", "title", "path")
+# 三元组分词器要求查询至少三个字符，更短的查询改用 LIKE
+MIN_MATCH_LENGTH = 3
+# 每个事务写入的发现数
+INSERT_BATCH_SIZE = 5000
+
+
+def extract_findings(module_name: str, field: str, value: Any) -> Iterator[Tuple[str, str, str]]:
+    """
+    从一个模块字段（列表字段为其中的一个条目）中提取需要建立索引的发现
+    
+    参数:
+        module_name: 模块名称
+        field: 字段名
+        value: 字段值，列表字段传入单个条目
+        
+    产出:
+        (发现类型, 取值, 上下文)
+    """
+    kind = FINDING_FIELDS.get((module_name, field))
+    if kind is None or value is None:
+        return
+    if isinstance(value, dict):
+        key = next((key for key in VALUE_KEYS if value.get(key) not in (None, "")), None)
+        if key is None:
+            return
+        context = " ".join(str(value[name]) for name in CONTEXT_KEYS
+                           if name != key and value.get(name) not in (None, ""))
+        yield kind, str(value[key]), context
+    elif isinstance(value, (str, int, float)):
+        yield kind, str(value), ""
+
+
+def extract_result_findings(results: Dict[str, Any]) -> Iterator[Tuple[str, str, str, str]]:
+    """
+    从完整的扫描结果中提取发现
+    
+    参数:
+        results: 模块名 -> 模块结果
+        
+    产出:
+        (模块, 发现类型, 取值, 上下文)
+    """
+    for module_name, module_results in results.items():
+        if not isinstance(module_results, dict):
+            continue
+        for field, value in module_results.items():
+            for item in (value if isinstance(value, list) else [value]):
+                for kind, finding, context in extract_findings(module_name, field, item):
+                    yield module_name, kind, finding, context
+
+
+class FindingsIndex:
+    """
+    跨扫描的发现全文索引（SQLite FTS5）
+    
+    子域名、URL、端口横幅、代码片段和凭证逐条存入 findings 表，findings_fts 是以其为外部内容的
+    FTS5 索引，使用三元组分词器，因此可以按任意子串（如 ".git/config" 或令牌的一部分）查询，
+    而不需要打开任何结果文件。ResultsStorage 和 ai_agent_framework 的 Storage 都写入同一个索引，
+    以 source 区分；同一扫描重新写入时先删除该扫描对应模块的旧发现。
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # 代理和框架可能在不同进程中同时写入
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS scans (
+                id INTEGER PRIMARY KEY,
+                scan_key TEXT NOT NULL UNIQUE,
+                source TEXT NOT NULL,
+                target TEXT,
+                scan_timestamp TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_scans_target_time ON scans(target, scan_timestamp);
+            CREATE TABLE IF NOT EXISTS findings (
+                id INTEGER PRIMARY KEY,
+                scan_id INTEGER NOT NULL REFERENCES scans(id),
+                module TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                context TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS idx_findings_scan_module ON findings(scan_id, module);
+            CREATE VIRTUAL TABLE IF NOT EXISTS findings_fts USING fts5(
+                value, context, content='findings', content_rowid='id', tokenize='trigram'
+            );
+            CREATE TRIGGER IF NOT EXISTS findings_ai AFTER INSERT ON findings BEGIN
+                INSERT INTO findings_fts(rowid, value, context) VALUES (new.id, new.value, new.context);
+            END;
+            CREATE TRIGGER IF NOT EXISTS findings_ad AFTER DELETE ON findings BEGIN
+                INSERT INTO findings_fts(findings_fts, rowid, value, context)
+                VALUES ('delete', old.id, old.value, old.context);
+            END;
+        """)
+        self._conn.commit()
+    
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+    
+    def _scan_id(self, scan_key: str, source: str, target: Optional[str], scan_timestamp: str) -> int:
+        self._conn.execute(
+            "INSERT INTO scans (scan_key, source, target, scan_timestamp) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(scan_key) DO UPDATE SET target = excluded.target, scan_timestamp = excluded.scan_timestamp",
+            (scan_key, source, target, scan_timestamp)
+        )
+        return self._conn.execute("SELECT id FROM scans WHERE scan_key = ?", (scan_key,)).fetchone()[0]
+    
+    def add(self, scan_key: str, source: str, target: Optional[str], scan_timestamp: str,
+            findings: Iterable[Tuple[str, str, str, str]], modules: Iterable[str] = ()) -> int:
+        """
+        写入一次扫描的发现；该扫描中出现的模块（以及 modules 中的模块）原有的发现会被替换
+        
+        参数:
+            scan_key: 扫描的唯一标识（结果文件名或任务ID）
+            source: 来源（agent 或 framework）
+            target: 目标域名/IP
+            scan_timestamp: 扫描时间（ISO格式）
+            findings: (模块, 发现类型, 取值, 上下文)，可以是惰性迭代器
+            modules: 即使没有新发现也要清除旧发现的模块
+            
+        返回:
+            写入的发现数
+        """
+        written = 0
+        with self._lock:
+            try:
+                scan_id = self._scan_id(scan_key, source, target, scan_timestamp)
+                replaced = set()
+                
+                def replace(module_name: str):
+                    if module_name not in replaced:
+                        self._conn.execute("DELETE FROM findings WHERE scan_id = ? AND module = ?",
+                                           (scan_id, module_name))
+                        replaced.add(module_name)
+                
+                for module_name in modules:
+                    replace(module_name)
+                batch = []
+                for module_name, kind, value, context in findings:
+                    replace(module_name)
+                    batch.append((scan_id, module_name, kind, value, context))
+                    if len(batch) >= INSERT_BATCH_SIZE:
+                        self._insert(batch)
+                        written += len(batch)
+                        batch = []
+                self._insert(batch)
+                written += len(batch)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return written
+    
+    def _insert(self, rows: List[Tuple]):
+        self._conn.executemany(
+            "INSERT INTO findings (scan_id, module, kind, value, context) VALUES (?, ?, ?, ?, ?)", rows
+        )
+    
+    def add_results(self, scan_key: str, source: str, target: Optional[str], scan_timestamp: str,
+                    results: Dict[str, Any]) -> int:
+        """写入完整扫描结果（模块名 -> 模块结果）中的发现，参数同 add"""
+        return self.add(scan_key, source, target, scan_timestamp, extract_result_findings(results), results)
+    
+    def remove(self, scan_key: str):
+        """删除一次扫描及其全部发现"""
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM scans WHERE scan_key = ?", (scan_key,)).fetchone()
+            if row is not None:
+                self._conn.execute("DELETE FROM findings WHERE scan_id = ?", (row[0],))
+                self._conn.execute("DELETE FROM scans WHERE id = ?", (row[0],))
+            self._conn.commit()
+    
+    def _where(self, query: str, kind: Optional[str], target: Optional[str], since: Optional[str],
+               until: Optional[str], source: Optional[str]) -> Tuple[str, str, List[Any]]:
+        params: List[Any] = []
+        if len(query) >= MIN_MATCH_LENGTH:
+            # 整个查询作为一个短语，三元组分词器按子串匹配，不区分大小写
+            source_sql = "findings_fts JOIN findings f ON f.id = findings_fts.rowid"
+            clauses = ["findings_fts MATCH ?"]
+            params.append('"' + query.replace('"', '""') + '"')
+        else:
+            source_sql = "findings f"
+            clauses = ["(f.value LIKE ? ESCAPE '\\' OR f.context LIKE ? ESCAPE '\\')"]
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            params += [pattern, pattern]
+        if kind:
+            clauses.append("f.kind = ?")
+            params.append(kind)
+        if target:
+            clauses.append("s.target = ?")
+            params.append(target)
+        if since:
+            clauses.append("s.scan_timestamp >= ?")
+            params.append(since)
+        if until:
+            # 只给出日期时包含当天
+            clauses.append("s.scan_timestamp <= ?")
+            params.append(until + "T23:59:59.999999" if len(until) == 10 else until)
+        if source:
+            clauses.append("s.source = ?")
+            params.append(source)
+        return f"{source_sql} JOIN scans s ON s.id = f.scan_id", " WHERE " + " AND ".join(clauses), params
+    
+    def search(self, query: str, kind: Optional[str] = None, target: Optional[str] = None,
+               since: Optional[str] = None, until: Optional[str] = None, source: Optional[str] = None,
+               limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        按子串查询发现，最近写入的排在前面
+        
+        参数:
+            query: 要查找的文本（在取值和上下文中查找）
+            kind: 只返回该类型（subdomain、url、banner、snippet、credential）的发现
+            target: 只返回该目标的扫描中的发现
+            since: 扫描时间下限（ISO格式日期或时间）
+            until: 扫描时间上限（只给出日期时包含当天）
+            source: 只返回该来源（agent、framework）的发现
+            limit: 最多返回的条数
+            offset: 跳过的条数（分页）
+            
+        返回:
+            发现列表，包含取值、上下文、类型、模块以及所在扫描的标识、来源、目标和时间
+        """
+        tables, where, params = self._where(query, kind, target, since, until, source)
+        # 按 FTS 表的 rowid 排序时 FTS5 直接倒序产出匹配，不需要先取出全部匹配再排序
+        order = "findings_fts.rowid" if len(query) >= MIN_MATCH_LENGTH else "f.id"
+        sql = (f"SELECT f.id, f.module, f.kind, f.value, f.context, s.scan_key, s.source, s.target, "
+               f"s.scan_timestamp FROM {tables}{where} ORDER BY {order} DESC LIMIT ? OFFSET ?")
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit, offset]).fetchall()
+        return [dict(row) for row in rows]
+    
+    def count(self, query: str, kind: Optional[str] = None, target: Optional[str] = None,
+              since: Optional[str] = None, until: Optional[str] = None, source: Optional[str] = None) -> int:
+        """统计匹配的发现数，参数同 search"""
+        tables, where, params = self._where(query, kind, target, since, until, source)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {tables}{where}", params).fetchone()[0]
+    
+    def scans(self, query: str, kind: Optional[str] = None, target: Optional[str] = None,
+              since: Optional[str] = None, until: Optional[str] = None, source: Optional[str] = None,
+              limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        列出出现过匹配发现的扫描，按扫描时间从新到旧排序，参数同 search
+        
+        返回:
+            扫描列表，包含扫描标识、来源、目标、时间和匹配的发现数
+        """
+        tables, where, params = self._where(query, kind, target, since, until, source)
+        sql = (f"SELECT s.scan_key, s.source, s.target, s.scan_timestamp, COUNT(*) AS matches FROM {tables}{where} "
+               f"GROUP BY s.id ORDER BY s.scan_timestamp DESC LIMIT ? OFFSET ?")
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit, offset]).fetchall()
+        return [dict(row) for row in rows]
+    
+    def clear(self, source: Optional[str] = None):
+        """清空索引（或只清空某个来源的扫描）"""
+        with self._lock:
+            if source is None:
+                self._conn.execute("DELETE FROM findings")
+                self._conn.execute("DELETE FROM scans")
+            else:
+                self._conn.execute("DELETE FROM findings WHERE scan_id IN (SELECT id FROM scans WHERE source = ?)",
+                                   (source,))
+                self._conn.execute("DELETE FROM scans WHERE source = ?", (source,))
+            self._conn.commit()
@@ -1,97 +1,667 @@
 import httpx
 import asyncio
 import random
-from typing import Optional, Dict, Any, List
-from config import settings
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any, List, Iterable, AsyncIterator, Tuple, Callable, Awaitable
+from urllib.parse import urlsplit
+from config import settings, module_config
+from rate_limiter import TokenBucket
+from http_cache import ResponseCache
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 幂等方法在请求可能已发出时也可以安全重试
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"}
+# 幂等请求遇到这些状态码时重试
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+# 表示主机可能不可用、计入熔断器的异常
+HOST_FAILURE_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+# 请求确定尚未发出的异常，非幂等请求只在这些情况下重试
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class CircuitOpenError(Exception):
+    """目标主机的熔断器处于打开状态，请求被直接拒绝"""
+
+
+class CircuitBreaker:
+    """
+    单个主机的熔断器
+    
+    连续失败达到阈值后打开，期间请求立即失败而不占用并发槽位；
+    经过 reset_timeout 后进入半开状态，放行一个探测请求，成功则关闭，失败则重新打开。
+    """
+    
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+    
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+    
+    def allow(self) -> bool:
+        """判断是否放行请求"""
+        if self.opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at < self.reset_timeout:
+            return False
+        # 半开状态只放行一个探测请求；探测被取消时超过 reset_timeout 后再放行下一个
+        if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+            return False
+        self._probe_started = now
+        return True
+    
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probe_started = None
+    
+    def record_throttled(self):
+        """记录一次限速（429）应答：结束半开探测但不改变熔断状态，降速交给令牌桶"""
+        self._probe_started = None
+    
+    def record_failure(self) -> bool:
+        """记录一次失败，返回熔断器是否因此打开"""
+        self.failures += 1
+        if self._probe_started is not None or (self.opened_at is None and self.failures >= self.threshold):
+            self.opened_at = time.monotonic()
+            self._probe_started = None
+            return True
+        return False
+
 
 class AsyncHTTPClient:
-    def __init__(self):
+    """
+    基于长连接池的异步HTTP客户端
+    
+    同一个实例内的所有请求共享一个 httpx.AsyncClient，从而复用TCP/TLS连接。
+    实例可作为异步上下文管理器使用，退出时关闭连接池。
+    
+    请求按主机和逻辑来源（如 github、whois）分别经过令牌桶限速，配置来自 modules.yaml 的 rate_limits；
+    收到 429/503 时对应的令牌桶会降速并按 Retry-After 暂停。
+    
+    失败的请求按带抖动的指数退避重试（非幂等请求只在确定未发出时重试），
+    每个主机有独立的熔断器，主机不可用时后续请求立即失败。
+    
+    启用 settings.http_cache_enabled 或传入 cache 时，GET/HEAD 响应写入磁盘缓存，
+    重复扫描直接命中缓存，过期条目通过条件请求重新验证。
+    """
+    
+    def __init__(self, max_connections: Optional[int] = None,
+                 max_keepalive_connections: Optional[int] = None,
+                 keepalive_expiry: Optional[float] = None,
+                 max_connections_per_host: Optional[int] = None,
+                 rate_limits: Optional[Dict[str, Any]] = None,
+                 cache: Optional[ResponseCache] = None):
         self.timeout = settings.timeout
         self.user_agents = settings.user_agents
         self.semaphore = asyncio.Semaphore(settings.max_concurrent_requests)
+        self.limits = httpx.Limits(
+            max_connections=max_connections or settings.max_connections,
+            max_keepalive_connections=max_keepalive_connections or settings.max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry if keepalive_expiry is not None else settings.keepalive_expiry
+        )
+        self.max_connections_per_host = max_connections_per_host or settings.max_connections_per_host
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._waiting = 0
+        self._in_flight = 0
+        
+        rate_limits = rate_limits if rate_limits is not None else module_config.get_rate_limits()
+        self.default_rate_limit = rate_limits.get("default") or {
+            "rate": settings.host_rate_limit,
+            "burst": settings.host_rate_burst
+        }
+        self.host_rate_limits: Dict[str, Dict[str, Any]] = rate_limits.get("hosts") or {}
+        self.source_rate_limits: Dict[str, Dict[str, Any]] = rate_limits.get("sources") or {}
+        self._host_sources = {
+            host: source
+            for source, config in self.source_rate_limits.items()
+            for host in config.get("hosts", [])
+        }
+        self._host_buckets: Dict[str, Optional[TokenBucket]] = {}
+        self._source_buckets: Dict[str, Optional[TokenBucket]] = {}
+        
+        self.retry_attempts = settings.retry_attempts
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._retries = 0
+        
+        if cache is None and settings.http_cache_enabled:
+            cache = ResponseCache()
+        self.cache = cache
+    
+    async def __aenter__(self) -> "AsyncHTTPClient":
+        self._get_client()
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """延迟创建共享的 httpx.AsyncClient"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._client
+    
+    async def close(self):
+        """关闭共享连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_semaphores.clear()
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+    
+    def _get_host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """获取限制单个主机并发连接数的信号量"""
+        parts = urlsplit(url)
+        host = f"{parts.hostname}:{parts.port or (443 if parts.scheme == 'https' else 80)}"
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_connections_per_host)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+    
+    def _make_bucket(self, config: Dict[str, Any]) -> Optional[TokenBucket]:
+        """根据配置创建令牌桶，rate 为空或0表示不限速"""
+        rate = config.get("rate")
+        if not rate:
+            return None
+        return TokenBucket(float(rate), config.get("burst"), settings.rate_limit_min_rate)
+    
+    def _get_buckets(self, url: str, source: Optional[str] = None) -> List[TokenBucket]:
+        """
+        获取请求需要经过的令牌桶
+        
+        参数:
+            url: 请求的URL
+            source: 逻辑来源名称，为None时根据主机在 rate_limits.sources 中查找
+            
+        返回:
+            来源令牌桶和主机令牌桶（未配置限速的不包含在内）
+        """
+        host = urlsplit(url).hostname or ""
+        buckets = []
+        
+        source = source or self._host_sources.get(host)
+        if source in self.source_rate_limits:
+            if source not in self._source_buckets:
+                self._source_buckets[source] = self._make_bucket(self.source_rate_limits[source])
+            buckets.append(self._source_buckets[source])
+        
+        if host not in self._host_buckets:
+            self._host_buckets[host] = self._make_bucket(self.host_rate_limits.get(host, self.default_rate_limit))
+        buckets.append(self._host_buckets[host])
+        
+        return [bucket for bucket in buckets if bucket is not None]
+    
+    def _parse_retry_after(self, value: Optional[str]) -> Optional[float]:
+        """解析秒数或HTTP日期形式的 Retry-After 头"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    
+    def _record_response(self, buckets: List[TokenBucket], url: str, status_code: int,
+                         headers: httpx.Headers):
+        """根据响应状态调整令牌桶速率"""
+        if status_code in (429, 503):
+            delay = self._parse_retry_after(headers.get("Retry-After"))
+            if delay is None:
+                delay = settings.rate_limit_backoff
+            delay = min(delay, settings.rate_limit_max_backoff)
+            for bucket in buckets:
+                bucket.backoff(delay)
+            logger.warning(f"{url} 返回 {status_code}，降低请求速率并暂停 {delay:.1f} 秒")
+        else:
+            for bucket in buckets:
+                bucket.recover()
+    
+    def get_rate_limit_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        获取各主机和来源当前的限速状态
+        
+        返回:
+            以 "host:<主机>" 或 "source:<来源>" 为键，包含当前速率和配置速率的字典
+        """
+        stats = {}
+        for prefix, buckets in (("source", self._source_buckets), ("host", self._host_buckets)):
+            for key, bucket in buckets.items():
+                if bucket is not None:
+                    stats[f"{prefix}:{key}"] = {"rate": bucket.rate, "max_rate": bucket.max_rate}
+        return stats
+    
+    def _get_breaker(self, url: str) -> CircuitBreaker:
+        """获取目标主机的熔断器"""
+        host = urlsplit(url).hostname or ""
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(settings.circuit_breaker_threshold, settings.circuit_breaker_reset)
+            self._breakers[host] = breaker
+        return breaker
+    
+    def _backoff_delay(self, retry: int) -> float:
+        """第 retry 次重试前的等待时间（full jitter 指数退避）"""
+        return random.uniform(0, min(settings.retry_backoff_max, settings.retry_backoff_base * 2 ** retry))
+    
+    async def _send_with_retries(self, method: str, url: str,
+                                 attempt: Callable[[], Awaitable[Tuple[Any, int]]]) -> Tuple[Any, int]:
+        """
+        执行请求，失败时按重试策略重试
+        
+        参数:
+            method: HTTP方法
+            url: 请求的URL
+            attempt: 执行一次请求的协程函数，返回 (结果, 状态码)
+            
+        返回:
+            (结果, 重试次数) 元组；最终失败时抛出的异常带有 retries 属性
+        """
+        breaker = self._get_breaker(url)
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        retries = 0
+        
+        while True:
+            if not breaker.allow():
+                error = CircuitOpenError(f"{urlsplit(url).hostname} 的熔断器已打开，跳过请求")
+                error.retries = retries
+                raise error
+            
+            try:
+                result, status_code = await attempt()
+            except httpx.TransportError as e:
+                if isinstance(e, HOST_FAILURE_ERRORS) and breaker.record_failure():
+                    logger.warning(f"{urlsplit(url).hostname} 连续 {breaker.failures} 次失败，熔断器打开")
+                retryable = isinstance(e, HOST_FAILURE_ERRORS if idempotent else NOT_SENT_ERRORS)
+                if not retryable or retries >= self.retry_attempts:
+                    e.retries = retries
+                    raise
+                logger.debug(f"{method} {url} 失败，准备第 {retries + 1} 次重试: {str(e)}")
+            else:
+                if status_code >= 500 and status_code in RETRY_STATUS_CODES:
+                    if breaker.record_failure():
+                        logger.warning(f"{urlsplit(url).hostname} 连续 {breaker.failures} 次失败，熔断器打开")
+                elif status_code == 429:
+                    breaker.record_throttled()
+                else:
+                    breaker.record_success()
+                
+                if not (idempotent and status_code in RETRY_STATUS_CODES and retries < self.retry_attempts):
+                    return result, retries
+                logger.debug(f"{method} {url} 返回 {status_code}，准备第 {retries + 1} 次重试")
+            
+            retries += 1
+            self._retries += 1
+            await asyncio.sleep(self._backoff_delay(retries))
     
     async def get_random_user_agent(self) -> str:
         return random.choice(self.user_agents)
     
-    async def get(self, url: str, headers: Optional[Dict[str, str]] = None, 
-                  params: Optional[Dict[str, Any]] = None) -> httpx.Response:
-        async with self.semaphore:
-            user_agent = await self.get_random_user_agent()
-            default_headers = {"User-Agent": user_agent}
+    @asynccontextmanager
+    async def _acquire_slot(self, url: str, source: Optional[str] = None):
+        """
+        经过限速后占用目标主机的连接槽位和全局并发槽位
+        
+        限速在占用并发槽位之前进行，且先等待主机槽位再占用全局槽位，被限速或已饱和的主机
+        不会占住其他主机可用的槽位。
+        产出本次请求经过的令牌桶，供调用方根据响应调整速率。
+        """
+        buckets = self._get_buckets(url, source)
+        host_semaphore = self._get_host_semaphore(url)
+        self._waiting += 1
+        try:
+            for bucket in buckets:
+                await bucket.acquire()
+            await host_semaphore.acquire()
+            try:
+                await self.semaphore.acquire()
+            except BaseException:
+                host_semaphore.release()
+                raise
+        finally:
+            self._waiting -= 1
+        
+        self._in_flight += 1
+        try:
+            yield buckets
+        finally:
+            self._in_flight -= 1
+            self.semaphore.release()
+            host_semaphore.release()
+    
+    async def _build_headers(self, headers: Optional[Dict[str, str]]) -> Dict[str, str]:
+        user_agent = await self.get_random_user_agent()
+        default_headers = {"User-Agent": user_agent}
+        
+        if headers:
+            default_headers.update(headers)
+        return default_headers
+    
+    async def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                      source: Optional[str] = None, **kwargs) -> httpx.Response:
+        """
+        通过共享连接池发送请求
+        
+        参数:
+            method: HTTP方法
+            url: 请求的URL
+            headers: 可选的请求头
+            source: 用于限速的逻辑来源名称
+            **kwargs: 传递给 httpx 的其他参数
             
-            if headers:
-                default_headers.update(headers)
+        返回:
+            httpx.Response 对象，重试次数记录在 response.extensions["retries"]
+        """
+        # 只缓存不带请求体的 GET/HEAD 请求，查询参数并入缓存键的URL
+        use_cache = (self.cache is not None and method.upper() in ("GET", "HEAD")
+                     and set(kwargs) <= {"params"})
+        cache_url = str(httpx.URL(url, params=kwargs.get("params"))) if use_cache else url
+        cached = None
+        request_headers = dict(headers or {})
+        if use_cache:
+            cached = await self.cache.get(method, cache_url, headers)
+            if cached is not None:
+                if cached["fresh"]:
+                    return self._cached_response(method, cache_url, cached)
+                request_headers.update(self.cache.conditional_headers(cached))
+        
+        async def attempt() -> Tuple[httpx.Response, int]:
+            async with self._acquire_slot(url, source) as buckets:
+                default_headers = await self._build_headers(request_headers)
+                response = await self._get_client().request(method, url, headers=default_headers, **kwargs)
+                logger.debug(f"{method} {url} - 状态: {response.status_code}")
+                self._record_response(buckets, url, response.status_code, response.headers)
+                return response, response.status_code
+        
+        try:
+            response, retries = await self._send_with_retries(method, url, attempt)
+        except Exception as e:
+            logger.error(f"{method} {url} 时出错: {str(e)}")
+            raise
+        
+        if use_cache:
+            ttl = self.cache.ttl_for(self._cache_source(url, source))
+            if response.status_code == 304 and cached is not None:
+                await self.cache.touch(cached, ttl)
+                response = self._cached_response(method, cache_url, cached)
+            else:
+                await self.cache.put(method, cache_url, headers, response.status_code, dict(response.headers),
+                                     response.content, response.encoding, ttl=ttl)
+        
+        response.extensions["retries"] = retries
+        return response
+    
+    def _cache_source(self, url: str, source: Optional[str]) -> Optional[str]:
+        """确定用于选择缓存TTL的来源"""
+        return source or self._host_sources.get(urlsplit(url).hostname or "")
+    
+    def _cached_response(self, method: str, url: str, entry: Dict[str, Any]) -> httpx.Response:
+        """由缓存条目构造 httpx.Response"""
+        response = httpx.Response(
+            entry["status_code"],
+            headers=entry["headers"],
+            content=entry["body"],
+            request=httpx.Request(method, url)
+        )
+        if entry["encoding"]:
+            response.encoding = entry["encoding"]
+        response.extensions["retries"] = 0
+        response.extensions["cached"] = True
+        return response
+    
+    def _cached_metadata(self, url: str, entry: Dict[str, Any],
+                         max_body_bytes: Optional[int]) -> Tuple[Dict[str, Any], bytes]:
+        """由缓存条目构造 fetch_streamed 的返回值"""
+        body = entry["body"]
+        truncated = entry["truncated"]
+        if max_body_bytes is not None and len(body) > max_body_bytes:
+            body = body[:max_body_bytes]
+            truncated = True
+        metadata = {
+            "url": url,
+            "status_code": entry["status_code"],
+            "headers": entry["headers"],
+            "encoding": entry["encoding"],
+            "bytes": len(body),
+            "truncated": truncated,
+            "retries": 0,
+            "cached": True
+        }
+        return metadata, body
+    
+    def get_cache_stats(self) -> Dict[str, int]:
+        """
+        获取响应缓存的统计信息
+        
+        返回:
+            包含命中、过期、重新验证、未命中、写入和淘汰计数的字典，未启用缓存时为空字典
+        """
+        return self.cache.get_stats() if self.cache is not None else {}
+    
+    async def fetch_streamed(self, url: str, method: str = "GET",
+                             headers: Optional[Dict[str, str]] = None,
+                             max_body_bytes: Optional[int] = None,
+                             source: Optional[str] = None) -> Tuple[Dict[str, Any], bytes]:
+        """
+        以流式方式读取响应体，可限制读取的最大字节数
+        
+        参数:
+            url: 请求的URL
+            method: HTTP方法
+            headers: 可选的请求头
+            max_body_bytes: 最多读取的响应体字节数，None表示不限制
+            source: 用于限速的逻辑来源名称
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                try:
-                    response = await client.get(url, headers=default_headers, params=params)
-                    logger.debug(f"GET {url} - 状态: {response.status_code}")
-                    return response
-                except Exception as e:
-                    logger.error(f"获取 {url} 时出错: {str(e)}")
-                    raise
+        返回:
+            (响应元数据, 响应体字节) 元组，元数据包含重试次数 "retries" 和是否来自缓存 "cached"
+        """
+        use_cache = self.cache is not None and method.upper() in ("GET", "HEAD")
+        cached = None
+        request_headers = dict(headers or {})
+        if use_cache:
+            cached = await self.cache.get(method, url, headers, max_body_bytes)
+            if cached is not None:
+                if cached["fresh"]:
+                    return self._cached_metadata(url, cached, max_body_bytes)
+                request_headers.update(self.cache.conditional_headers(cached))
+        
+        async def attempt() -> Tuple[Tuple[Dict[str, Any], bytes], int]:
+            async with self._acquire_slot(url, source) as buckets:
+                default_headers = await self._build_headers(request_headers)
+                
+                async with self._get_client().stream(method, url, headers=default_headers) as response:
+                    self._record_response(buckets, url, response.status_code, response.headers)
+                    chunks = []
+                    received = 0
+                    truncated = False
+                    async for chunk in response.aiter_bytes():
+                        if max_body_bytes is not None and received + len(chunk) > max_body_bytes:
+                            chunks.append(chunk[:max_body_bytes - received])
+                            received = max_body_bytes
+                            truncated = True
+                            break
+                        chunks.append(chunk)
+                        received += len(chunk)
+                    
+                    logger.debug(f"{method} {url} - 状态: {response.status_code}")
+                    metadata = {
+                        "url": str(response.url),
+                        "status_code": response.status_code,
+                        "headers": dict(response.headers),
+                        "encoding": response.encoding,
+                        "bytes": received,
+                        "truncated": truncated
+                    }
+                    return (metadata, b"".join(chunks)), response.status_code
+        
+        try:
+            (metadata, body), retries = await self._send_with_retries(method, url, attempt)
+        except Exception as e:
+            logger.error(f"{method} {url} 时出错: {str(e)}")
+            raise
+        
+        if use_cache:
+            ttl = self.cache.ttl_for(self._cache_source(url, source))
+            if metadata["status_code"] == 304 and cached is not None:
+                await self.cache.touch(cached, ttl)
+                metadata, body = self._cached_metadata(url, cached, max_body_bytes)
+            else:
+                await self.cache.put(method, url, headers, metadata["status_code"], metadata["headers"], body,
+                                     metadata["encoding"], metadata["truncated"], ttl)
+        
+        metadata["retries"] = retries
+        metadata.setdefault("cached", False)
+        return metadata, body
+    
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None,
+                  params: Optional[Dict[str, Any]] = None, source: Optional[str] = None) -> httpx.Response:
+        return await self.request("GET", url, headers=headers, source=source, params=params)
     
     async def post(self, url: str, headers: Optional[Dict[str, str]] = None,
-                   data: Optional[Dict[str, Any]] = None, json: Optional[Dict[str, Any]] = None) -> httpx.Response:
-        async with self.semaphore:
-            user_agent = await self.get_random_user_agent()
-            default_headers = {"User-Agent": user_agent}
+                   data: Optional[Dict[str, Any]] = None, json: Optional[Dict[str, Any]] = None,
+                   source: Optional[str] = None) -> httpx.Response:
+        return await self.request("POST", url, headers=headers, source=source, data=data, json=json)
+    
+    def get_pool_stats(self) -> Dict[str, int]:
+        """
+        获取连接池统计信息
+        
+        返回:
+            包含打开、空闲、活动连接数、等待中请求数、重试次数和打开的熔断器数的字典
+        """
+        stats = {
+            "open_connections": 0,
+            "idle_connections": 0,
+            "active_connections": 0,
+            "waiting_requests": self._waiting,
+            "in_flight_requests": self._in_flight,
+            "hosts": len(self._host_semaphores),
+            "retries": self._retries,
+            "open_circuits": sum(1 for breaker in self._breakers.values() if breaker.is_open)
+        }
+        
+        if self._client is None:
+            return stats
+        
+        # httpx 未公开连接池状态，这里读取底层 httpcore 连接池
+        pool = getattr(self._client._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        stats["open_connections"] = len(connections)
+        stats["idle_connections"] = sum(1 for conn in connections if conn.is_idle())
+        stats["active_connections"] = stats["open_connections"] - stats["idle_connections"]
+        return stats
+    
+    async def iter_fetch(self, urls: Iterable[str], method: str = "GET",
+                         headers: Optional[Dict[str, str]] = None,
+                         max_body_bytes: Optional[int] = None,
+                         concurrency: Optional[int] = None,
+                         source: Optional[str] = None) -> AsyncIterator[Tuple[str, Dict[str, Any], bytes]]:
+        """
+        并发获取多个URL，并按完成顺序逐个产出结果
+        
+        同时在途的请求数受 concurrency 限制，URL 可以是惰性迭代器，
+        因此大批量路径探测的内存占用保持恒定。
+        
+        参数:
+            urls: 要获取的URL（列表或迭代器）
+            method: HTTP方法 ("GET"、"HEAD" 或 "POST")
+            headers: 可选的请求头
+            max_body_bytes: 每个响应最多读取的字节数，None表示不限制
+            concurrency: 同时在途的请求数，默认为 settings.max_concurrent_requests
+            source: 用于限速的逻辑来源名称
             
-            if headers:
-                default_headers.update(headers)
+        产出:
+            (请求的URL, 响应元数据, 响应体字节) 元组；出错时元数据包含 "error" 和 "retries"，响应体为空
+        """
+        method = method.upper()
+        if method not in ("GET", "HEAD", "POST"):
+            raise ValueError(f"不支持的方法: {method}")
+        
+        concurrency = concurrency or settings.max_concurrent_requests
+        url_iter = enumerate(urls)
+        pending: Dict[asyncio.Task, Tuple[int, str]] = {}
+        
+        def schedule() -> bool:
+            item = next(url_iter, None)
+            if item is None:
+                return False
+            index, url = item
+            task = asyncio.create_task(self.fetch_streamed(url, method, headers, max_body_bytes, source))
+            pending[task] = (index, url)
+            return True
+        
+        try:
+            while len(pending) < concurrency and schedule():
+                pass
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                try:
-                    response = await client.post(url, headers=default_headers, data=data, json=json)
-                    logger.debug(f"POST {url} - 状态: {response.status_code}")
-                    return response
-                except Exception as e:
-                    logger.error(f"向 {url} 发送POST请求时出错: {str(e)}")
-                    raise
+            while pending:
+                done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, url = pending.pop(task)
+                    try:
+                        metadata, body = task.result()
+                    except Exception as e:
+                        metadata, body = {"error": str(e), "retries": getattr(e, "retries", 0)}, b""
+                    metadata["index"] = index
+                    schedule()
+                    yield url, metadata, body
+        finally:
+            for task in pending:
+                task.cancel()
     
-    async def fetch_multiple(self, urls: List[str], method: str = "GET", 
-                           headers: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    async def fetch_multiple(self, urls: List[str], method: str = "GET",
+                           headers: Optional[Dict[str, str]] = None,
+                           max_body_bytes: Optional[int] = None,
+                           source: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         并发获取多个URL
         
         参数:
             urls: 要获取的URL列表
-            method: HTTP方法 ("GET" 或 "POST")
+            method: HTTP方法 ("GET"、"HEAD" 或 "POST")
             headers: 可选的请求头
+            max_body_bytes: 每个响应最多读取的字节数，None表示不限制
+            source: 用于限速的逻辑来源名称
             
         返回:
-            包含URL、状态码、请求头和内容的字典列表
-        """
-        tasks = []
-        for url in urls:
-            if method.upper() == "GET":
-                task = self.get(url, headers)
-            elif method.upper() == "POST":
-                task = self.post(url, headers)
+            与输入顺序一致的字典列表，包含URL、状态码、请求头、内容和重试次数
+        """
+        responses: List[Optional[Dict[str, Any]]] = [None] * len(urls)
+        async for url, metadata, body in self.iter_fetch(urls, method, headers, max_body_bytes, source=source):
+            if "error" in metadata:
+                entry = {
+                    "url": url,
+                    "error": metadata["error"],
+                    "retries": metadata["retries"]
+                }
             else:
-                raise ValueError(f"不支持的方法: {method}")
-            
-            tasks.append(task)
-        
-        responses = []
-        for i, coroutine in enumerate(asyncio.as_completed(tasks)):
-            try:
-                response = await coroutine
-                responses.append({
-                    "url": str(response.url),
-                    "status_code": response.status_code,
-                    "headers": dict(response.headers),
-                    "content": response.text
-                })
-            except Exception as e:
-                url = urls[i] if i < len(urls) else "未知URL"
-                responses.append({
+                entry = {
                     "url": url,
-                    "error": str(e)
-                })
+                    "status_code": metadata["status_code"],
+                    "headers": metadata["headers"],
+                    "content": body.decode(metadata["encoding"] or "utf-8", errors="replace"),
+                    "truncated": metadata["truncated"],
+                    "retries": metadata["retries"]
+                }
+            responses[metadata["index"]] = entry
         
         return responses
@@ -1,24 +1,334 @@
 #!/usr/bin/env python3
 """
 Data import script for AI Information Gathering Agent
+
+Files are parsed incrementally (JSON arrays and JSON Lines in Django's fixture format, as written
+by export_data.py, or its CSV files) and the objects are inserted with bulk_create in batches, each
+batch in one transaction (or the whole file with --atomic).
+
+Without --atomic the database checks the foreign keys of every batch when it is committed: a batch
+referring to rows that are neither in the database nor in an earlier batch is rolled back and the
+import stops with an error, keeping the batches committed before it. With --atomic the checks are
+deferred until the whole file is imported, so records may also refer to records later in the file,
+and nothing is kept when they fail.
 """
 
 import os
 import sys
+import re
 import json
 import csv
+import time
+from contextlib import nullcontext
 import django
-from django.core.serializers import deserialize
+from django.core import serializers
 from django.core.management import execute_from_command_line
 
 # Add the project directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from export_data import EXPORT_MODELS, COMPRESSIONS
+
 # Set Django settings module
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_ai_agent.ai_agent_project.settings')
 
-def import_from_json(input_file):
-    """Import data from JSON file."""
+# Objects inserted per transaction
+DEFAULT_BATCH_SIZE = 5000
+# Print progress every this many objects
+DEFAULT_PROGRESS_EVERY = 100000
+# Characters read from the input at a time
+READ_SIZE = 1 << 16
+
+# Fields identifying an existing record for --on-conflict update, most selective field first.
+# Records of other models are matched by primary key.
+NATURAL_KEYS = {
+    'keywords_app.keyword': ('name', 'created_by'),
+    'keywords_app.personinformation': ('profile_url', 'platform', 'keyword'),
+    'reports_app.report': ('file_path',),
+    'config_app.platform': ('name',),
+    'config_app.aimodel': ('model_name', 'provider'),
+}
+
+WHITESPACE_RE = re.compile(r'\s*')
+
+def open_input(input_file):
+    """Open a file for reading as text, decompressing .gz, .bz2 and .xz files"""
+    for suffix, open_file in COMPRESSIONS.values():
+        if suffix and input_file.endswith(suffix):
+            return open_file(input_file, 'rt', encoding='utf-8', newline='')
+    return open(input_file, 'r', encoding='utf-8', newline='')
+
+def detect_format(input_file):
+    """Guess the format of a file from its name, ignoring the compression suffix"""
+    name = input_file
+    for suffix, _ in COMPRESSIONS.values():
+        if suffix and name.endswith(suffix):
+            name = name[:-len(suffix)]
+    extension = os.path.splitext(name)[1].lstrip('.').lower()
+    return extension if extension in ('json', 'jsonl', 'csv') else 'json'
+
+def iter_json_array(stream):
+    """
+    Yield the elements of a JSON array one by one
+    
+    Only the element being parsed and one read buffer are kept in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = stream.read(READ_SIZE)
+    pos = WHITESPACE_RE.match(buffer).end()
+    if buffer[pos:pos + 1] != '[':
+        raise ValueError("Expected a JSON array")
+    pos += 1
+    eof = False
+    while True:
+        pos = WHITESPACE_RE.match(buffer, pos).end()
+        if pos < len(buffer) and buffer[pos] in ',]':
+            if buffer[pos] == ']':
+                return
+            pos += 1
+            continue
+        if pos < len(buffer):
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                # A value ending with the buffer may continue in the next read
+                if end < len(buffer) or eof:
+                    yield item
+                    pos = end
+                    continue
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+        elif eof:
+            raise ValueError("Unexpected end of JSON array")
+        chunk = stream.read(READ_SIZE)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+def iter_json_lines(stream):
+    """Yield the objects of a JSON Lines file"""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+def iter_csv_objects(stream, model):
+    """
+    Yield unsaved model instances from a CSV file written by export_data.py
+    
+    The header names the columns by attribute name (keyword_id, ...). Empty values of nullable
+    fields are read as NULL.
+    """
+    reader = csv.reader(stream)
+    header = next(reader)
+    fields = [model._meta.get_field(column) for column in header]
+    for row in reader:
+        values = {}
+        for field, value in zip(fields, row):
+            values[field.attname] = None if value == '' and field.null else field.to_python(value)
+        yield model(**values)
+
+def _chunks(values, size=900):
+    """Split the values of an IN lookup to stay below the query parameter limit of SQLite"""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+class BatchImporter:
+    """
+    Writes model instances with bulk_create, one transaction per batch
+    
+    Objects are written in the order they arrive, a batch ends when it is full or the model
+    changes, so rows referenced by later rows are inserted first.
+    """
+    
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, on_conflict='error', progress_every=DEFAULT_PROGRESS_EVERY):
+        self.batch_size = batch_size
+        self.on_conflict = on_conflict
+        self.progress_every = progress_every
+        self.model = None
+        self.objects = []
+        self.total = 0
+        # Model label -> {'created': n, 'updated': n}
+        self.counts = {}
+        # Model label -> {primary key in the file: primary key of the matched row}
+        self.pk_map = {}
+        self.models = set()
+        self._auto_now = {}
+        self._started = time.monotonic()
+    
+    def add(self, obj):
+        model = type(obj)
+        if model is not self.model:
+            self.flush()
+            self.model = model
+            self._prepare_model(model)
+        self._remap_foreign_keys(obj)
+        self._fill_timestamps(obj)
+        self.objects.append(obj)
+        if len(self.objects) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        """Write the current batch in its own transaction"""
+        if not self.objects:
+            return
+        from django.db import reset_queries, transaction
+        
+        with transaction.atomic():
+            created, updated = self._write(self.model, self.objects)
+        # With DEBUG on, Django keeps the SQL of recent queries, which is large for bulk inserts
+        reset_queries()
+        counts = self.counts.setdefault(self.model._meta.label_lower, {'created': 0, 'updated': 0})
+        counts['created'] += created
+        counts['updated'] += updated
+        
+        previous = self.total
+        self.total += len(self.objects)
+        self.objects = []
+        if self.progress_every and self.total // self.progress_every > previous // self.progress_every:
+            elapsed = time.monotonic() - self._started
+            print(f"  ... {self.total} objects imported ({self.total / max(elapsed, 1e-6):.0f}/s)")
+    
+    def close(self):
+        """Restore the auto_now settings of the imported models"""
+        for field, flags in self._auto_now.items():
+            field.auto_now, field.auto_now_add = flags
+        self._auto_now = {}
+    
+    def _prepare_model(self, model):
+        self.models.add(model)
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                # Keep the timestamps of the imported records instead of the time of the import
+                self._auto_now.setdefault(field, (field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    
+    def _fill_timestamps(self, obj):
+        from django.utils import timezone
+        
+        for field, (auto_now, auto_now_add) in self._auto_now.items():
+            if field.model is type(obj) and getattr(obj, field.attname) is None:
+                setattr(obj, field.attname, timezone.now())
+    
+    def _remap_foreign_keys(self, obj):
+        if not self.pk_map:
+            return
+        for field in obj._meta.concrete_fields:
+            if field.is_relation:
+                mapping = self.pk_map.get(field.related_model._meta.label_lower)
+                value = getattr(obj, field.attname)
+                if mapping and value in mapping:
+                    setattr(obj, field.attname, mapping[value])
+    
+    def _write(self, model, objects):
+        """Insert (or upsert) one batch, returning the number of created and updated rows"""
+        manager = model._default_manager
+        if self.on_conflict == 'ignore':
+            manager.bulk_create(objects, ignore_conflicts=True)
+            return len(objects), 0
+        if self.on_conflict != 'update':
+            manager.bulk_create(objects)
+            return len(objects), 0
+        
+        fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+        natural_key = NATURAL_KEYS.get(model._meta.label_lower)
+        if natural_key is None:
+            # Records without a natural key are upserted by primary key
+            pks = [obj.pk for obj in objects if obj.pk is not None]
+            replaced = sum(manager.filter(pk__in=chunk).count() for chunk in _chunks(pks))
+            manager.bulk_create(objects, update_conflicts=True, unique_fields=[model._meta.pk.name],
+                                update_fields=fields)
+            return len(objects) - replaced, replaced
+        
+        # Records are matched by natural key. Later records referring to one of them are pointed at
+        # its row in this database, whose primary key may differ from the one in the file.
+        pk_map = self.pk_map.setdefault(model._meta.label_lower, {})
+        attnames = [model._meta.get_field(name).attname for name in natural_key]
+        
+        def natural_key_of(obj):
+            return tuple(getattr(obj, attname) for attname in attnames)
+        
+        existing = self._existing_rows(model, natural_key, objects)
+        new, file_pks, matched = [], [], []
+        for obj in objects:
+            pk = existing.get(natural_key_of(obj))
+            if pk is None:
+                # The primary key in the file may belong to an unrelated row here, a new one is assigned
+                file_pks.append(obj.pk)
+                obj.pk = None
+                new.append(obj)
+                continue
+            if obj.pk is not None and obj.pk != pk:
+                pk_map[obj.pk] = pk
+            obj.pk = pk
+            matched.append(obj)
+        
+        if new:
+            manager.bulk_create(new)
+            if any(obj.pk is None for obj in new):
+                # The database does not return the primary keys of inserted rows
+                inserted = self._existing_rows(model, natural_key, new)
+                for obj in new:
+                    obj.pk = inserted.get(natural_key_of(obj))
+            for file_pk, obj in zip(file_pks, new):
+                if file_pk is not None and file_pk != obj.pk:
+                    pk_map[file_pk] = obj.pk
+        if matched:
+            manager.bulk_create(matched, update_conflicts=True, unique_fields=[model._meta.pk.name],
+                                update_fields=fields)
+        return len(new), len(matched)
+    
+    def _existing_rows(self, model, natural_key, objects):
+        """Find the rows matching the natural keys of a batch, returning {key: primary key}"""
+        attnames = [model._meta.get_field(name).attname for name in natural_key]
+        keys = {tuple(getattr(obj, attname) for attname in attnames) for obj in objects}
+        existing = {}
+        # The first field narrows the query, the whole key is compared here
+        for chunk in _chunks(list({key[0] for key in keys if key[0] is not None})):
+            rows = model._default_manager.filter(**{f'{attnames[0]}__in': chunk})
+            for row in rows.values_list('pk', *attnames).iterator():
+                if row[1:] in keys:
+                    existing[row[1:]] = row[0]
+        return existing
+
+def import_objects(objects, batch_size=DEFAULT_BATCH_SIZE, on_conflict='error', atomic=False,
+                   progress_every=DEFAULT_PROGRESS_EVERY):
+    """
+    Import model instances in batches
+    
+    Without atomic, the foreign keys of each batch are checked by the database when the batch is
+    committed and a failing batch stops the import (the batches before it stay committed). With
+    atomic, checks are disabled where the database allows it and all imported tables are checked
+    before the single commit.
+    Returns the BatchImporter with the per-model counts.
+    """
+    from django.db import connection, transaction
+    
+    importer = BatchImporter(batch_size, on_conflict, progress_every)
+    try:
+        with transaction.atomic() if atomic else nullcontext():
+            try:
+                with connection.constraint_checks_disabled() if atomic else nullcontext():
+                    for obj in objects:
+                        importer.add(obj)
+                    importer.flush()
+            finally:
+                importer.close()
+            if atomic:
+                connection.check_constraints(table_names=[model._meta.db_table for model in importer.models])
+    except Exception:
+        if not atomic and importer.total:
+            print(f"  {importer.total} objects in earlier batches were committed before the failure; "
+                  f"use --atomic to import all or nothing")
+        raise
+    return importer
+
+def _print_summary(importer, input_file, started):
+    for label, counts in sorted(importer.counts.items()):
+        print(f"  {label}: {counts['created']} created, {counts['updated']} updated")
+    print(f"✓ Imported {importer.total} objects from {input_file} in {time.monotonic() - started:.1f}s")
+
+def import_from_json(input_file, format=None, **options):
+    """Import data from a JSON or JSON Lines fixture file."""
     print(f"Importing data from {input_file}...")
     try:
         # Setup Django
@@ -29,72 +339,45 @@ def import_from_json(input_file):
             print(f"✗ File not found: {input_file}")
             return False
         
-        # Read JSON data
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data = f.read()
+        started = time.monotonic()
+        format = format or detect_format(input_file)
+        with open_input(input_file) as f:
+            records = iter_json_lines(f) if format == 'jsonl' else iter_json_array(f)
+            # Deserialize and save data
+            objects = (item.object for item in serializers.deserialize('python', records))
+            importer = import_objects(objects, **options)
         
-        # Deserialize and save data
-        objects = deserialize('json', data)
-        count = 0
-        for obj in objects:
-            obj.save()
-            count += 1
-        
-        print(f"✓ Imported {count} objects from {input_file}")
+        _print_summary(importer, input_file, started)
         return True
         
     except Exception as e:
-        print(f"✗ Failed to import data from JSON: {e}")
+        print(f"✗ Failed to import data from {(format or 'json').upper()}: {e}")
         return False
 
-def import_from_csv(input_file, model_name):
-    """Import data from CSV file."""
+def import_from_csv(input_file, model_name, **options):
+    """Import data from a CSV file written by export_data.py."""
     print(f"Importing {model_name} data from {input_file}...")
     try:
         # Setup Django
         django.setup()
+        from django.apps import apps
         
         # Check if file exists
         if not os.path.exists(input_file):
             print(f"✗ File not found: {input_file}")
             return False
         
-        # Import appropriate model
-        if model_name.lower() == 'keyword':
-            from django_ai_agent.keywords_app.models import Keyword
-            model_class = Keyword
-            field_mapping = {'name': 1}  # Column index for name field
-        elif model_name.lower() == 'report':
-            from django_ai_agent.reports_app.models import Report
-            model_class = Report
-            field_mapping = {'title': 1, 'content': 2}  # Column indices
-        elif model_name.lower() == 'configuration':
-            from django_ai_agent.config_app.models import Configuration
-            model_class = Configuration
-            field_mapping = {'key': 1, 'value': 2}  # Column indices
-        else:
+        labels = dict(EXPORT_MODELS)
+        if model_name not in labels:
             print(f"✗ Unsupported model: {model_name}")
             return False
+        model_class = apps.get_model(labels[model_name])
+        
+        started = time.monotonic()
+        with open_input(input_file) as f:
+            importer = import_objects(iter_csv_objects(f, model_class), **options)
         
-        # Read CSV data
-        created_count = 0
-        with open(input_file, 'r', newline='', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            header = next(reader)  # Skip header row
-            
-            for row in reader:
-                # Create object based on model
-                if model_name.lower() == 'keyword':
-                    obj = model_class(name=row[field_mapping['name']])
-                elif model_name.lower() == 'report':
-                    obj = model_class(title=row[field_mapping['title']], content=row[field_mapping['content']])
-                elif model_name.lower() == 'configuration':
-                    obj = model_class(key=row[field_mapping['key']], value=row[field_mapping['value']])
-                
-                obj.save()
-                created_count += 1
-        
-        print(f"✓ Imported {created_count} {model_name}(s) from {input_file}")
+        _print_summary(importer, input_file, started)
         return True
         
     except Exception as e:
@@ -128,12 +411,29 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Data import utility for AI Information Gathering Agent')
-    parser.add_argument('input_file', help='Input file to import data from')
-    parser.add_argument('--format', choices=['json', 'csv', 'database'], default='json',
-                       help='Import format (default: json)')
-    parser.add_argument('--model', help='Model name for CSV import (keyword, report, configuration)')
+    parser.add_argument('input_file', help='Input file to import data from (.gz, .bz2 and .xz files are decompressed)')
+    parser.add_argument('--format', choices=['json', 'jsonl', 'csv', 'database'],
+                       help='Import format (default: from the file name, json otherwise)')
+    parser.add_argument('--model', choices=[name for name, _ in EXPORT_MODELS],
+                       help='Table of a CSV file, as named by export_data.py')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                       help=f'Objects inserted per transaction (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--on-conflict', choices=['error', 'ignore', 'update'], default='error',
+                       help='Existing records: fail, skip them, or update them matched by natural key (default: error)')
+    parser.add_argument('--atomic', action='store_true',
+                       help='Import the whole file in a single transaction, keeping nothing if it fails '
+                            '(needed when records refer to records later in the file)')
+    parser.add_argument('--progress-every', type=int, default=DEFAULT_PROGRESS_EVERY,
+                       help=f'Print progress every this many objects, 0 to disable (default: {DEFAULT_PROGRESS_EVERY})')
     
     args = parser.parse_args()
+    options = {
+        'batch_size': args.batch_size,
+        'on_conflict': args.on_conflict,
+        'atomic': args.atomic,
+        'progress_every': args.progress_every,
+    }
+    format = args.format or detect_format(args.input_file)
     
     print("AI Information Gathering Agent - Data Import")
     print("=" * 45)
@@ -141,15 +441,15 @@ def main():
     # Import data based on arguments
     success = True
     
-    if args.format == 'json':
-        success = import_from_json(args.input_file)
-    elif args.format == 'csv':
+    if format in ('json', 'jsonl'):
+        success = import_from_json(args.input_file, format, **options)
+    elif format == 'csv':
         if not args.model:
             print("✗ Model name is required for CSV import")
-            print("  Use --model with keyword, report, or configuration")
+            print(f"  Use --model with one of: {', '.join(name for name, _ in EXPORT_MODELS)}")
             sys.exit(1)
-        success = import_from_csv(args.input_file, args.model)
-    elif args.format == 'database':
+        success = import_from_csv(args.input_file, args.model, **options)
+    elif format == 'database':
         success = import_database(args.input_file)
     
     print("\n" + "=" * 45)
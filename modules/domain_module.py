@@ -1,7 +1,15 @@
 from base_module import BaseModule
-from typing import Dict, Any, List
+from http_client import AsyncHTTPClient
+from dns_resolver import DNSResolver, DNSError
+from rate_limiter import TokenBucket
+from config import settings, module_config
+from typing import Dict, Any, List, Optional, Iterator, FrozenSet
 import asyncio
 import logging
+import os
+import random
+import string
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -9,8 +17,14 @@ logger = logging.getLogger(__name__)
 class DomainModule(BaseModule):
     """域名信息收集模块，包括子域名枚举"""
     
-    def __init__(self):
-        super().__init__("domain")
+    def __init__(self, http_client: Optional[AsyncHTTPClient] = None,
+                 resolver: Optional[DNSResolver] = None):
+        super().__init__("domain", http_client)
+        self.resolver = resolver or DNSResolver()
+        # 根域名需要查询的DNS记录类型
+        self.record_types = ["A", "AAAA", "CNAME", "MX", "NS", "TXT"]
+        # modules.yaml 中可通过 wordlist 指定子域名爆破字典的路径
+        self.wordlist = module_config.get_module_config("domain").get("wordlist")
         self.sources = [
             "https://github.com/wgpsec/ENScan_GO",
             "https://www.xiaolanben.com/pc",
@@ -43,10 +57,32 @@ class DomainModule(BaseModule):
         root_domain_info = await self._gather_root_domain_info(target)
         self.store_result("root_domain_info", root_domain_info)
         
+        # 查询根域名的DNS记录
+        dns_records = await self._query_dns_records(target)
+        self.store_result("dns_records", dns_records)
+        
         # 收集子域名信息
         subdomains = await self._enumerate_subdomains(target)
         self.store_result("subdomains", subdomains)
         
+        # 检测泛解析，之后的解析结果据此过滤
+        wildcard = await self._detect_wildcard(target)
+        self.store_result("wildcard", wildcard)
+        
+        # 验证子域名能否解析
+        resolved_subdomains = await self._resolve_subdomains(subdomains, wildcard)
+        
+        # 使用字典爆破子域名
+        if self.wordlist:
+            bruteforce = await self.bruteforce_subdomains(target, self.wordlist, wildcard)
+            self.store_result("bruteforce_stats", bruteforce["stats"])
+            for subdomain, resolved in bruteforce["found"].items():
+                resolved_subdomains.setdefault(subdomain, resolved)
+                if subdomain not in subdomains:
+                    subdomains.append(subdomain)
+        
+        self.store_result("resolved_subdomains", resolved_subdomains)
+        
         self.store_result("target", target)
         
         logger.info(f"完成对 {target} 的域名信息收集")
@@ -107,6 +143,221 @@ class DomainModule(BaseModule):
         
         return list(subdomains)
     
+    async def _query_dns_records(self, target: str) -> Dict[str, Any]:
+        """
+        查询域名的各类DNS记录
+        
+        参数:
+            target: 目标域名
+            
+        返回:
+            以记录类型为键的记录列表字典
+        """
+        tasks = [self.resolver.resolve(target, rdtype) for rdtype in self.record_types]
+        results = await self.run_tasks(tasks)
+        
+        records = {}
+        for rdtype, result in zip(self.record_types, results):
+            if result and result["records"]:
+                records[rdtype] = result["records"]
+        
+        return records
+    
+    async def _resolve_subdomains(self, subdomains: List[str],
+                                  wildcard: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, List[str]]]:
+        """
+        解析子域名，过滤掉无法解析的子域名和命中泛解析的子域名
+        
+        参数:
+            subdomains: 子域名列表
+            wildcard: _detect_wildcard 返回的泛解析信息
+            
+        返回:
+            以可解析的子域名为键，包含地址和CNAME链的字典
+        """
+        fingerprint = self._wildcard_fingerprint(wildcard)
+        
+        async def resolve(subdomain: str) -> Optional[Dict[str, List[str]]]:
+            result = await self._resolve_subdomain(subdomain)
+            if not result or self._matches_wildcard(result["addresses"], result["cnames"], fingerprint):
+                return None
+            await self.emit_finding("resolved_subdomains", {"subdomain": subdomain, **result})
+            return result
+        
+        results = await self.run_tasks([resolve(subdomain) for subdomain in subdomains])
+        return {subdomain: result for subdomain, result in zip(subdomains, results) if result}
+    
+    async def _detect_wildcard(self, target: str) -> Dict[str, Any]:
+        """
+        通过解析若干随机标签检测泛解析
+        
+        参数:
+            target: 目标域名
+            
+        返回:
+            包含是否存在泛解析以及泛解析返回的地址和CNAME的字典
+        """
+        addresses = set()
+        cnames = set()
+        for _ in range(settings.subdomain_wildcard_probes):
+            label = "".join(random.choices(string.ascii_lowercase + string.digits, k=16))
+            try:
+                result = await self.resolver.resolve(f"{label}.{target}", "A")
+            except DNSError as e:
+                logger.debug(f"检测 {target} 的泛解析时出错: {str(e)}")
+                continue
+            addresses.update(result["records"])
+            cnames.update(result["cnames"])
+        
+        if addresses:
+            logger.info(f"{target} 存在泛解析: {sorted(addresses)}")
+        return {
+            "detected": bool(addresses),
+            "addresses": sorted(addresses),
+            "cnames": sorted(cnames)
+        }
+    
+    def _wildcard_fingerprint(self, wildcard: Optional[Dict[str, Any]]) -> Optional[FrozenSet[str]]:
+        """将泛解析信息转换为用于快速比较的指纹"""
+        if not wildcard or not wildcard.get("detected"):
+            return None
+        return frozenset(wildcard["addresses"]) | frozenset(wildcard["cnames"])
+    
+    def _matches_wildcard(self, addresses: List[str], cnames: List[str],
+                          fingerprint: Optional[FrozenSet[str]]) -> bool:
+        """解析结果的地址和CNAME都落在泛解析指纹内时视为泛解析命中"""
+        if fingerprint is None:
+            return False
+        return fingerprint.issuperset(addresses) and (
+            not cnames or not fingerprint.isdisjoint(cnames)
+        )
+    
+    def _iter_wordlist(self, wordlist: str, target: str) -> Iterator[str]:
+        """
+        逐行读取字典并生成候选子域名，不会一次性载入整个文件
+        
+        参数:
+            wordlist: 字典文件路径
+            target: 目标域名
+            
+        产出:
+            候选子域名
+        """
+        with open(wordlist, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                word = line.strip().lower().strip(".")
+                if not word or word.startswith("#") or " " in word:
+                    continue
+                yield f"{word}.{target}"
+    
+    async def bruteforce_subdomains(self, target: str, wordlist: str,
+                                    wildcard: Optional[Dict[str, Any]] = None,
+                                    qps: Optional[float] = None,
+                                    concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        使用字典爆破子域名
+        
+        固定数量的工作协程从字典迭代器中取候选域名，查询速率受令牌桶限制；
+        解析结果与泛解析指纹比较，命中泛解析的候选直接丢弃。
+        
+        参数:
+            target: 目标域名
+            wordlist: 字典文件路径
+            wildcard: 泛解析信息，为None时先执行检测
+            qps: 每秒最多发出的查询数，默认为 settings.subdomain_bruteforce_qps
+            concurrency: 工作协程数，默认为 settings.subdomain_bruteforce_concurrency
+            
+        返回:
+            包含发现的子域名、泛解析信息和统计数据的字典
+        """
+        if not os.path.exists(wordlist):
+            logger.error(f"子域名字典不存在: {wordlist}")
+            return {"found": {}, "wildcard": wildcard, "stats": {"error": f"字典不存在: {wordlist}"}}
+        
+        if wildcard is None:
+            wildcard = await self._detect_wildcard(target)
+        fingerprint = self._wildcard_fingerprint(wildcard)
+        
+        bucket = TokenBucket(qps or settings.subdomain_bruteforce_qps)
+        candidates = self._iter_wordlist(wordlist, target)
+        found: Dict[str, Dict[str, List[str]]] = {}
+        stats = {
+            "candidates": 0,
+            "resolved": 0,
+            "wildcard_filtered": 0,
+            "errors": 0
+        }
+        
+        async def worker():
+            for candidate in candidates:
+                stats["candidates"] += 1
+                await bucket.acquire()
+                try:
+                    await check(candidate)
+                except DNSError:
+                    stats["errors"] += 1
+                except Exception as e:
+                    # 单个候选出错不影响其余候选，已发现的结果保留
+                    stats["errors"] += 1
+                    logger.warning(f"爆破 {candidate} 时出错: {str(e)}")
+        
+        async def check(candidate: str):
+            result = await self.resolver.resolve(candidate, "A")
+            if not result["records"]:
+                return
+            stats["resolved"] += 1
+            if self._matches_wildcard(result["records"], result["cnames"], fingerprint):
+                stats["wildcard_filtered"] += 1
+                return
+            found[candidate] = {"addresses": list(result["records"]), "cnames": list(result["cnames"])}
+            await self.emit_finding("resolved_subdomains", {"subdomain": candidate, **found[candidate]})
+        
+        logger.info(f"开始使用字典 {wordlist} 爆破 {target} 的子域名")
+        started = time.monotonic()
+        workers = [asyncio.create_task(worker())
+                   for _ in range(concurrency or settings.subdomain_bruteforce_concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # 爆破被取消时不留下仍在运行的工作协程
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        
+        stats["duration"] = round(time.monotonic() - started, 3)
+        stats["qps"] = round(stats["candidates"] / stats["duration"], 1) if stats["duration"] else 0
+        logger.info(f"完成 {target} 的子域名爆破: 尝试 {stats['candidates']} 个，发现 {len(found)} 个")
+        return {"found": found, "wildcard": wildcard, "stats": stats}
+    
+    async def _resolve_subdomain(self, subdomain: str) -> Optional[Dict[str, List[str]]]:
+        """
+        解析单个子域名的A和AAAA记录
+        
+        参数:
+            subdomain: 子域名
+            
+        返回:
+            包含地址和CNAME链的字典，无法解析时返回None
+        """
+        addresses = []
+        cnames = []
+        for rdtype in ("A", "AAAA"):
+            try:
+                result = await self.resolver.resolve(subdomain, rdtype)
+            except DNSError as e:
+                logger.debug(f"解析 {subdomain} 的{rdtype}记录时出错: {str(e)}")
+                continue
+            if result["rcode"] == "NXDOMAIN":
+                return None
+            addresses.extend(result["records"])
+            for cname in result["cnames"]:
+                if cname not in cnames:
+                    cnames.append(cname)
+        
+        if not addresses:
+            return None
+        return {"addresses": addresses, "cnames": cnames}
+    
     async def _query_domain_source(self, source: str, target: str) -> Dict[str, Any]:
         """
         查询特定的域名信息来源
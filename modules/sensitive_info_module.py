@@ -1,17 +1,26 @@
 from base_module import BaseModule
-from typing import Dict, Any, List
+from http_client import AsyncHTTPClient
+from config import module_config, settings
+from path_prober import PathProber
+from secret_scanner import SecretScanner
+from typing import Dict, Any, List, Optional, Iterator
 import asyncio
 import logging
-from urllib.parse import quote_plus
+import os
+import re
+import time
+from urllib.parse import quote_plus, urljoin, urlsplit
 
 logger = logging.getLogger(__name__)
 
+SCRIPT_SRC_RE = re.compile(r"""<script[^>]+src\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+
 
 class SensitiveInfoModule(BaseModule):
     """使用Google Dorks和其他技术发现敏感信息的模块"""
     
-    def __init__(self):
-        super().__init__("sensitive_info")
+    def __init__(self, http_client: Optional[AsyncHTTPClient] = None):
+        super().__init__("sensitive_info", http_client)
         self.google_dorks = [
             "site:{} intitle:管理|后台|登陆|管理员|系统|内部",
             "site:{} inurl:login|admin|system|guanli|denglu|manage|admin_login|auth|dev",
@@ -22,6 +31,31 @@ class SensitiveInfoModule(BaseModule):
             "site:{} inurl:api|uid=|id=|userid=|token|session",
             "site:{} intitle:index.of \"server at\""
         ]
+        # 未配置字典时探测的常见敏感文件路径
+        self.sensitive_paths = [
+            "/.env",
+            "/config/database.yml",
+            "/appsettings.json",
+            "/web.config",
+            "/robots.txt",
+            "/sitemap.xml",
+            "/.git/config",
+            "/.svn/entries",
+            "/backup.tar.gz",
+            "/database.sql"
+        ]
+        # modules.yaml 中可通过 wordlist 指定敏感路径字典（每行一个路径）
+        self.wordlist = module_config.get_module_config("sensitive").get("wordlist")
+        # 按路径特征判断文件类型和风险等级，按顺序匹配
+        self.path_categories = [
+            ((".env",), "环境配置", "高"),
+            ((".git/", ".svn/", ".hg/"), "源码仓库", "高"),
+            ((".sql", ".bak", ".zip", ".tar.gz", ".tgz", ".rar", ".7z", ".dump"), "备份存档", "严重"),
+            ((".yml", ".yaml", ".json", ".config", ".ini", ".conf", ".xml"), "配置文件", "高"),
+            ((".log",), "日志文件", "中")
+        ]
+        self.prober = PathProber(self.http_client)
+        self.scanner = SecretScanner()
     
     async def execute(self, target: str) -> Dict[str, Any]:
         """
@@ -157,118 +191,152 @@ class SensitiveInfoModule(BaseModule):
             找到的敏感文件列表
         """
         try:
-            # 出于演示目的，我们正在模拟响应
-            # 在实际实现中，您将执行实际的文件发现
-            
-            # 要检查的常见敏感文件路径
-            sensitive_paths = [
-                "/.env",
-                "/config/database.yml",
-                "/appsettings.json",
-                "/web.config",
-                "/robots.txt",
-                "/sitemap.xml",
-                "/.git/config",
-                "/.svn/entries",
-                "/backup.tar.gz",
-                "/database.sql"
-            ]
+            paths = self._iter_paths(self.wordlist) if self.wordlist else self.sensitive_paths
+            stats: Dict[str, Any] = {}
+            started = time.monotonic()
             
-            # 为检查每个路径创建任务
-            tasks = []
-            for path in sensitive_paths:
-                url = f"https://{target}{path}"
-                task = self._check_file_exists(url)
-                tasks.append(task)
-            
-            # 并发运行所有任务
-            results = await self.run_tasks(tasks)
-            
-            # 过滤掉None结果（未找到的文件）
-            found_files = [result for result in results if result]
+            # 逐个处理探测到的路径，发现即上报，不等全部路径探测完
+            found_files = []
+            async for item in self.prober.probe(f"https://{target}", paths, stats):
+                file_type, risk = self._classify_path(item["path"])
+                item["type"] = file_type
+                item["risk"] = risk if item["status_code"] in (200, 206) else "低"
+                found_files.append(item)
+                await self.emit_finding("sensitive_files", item)
             
+            stats["duration"] = round(time.monotonic() - started, 3)
+            self.store_result("sensitive_files_stats", stats)
             return found_files
             
         except Exception as e:
             logger.error(f"搜索 {target} 的敏感文件时出错: {str(e)}")
             return []
     
-    async def _check_file_exists(self, url: str) -> Dict[str, Any]:
+    def _iter_paths(self, wordlist: str) -> Iterator[str]:
         """
-        检查给定URL处是否存在文件
+        逐行读取敏感路径字典，不会一次性载入整个文件
         
         参数:
-            url: 要检查的URL
+            wordlist: 字典文件路径
             
-        返回:
-            如果找到则返回包含文件信息的字典，否则返回None
+        产出:
+            要探测的路径
         """
-        try:
-            # 出于演示目的，我们正在模拟响应
-            # 在实际实现中，您将发出HTTP请求来检查
-            # 文件是否存在并分析其内容
-            
-            # 模拟文件存在性检查
-            sensitive_files = {
-                f"https://{url.split('/')[2]}/.env": {
-                    "url": url,
-                    "size": "1.2 KB",
-                    "type": "环境配置",
-                    "risk": "高"
-                },
-                f"https://{url.split('/')[2]}/config/database.yml": {
-                    "url": url,
-                    "size": "2.5 KB",
-                    "type": "数据库配置",
-                    "risk": "高"
-                },
-                f"https://{url.split('/')[2]}/backup.tar.gz": {
-                    "url": url,
-                    "size": "125 MB",
-                    "type": "备份存档",
-                    "risk": "严重"
-                }
-            }
-            
-            return sensitive_files.get(url)
+        if not os.path.exists(wordlist):
+            logger.error(f"敏感路径字典不存在: {wordlist}")
+            return
+        with open(wordlist, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                path = line.strip()
+                if path and not path.startswith("#"):
+                    yield path
+    
+    def _classify_path(self, path: str) -> tuple:
+        """
+        根据路径判断文件类型和风险等级
+        
+        参数:
+            path: 文件路径
             
-        except Exception as e:
-            logger.error(f"检查文件 {url} 时出错: {str(e)}")
-            return None
+        返回:
+            (类型, 风险等级) 元组
+        """
+        lowered = path.lower()
+        for patterns, file_type, risk in self.path_categories:
+            if any(pattern in lowered for pattern in patterns):
+                return file_type, risk
+        return "敏感路径", "中"
     
     async def _search_exposed_credentials(self, target: str) -> List[Dict[str, Any]]:
         """
-        搜索暴露的凭证
+        在目标首页、首页引用的同站JavaScript以及发现的敏感文件中搜索暴露的凭证
         
         参数:
             target: 目标域名
             
         返回:
-            找到的暴露凭证列表
+            找到的暴露凭证列表（取值已脱敏）
         """
         try:
-            # 出于演示目的，我们正在模拟响应
-            # 在实际实现中，您将在GitHub、代码仓库中搜索
-            # 和其他来源寻找暴露的凭证
+            credentials = []
+            base_url = f"https://{target}"
+            sources = {}
+            
+            try:
+                metadata, body = await self.http_client.fetch_streamed(base_url + "/",
+                                                                       max_body_bytes=self.scanner.max_bytes)
+                credentials.extend(await self._scan_body("页面", metadata["url"], body))
+                for url in self._extract_script_urls(metadata["url"], body, target):
+                    sources[url] = "JavaScript"
+            except Exception as e:
+                logger.warning(f"获取 {target} 的首页时出错: {str(e)}")
+            
+            # 路径探测只读取了敏感文件的前几KB，这里完整获取后再扫描
+            for item in self.results.get("sensitive_files", []):
+                if item["status_code"] in (200, 206):
+                    sources.setdefault(item["url"], "敏感文件")
             
-            # 模拟凭证发现
-            return [
-                {
-                    "source": "GitHub",
-                    "url": f"https://github.com/example/repo/blob/main/config.py",
-                    "type": "API密钥",
-                    "value": "sk-...XYZ",
-                    "risk": "高"
-                },
-                {
-                    "source": "JavaScript",
-                    "url": f"https://{target}/js/app.js",
-                    "type": "硬编码密码",
-                    "value": "admin123",
-                    "risk": "中"
-                }
-            ]
+            async for url, metadata, body in self.http_client.iter_fetch(
+                    list(sources), max_body_bytes=self.scanner.max_bytes, concurrency=self.prober.concurrency):
+                if "error" in metadata or metadata["status_code"] != 200:
+                    continue
+                credentials.extend(await self._scan_body(sources[url], url, body))
+            
+            return credentials
             
         except Exception as e:
             logger.error(f"搜索 {target} 的暴露凭证时出错: {str(e)}")
             return []
+    
+    def _extract_script_urls(self, page_url: str, body: bytes, target: str) -> List[str]:
+        """
+        提取页面引用的同站脚本URL
+        
+        参数:
+            page_url: 页面的最终URL（用于解析相对路径）
+            body: 页面内容
+            target: 目标域名，只保留该域名及其子域名下的脚本
+            
+        返回:
+            去重后的脚本URL列表，最多 settings.secret_scan_max_scripts 个
+        """
+        urls = []
+        for src in SCRIPT_SRC_RE.findall(body.decode("utf-8", errors="ignore")):
+            url = urljoin(page_url, src.strip())
+            host = urlsplit(url).hostname or ""
+            if (host == target or host.endswith("." + target)) and url not in urls:
+                urls.append(url)
+                if len(urls) >= settings.secret_scan_max_scripts:
+                    break
+        return urls
+    
+    async def _scan_body(self, source: str, url: str, body: bytes) -> List[Dict[str, Any]]:
+        """
+        扫描响应体中的密钥
+        
+        参数:
+            source: 来源类型（页面、JavaScript、敏感文件）
+            url: 响应的URL
+            body: 响应体
+            
+        返回:
+            暴露凭证列表
+        """
+        # 大文件的扫描在线程中进行，避免阻塞事件循环
+        findings = await asyncio.to_thread(self.scanner.scan, body)
+        credentials = [
+            {
+                "source": source,
+                "url": url,
+                "type": finding["type"],
+                "value": finding["value"],
+                "risk": finding["risk"],
+                "rule": finding["rule"],
+                "line": finding["line"],
+                "entropy": finding["entropy"]
+            }
+            for finding in findings
+        ]
+        for credential in credentials:
+            await self.emit_finding("exposed_credentials", credential)
+        return credentials
@@ -0,0 +1,311 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import re
+import string
+import time
+import zlib
+from typing import Optional, Dict, Any, Iterable, AsyncIterator, Tuple
+from urllib.parse import urlsplit, quote
+from config import settings
+from http_client import AsyncHTTPClient
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+")
+# 视为“路径存在”的状态码（206 为 Range 请求的正常响应）
+FOUND_STATUS_CODES = {200, 204, 206, 301, 302, 303, 307, 308, 401, 403}
+REDIRECT_STATUS_CODES = {301, 302, 303, 307, 308}
+# 长度分桶的粒度（字节）
+LENGTH_BUCKET_SIZE = 256
+CONTENT_RANGE_RE = re.compile(r"bytes\s+\d+-\d+/(\d+)")
+
+
+def simhash(text: str) -> int:
+    """
+    计算文本的64位simhash
+    
+    参数:
+        text: 文本
+        
+    返回:
+        64位整数指纹，相似文本的指纹汉明距离较小
+    """
+    weights = [0] * 64
+    tokens = {}
+    for token in TOKEN_RE.findall(text.lower()):
+        tokens[token] = tokens.get(token, 0) + 1
+    
+    for token, count in tokens.items():
+        raw = token.encode("utf-8")
+        value = zlib.crc32(raw) | (zlib.crc32(raw, 0x9E3779B9) << 32)
+        for bit in range(64):
+            if value >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+    
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def length_bucket(length: int) -> int:
+    return length // LENGTH_BUCKET_SIZE
+
+
+def path_class(path: str) -> str:
+    """按扩展名对路径分类，不同扩展名通常由不同的处理程序返回“未找到”"""
+    if path.endswith("/"):
+        return "/"
+    return os.path.splitext(path)[1].lower()
+
+
+class ResponseFingerprint:
+    """一个响应的指纹：状态码、长度分桶、正文simhash和重定向位置"""
+    
+    def __init__(self, status_code: int, length: int, body_hash: str, simhash_value: Optional[int],
+                 location: str, content_type: str):
+        self.status_code = status_code
+        self.length = length
+        self.bucket = length_bucket(length)
+        self.body_hash = body_hash
+        self.simhash = simhash_value
+        self.location = location
+        self.content_type = content_type
+    
+    @classmethod
+    def from_response(cls, path: str, metadata: Dict[str, Any], body: bytes) -> "ResponseFingerprint":
+        """
+        由响应构造指纹
+        
+        “未找到”页面经常回显请求的路径，因此计算指纹前先把路径替换为占位符。
+        """
+        headers = {name.lower(): value for name, value in metadata.get("headers", {}).items()}
+        status_code = 200 if metadata["status_code"] == 206 else metadata["status_code"]
+        
+        placeholders = {path, quote(path), path.lstrip("/")}
+        text = body.decode(metadata.get("encoding") or "utf-8", errors="replace")
+        location = headers.get("location", "")
+        for value in placeholders:
+            if value:
+                text = text.replace(value, "{path}")
+                location = location.replace(value, "{path}")
+        
+        if body:
+            length = len(text)
+            body_hash = hashlib.md5(text.encode("utf-8")).hexdigest()
+            simhash_value = simhash(text)
+        else:
+            # HEAD 请求没有正文，使用 Content-Length
+            length = int(headers.get("content-length", 0) or 0)
+            body_hash = ""
+            simhash_value = None
+        
+        return cls(status_code, length, body_hash, simhash_value, location,
+                   headers.get("content-type", "").split(";")[0].strip())
+
+
+class HostBaseline:
+    """某个主机上某类路径的“未找到”基线"""
+    
+    def __init__(self, fingerprints: Iterable[ResponseFingerprint], simhash_distance: int):
+        self.fingerprints = list(fingerprints)
+        # 基线之间本身的差异（动态内容）计入容差
+        observed = [
+            hamming_distance(a.simhash, b.simhash)
+            for i, a in enumerate(self.fingerprints)
+            for b in self.fingerprints[i + 1:]
+            if a.simhash is not None and b.simhash is not None
+        ]
+        self.simhash_distance = max([simhash_distance] + [distance + 3 for distance in observed])
+    
+    def matches(self, candidate: ResponseFingerprint) -> bool:
+        """判断候选响应是否与基线一致（即软404）"""
+        for baseline in self.fingerprints:
+            if candidate.status_code != baseline.status_code:
+                continue
+            if candidate.status_code in REDIRECT_STATUS_CODES:
+                if candidate.location == baseline.location:
+                    return True
+                continue
+            if candidate.body_hash and candidate.body_hash == baseline.body_hash:
+                return True
+            if abs(candidate.bucket - baseline.bucket) > 1:
+                continue
+            if candidate.simhash is None or baseline.simhash is None:
+                # 没有正文时只能比较长度和类型
+                if candidate.content_type == baseline.content_type:
+                    return True
+                continue
+            if hamming_distance(candidate.simhash, baseline.simhash) <= self.simhash_distance:
+                return True
+        return False
+
+
+class PathProber:
+    """
+    识别软404的敏感路径探测引擎
+    
+    每个主机按路径类型（扩展名）各请求几次随机路径，记录“未找到”响应的指纹；
+    候选路径的响应与对应基线比较，一致的视为软404。候选请求使用 Range GET 只读取前几KB
+    （或使用 HEAD），不会下载完整的大文件。路径可以是惰性迭代器，适用于数万条的字典。
+    """
+    
+    def __init__(self, http_client: AsyncHTTPClient,
+                 method: Optional[str] = None,
+                 sample_bytes: Optional[int] = None,
+                 concurrency: Optional[int] = None,
+                 baseline_probes: Optional[int] = None,
+                 simhash_distance: Optional[int] = None):
+        self.http_client = http_client
+        self.method = (method or settings.path_probe_method).upper()
+        if self.method not in ("GET", "HEAD"):
+            raise ValueError(f"不支持的探测方法: {self.method}")
+        self.sample_bytes = sample_bytes or settings.path_probe_sample_bytes
+        self.concurrency = concurrency or settings.path_probe_concurrency
+        self.baseline_probes = baseline_probes or settings.path_probe_baseline_probes
+        self.simhash_distance = (simhash_distance if simhash_distance is not None
+                                 else settings.path_probe_simhash_distance)
+        self._baselines: Dict[Tuple[str, str], "asyncio.Future[Optional[HostBaseline]]"] = {}
+    
+    @property
+    def headers(self) -> Optional[Dict[str, str]]:
+        if self.method == "GET":
+            return {"Range": f"bytes=0-{self.sample_bytes - 1}"}
+        return None
+    
+    async def _fetch(self, url: str) -> Tuple[Dict[str, Any], bytes]:
+        return await self.http_client.fetch_streamed(url, self.method, self.headers, self.sample_bytes)
+    
+    async def get_baseline(self, base_url: str, cls: str) -> Optional[HostBaseline]:
+        """
+        获取（必要时建立）主机上某类路径的基线，同一类路径的并发请求只建立一次
+        
+        参数:
+            base_url: 主机的基础URL，如 https://example.com
+            cls: 路径类型，见 path_class
+            
+        返回:
+            HostBaseline，所有基线请求都失败时返回None
+        """
+        key = (base_url, cls)
+        future = self._baselines.get(key)
+        if future is None or future.get_loop() is not asyncio.get_running_loop():
+            future = asyncio.ensure_future(self._build_baseline(base_url, cls))
+            self._baselines[key] = future
+        return await asyncio.shield(future)
+    
+    async def _build_baseline(self, base_url: str, cls: str) -> Optional[HostBaseline]:
+        fingerprints = []
+        for _ in range(self.baseline_probes):
+            name = "".join(random.choices(string.ascii_lowercase + string.digits, k=12))
+            path = f"/{name}/" if cls == "/" else f"/{name}{cls}"
+            try:
+                metadata, body = await self._fetch(base_url + path)
+            except Exception as e:
+                logger.warning(f"获取 {base_url} 的“未找到”基线时出错: {str(e)}")
+                continue
+            fingerprints.append(ResponseFingerprint.from_response(path, metadata, body))
+        
+        if not fingerprints:
+            return None
+        logger.debug(f"{base_url} 的 {cls or '无扩展名'} 路径基线状态码: "
+                     f"{[fingerprint.status_code for fingerprint in fingerprints]}")
+        return HostBaseline(fingerprints, self.simhash_distance)
+    
+    def _response_size(self, metadata: Dict[str, Any]) -> Optional[int]:
+        """从 Content-Range 或 Content-Length 获取完整资源的大小"""
+        headers = {name.lower(): value for name, value in metadata.get("headers", {}).items()}
+        match = CONTENT_RANGE_RE.match(headers.get("content-range", ""))
+        if match:
+            return int(match.group(1))
+        if metadata["status_code"] != 206 and headers.get("content-length", "").isdigit():
+            return int(headers["content-length"])
+        return None
+    
+    async def probe(self, base_url: str, paths: Iterable[str],
+                    stats: Optional[Dict[str, int]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        探测路径并逐个产出存在的路径
+        
+        参数:
+            base_url: 主机的基础URL，如 https://example.com
+            paths: 以 / 开头的路径（可以是惰性迭代器）
+            stats: 可选的统计字典，探测过程中就地更新
+            
+        产出:
+            包含URL、路径、状态码、大小和内容类型的字典
+        """
+        base_url = base_url.rstrip("/")
+        if stats is None:
+            stats = {}
+        for name in ("requested", "found", "soft_404", "not_found", "errors", "bytes"):
+            stats.setdefault(name, 0)
+        
+        url_paths: Dict[str, str] = {}
+        
+        def urls():
+            for path in paths:
+                path = path.strip()
+                if not path or path.startswith("#"):
+                    continue
+                if not path.startswith("/"):
+                    path = "/" + path
+                url = base_url + path
+                url_paths[url] = path
+                stats["requested"] += 1
+                yield url
+        
+        async for url, metadata, body in self.http_client.iter_fetch(
+                urls(), self.method, self.headers, self.sample_bytes, self.concurrency):
+            path = url_paths.pop(url, urlsplit(url).path)
+            if "error" in metadata:
+                stats["errors"] += 1
+                continue
+            stats["bytes"] += metadata["bytes"]
+            
+            if metadata["status_code"] not in FOUND_STATUS_CODES:
+                stats["not_found"] += 1
+                continue
+            
+            baseline = await self.get_baseline(base_url, path_class(path))
+            candidate = ResponseFingerprint.from_response(path, metadata, body)
+            if baseline is not None and baseline.matches(candidate):
+                stats["soft_404"] += 1
+                continue
+            
+            stats["found"] += 1
+            yield {
+                "url": url,
+                "path": path,
+                "status_code": metadata["status_code"],
+                "size": self._response_size(metadata),
+                "content_type": candidate.content_type,
+                "location": metadata["headers"].get("location")
+            }
+    
+    async def probe_all(self, base_url: str, paths: Iterable[str]) -> Dict[str, Any]:
+        """
+        探测路径并收集所有存在的路径
+        
+        参数:
+            base_url: 主机的基础URL
+            paths: 要探测的路径
+            
+        返回:
+            包含存在的路径列表和统计信息的字典
+        """
+        stats: Dict[str, Any] = {}
+        started = time.monotonic()
+        found = [item async for item in self.probe(base_url, paths, stats)]
+        stats["duration"] = round(time.monotonic() - started, 3)
+        return {"found": found, "stats": stats}
@@ -0,0 +1,266 @@
+import asyncio
+import gzip
+import io
+import json
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Any, Iterator, AsyncIterator, Tuple
+from config import settings
+
+try:
+    import zstandard
+except ImportError:  # 未安装时使用 gzip
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# 压缩方式对应的文件扩展名
+STREAM_EXTENSIONS = {
+    "zstd": ".jsonl.zst",
+    "gzip": ".jsonl.gz",
+    "none": ".jsonl"
+}
+# 缓冲区超过该大小时写入磁盘
+FLUSH_BYTES = 1024 * 1024
+# 异步读取时每批读取的记录数
+READ_BATCH_SIZE = 1000
+ZSTD_LEVEL = 3
+GZIP_LEVEL = 6
+FORMAT_VERSION = 1
+
+
+def resolve_compression(compression: Optional[str] = None) -> str:
+    """确定实际使用的压缩方式，未安装 zstandard 时退回 gzip"""
+    compression = (compression or settings.result_compression).lower()
+    if compression not in STREAM_EXTENSIONS:
+        raise ValueError(f"不支持的压缩方式: {compression}")
+    if compression == "zstd" and zstandard is None:
+        logger.warning("未安装 zstandard，结果改用 gzip 压缩")
+        return "gzip"
+    return compression
+
+
+def is_stream_file(filepath: str) -> bool:
+    """判断文件是否为流式结果文件"""
+    return filepath.endswith(tuple(STREAM_EXTENSIONS.values()))
+
+
+def _open_binary(filepath: str, mode: str):
+    if filepath.endswith(STREAM_EXTENSIONS["zstd"]):
+        if zstandard is None:
+            raise RuntimeError("读取 .zst 结果文件需要安装 zstandard")
+        raw = open(filepath, mode)
+        if mode == "wb":
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw)
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw))
+    if filepath.endswith(STREAM_EXTENSIONS["gzip"]):
+        return gzip.open(filepath, mode, compresslevel=GZIP_LEVEL) if mode == "wb" else gzip.open(filepath, mode)
+    return open(filepath, mode)
+
+
+class ResultStreamWriter:
+    """
+    流式结果写入器
+    
+    结果以 JSON Lines 格式写入，每个列表条目、每个字典条目各占一行，并按配置使用 zstd/gzip 压缩。
+    模块完成后即可调用 write_module 写入，不需要先构造整个结果文档；写入在线程中进行，不阻塞事件循环。
+    
+    记录类型:
+        header  目标和扫描时间
+        field   字段开始，kind 为 list 或 dict
+        item    列表字段的一个条目
+        entry   字典字段的一个键值对
+        value   其他类型字段的值
+        footer  各模块的时间戳、条目数和摘要
+    """
+    
+    def __init__(self, filepath: str, target: str):
+        self.filepath = filepath
+        self.target = target
+        self.scan_timestamp = datetime.now().isoformat()
+        # (模块, 字段) -> 条目数
+        self.lengths: Dict[Tuple[str, str], int] = {}
+        self.errors = 0
+        self.records = 0
+        self.module_timestamps: Dict[str, str] = {}
+        self._file = None
+        self._closed = False
+        self._buffer = []
+        self._buffered = 0
+        self._lock = asyncio.Lock()
+        self._append({
+            "type": "header",
+            "version": FORMAT_VERSION,
+            "target": self.target,
+            "scan_timestamp": self.scan_timestamp
+        })
+    
+    async def __aenter__(self) -> "ResultStreamWriter":
+        await self.open()
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+    
+    async def open(self):
+        """创建文件并写入头部记录（第一次写入时也会自动创建）"""
+        await self._flush()
+    
+    def _append(self, record: Dict[str, Any]):
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        self._buffer.append(line)
+        self._buffered += len(line)
+        self.records += 1
+    
+    async def _flush(self):
+        async with self._lock:
+            if self._file is None:
+                self._file = await asyncio.to_thread(_open_binary, self.filepath, "wb")
+            if not self._buffer:
+                return
+            data = b"".join(self._buffer)
+            self._buffer = []
+            self._buffered = 0
+            await asyncio.to_thread(self._file.write, data)
+    
+    async def _maybe_flush(self):
+        if self._buffered >= FLUSH_BYTES:
+            await self._flush()
+    
+    async def write_module(self, module_name: str, results: Dict[str, Any]):
+        """
+        写入一个模块的结果
+        
+        参数:
+            module_name: 模块名称
+            results: 模块结果字典
+        """
+        self.module_timestamps[module_name] = datetime.now().isoformat()
+        if "error" in results:
+            self.errors += 1
+        for field, value in results.items():
+            if isinstance(value, list):
+                self._append({"type": "field", "module": module_name, "field": field, "kind": "list"})
+                for item in value:
+                    self._append({"type": "item", "module": module_name, "field": field, "value": item})
+                    await self._maybe_flush()
+            elif isinstance(value, dict):
+                self._append({"type": "field", "module": module_name, "field": field, "kind": "dict"})
+                for key, item in value.items():
+                    self._append({"type": "entry", "module": module_name, "field": field, "key": key, "value": item})
+                    await self._maybe_flush()
+            else:
+                self._append({"type": "value", "module": module_name, "field": field, "value": value})
+                continue
+            self.lengths[(module_name, field)] = len(value)
+        await self._maybe_flush()
+    
+    async def write_results(self, results: Dict[str, Any]):
+        """写入多个模块的结果（模块名 -> 模块结果）"""
+        for module_name, module_results in results.items():
+            await self.write_module(module_name, module_results)
+    
+    def length(self, module_name: str, field: str) -> int:
+        """已写入的某个列表或字典字段的条目数"""
+        return self.lengths.get((module_name, field), 0)
+    
+    async def close(self, summary: Optional[Dict[str, int]] = None):
+        """
+        写入尾部记录并关闭文件
+        
+        参数:
+            summary: 写入尾部的摘要计数
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._append({
+            "type": "footer",
+            "module_timestamps": self.module_timestamps,
+            "lengths": {f"{module}.{field}": count for (module, field), count in self.lengths.items()},
+            "summary": summary or {},
+            "records": self.records + 1
+        })
+        await self._flush()
+        file, self._file = self._file, None
+        await asyncio.to_thread(file.close)
+
+
+def iter_records(filepath: str) -> Iterator[Dict[str, Any]]:
+    """
+    逐条读取流式结果文件中的记录，文件内容不会一次性载入内存
+    
+    参数:
+        filepath: 流式结果文件的路径
+        
+    产出:
+        记录字典
+    """
+    with _open_binary(filepath, "rb") as f:
+        for line in io.TextIOWrapper(f, encoding="utf-8"):
+            if line.strip():
+                yield json.loads(line)
+
+
+async def aiter_records(filepath: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    iter_records 的异步版本，解压和解析在线程中分批进行
+    
+    参数:
+        filepath: 流式结果文件的路径
+        
+    产出:
+        记录字典
+    """
+    records = iter_records(filepath)
+    
+    def next_batch():
+        return [record for _, record in zip(range(READ_BATCH_SIZE), records)]
+    
+    try:
+        while True:
+            batch = await asyncio.to_thread(next_batch)
+            if not batch:
+                break
+            for record in batch:
+                yield record
+    finally:
+        records.close()
+
+
+def build_document(records) -> Dict[str, Any]:
+    """
+    由记录还原与 JSON 结果文件相同结构的文档（target、scan_timestamp、module_timestamps、results）
+    
+    参数:
+        records: iter_records 产出的记录
+        
+    返回:
+        结果文档字典
+    """
+    document: Dict[str, Any] = {"results": {}}
+    results = document["results"]
+    for record in records:
+        kind = record["type"]
+        if kind == "header":
+            document["target"] = record.get("target")
+            document["scan_timestamp"] = record.get("scan_timestamp")
+        elif kind == "footer":
+            document["module_timestamps"] = record.get("module_timestamps", {})
+            document["summary"] = record.get("summary", {})
+        else:
+            module_results = results.setdefault(record["module"], {})
+            if kind == "field":
+                module_results[record["field"]] = [] if record["kind"] == "list" else {}
+            elif kind == "item":
+                module_results.setdefault(record["field"], []).append(record["value"])
+            elif kind == "entry":
+                module_results.setdefault(record["field"], {})[record["key"]] = record["value"]
+            else:
+                module_results[record["field"]] = record["value"]
+    return document
+
+
+def stream_extension(compression: Optional[str] = None) -> str:
+    """获取压缩方式对应的文件扩展名"""
+    return STREAM_EXTENSIONS[resolve_compression(compression)]
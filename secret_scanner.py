@@ -0,0 +1,171 @@
+import math
+import re
+from collections import Counter
+from typing import Optional, Dict, Any, List, Iterable, Union
+from config import settings
+
+# 明显的占位符取值
+PLACEHOLDER_RE = re.compile(rb"^(?:x+|\*+|\.+|<[^>]*>|\$\{[^}]*\}|\{\{[^}]*\}\}|%\(?\w*\)?s?|your[_-]?\w*|changeme|example\w*)$",
+                            re.IGNORECASE)
+# 赋值右侧的取值：带引号，或不带引号但一直到行尾（.env、properties 等配置文件）；
+# 不带引号时排除纯字母的标识符和成员表达式（如 function、a.b），避免把代码误报为密钥
+VALUE_PATTERN = (r"(?P<quote>[\"'])?(?(quote)|(?![A-Za-z_.$]+[ \t]*\r?$)(?=[^\"'\s()\[\]{{}}<>;,]{{{0},{1}}}[ \t]*\r?$))"
+                 r"(?P<secret>[^\"'\s]{{{0},{1}}})(?(quote)(?P=quote)|[ \t]*\r?$)")
+
+
+class SecretRule:
+    """
+    一条密钥检测规则
+    
+    keywords 为小写的前置关键词，正则必须从关键词所在的位置开始匹配（不区分大小写的部分用
+    (?i:...)），扫描时只在关键词出现的位置运行一次 match 确认；关键词之前的上下文可用后行断言检查。
+    正则中的 secret 分组为实际的密钥取值，其香农熵低于 min_entropy 的匹配被丢弃。
+    """
+    
+    def __init__(self, name: str, keywords: Iterable[str], pattern: str, secret_type: str, risk: str,
+                 min_entropy: float = 0.0, flags: int = 0):
+        self.name = name
+        self.keywords = tuple(keyword.encode("ascii") for keyword in keywords)
+        self.regex = re.compile(pattern.encode("ascii"), flags)
+        self.secret_type = secret_type
+        self.risk = risk
+        self.min_entropy = min_entropy
+
+
+# 与 GithubModule.search_patterns 的搜索类别对应的规则
+DEFAULT_RULES = [
+    SecretRule("aws_access_key_id", ["akia", "asia"],
+               r"\b(?P<secret>(?:AKIA|ASIA)[0-9A-Z]{16})\b", "AWS访问密钥ID", "高", 3.0),
+    SecretRule("aws_secret_access_key", ["secret"],
+               r"(?i:secret_?access_?key)[\"']?\s*[:=]\s*[\"']?(?P<secret>[A-Za-z0-9/+=]{40})(?![A-Za-z0-9/+=])",
+               "AWS秘密访问密钥", "严重", 4.0),
+    SecretRule("github_token", ["ghp_", "gho_", "ghu_", "ghs_", "ghr_"],
+               r"\b(?P<secret>gh[pousr]_[A-Za-z0-9]{36,255})\b", "GitHub令牌", "严重", 3.5),
+    SecretRule("github_fine_grained_token", ["github_pat_"],
+               r"\b(?P<secret>github_pat_[A-Za-z0-9_]{82})\b", "GitHub令牌", "严重", 3.5),
+    SecretRule("slack_token", ["xox"],
+               r"\b(?P<secret>xox[baprs]-[A-Za-z0-9-]{10,72})\b", "Slack令牌", "高", 3.0),
+    SecretRule("google_api_key", ["aiza"],
+               r"\b(?P<secret>AIza[0-9A-Za-z_-]{35})(?![0-9A-Za-z_-])", "Google API密钥", "高", 3.5),
+    SecretRule("stripe_secret_key", ["sk_live_", "rk_live_"],
+               r"\b(?P<secret>[sr]k_live_[0-9A-Za-z]{24,99})\b", "Stripe密钥", "严重", 3.5),
+    SecretRule("jwt", ["eyj"],
+               r"\b(?P<secret>eyJ[A-Za-z0-9_-]{10,}\.eyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,})",
+               "JWT", "中", 4.0),
+    SecretRule("private_key", ["-----begin "],
+               r"(?P<secret>-----BEGIN (?:RSA |EC |DSA |OPENSSH |PGP |ENCRYPTED )?PRIVATE KEY(?: BLOCK)?-----)",
+               "私钥", "严重"),
+    SecretRule("jdbc_connection_string", ["jdbc:"],
+               r"(?P<secret>jdbc:[a-z0-9]+:[^\s'\"<>]{4,512})", "JDBC连接串", "高"),
+    SecretRule("uri_credentials", ["://"],
+               r"(?:(?<=mongodb)|(?<=mongodb\+srv)|(?<=mysql)|(?<=postgres)|(?<=postgresql)|(?<=redis)|(?<=amqp)"
+               r"|(?<=amqps)|(?<=ftp)|(?<=ssh)|(?<=smtp))://[^\s:@/'\"]{1,64}:(?P<secret>[^\s@/'\"]{3,128})@",
+               "连接串凭证", "高", 2.0),
+    SecretRule("generic_password", ["pass", "pwd"],
+               r"(?i:pass(?:word|wd)?|pwd)\w{0,16}[\"']?\s*(?:[:=]|=>)\s*" + VALUE_PATTERN.format(6, 128),
+               "硬编码密码", "中", 2.5, re.MULTILINE),
+    SecretRule("generic_secret", ["secret", "token", "api_key", "apikey", "api-key", "credential", "send_keys"],
+               r"(?i:secret|token|api[_-]?key|credentials?|send_keys)\w{0,16}[\"']?\s*(?:[:=]|=>|\()\s*"
+               + VALUE_PATTERN.format(8, 256),
+               "硬编码密钥", "高", 3.5, re.MULTILINE),
+]
+
+
+def shannon_entropy(value: bytes) -> float:
+    """
+    计算取值的香农熵（比特/字符）
+    
+    参数:
+        value: 要计算的字节串
+        
+    返回:
+        熵值，随机生成的密钥通常在 3.5 以上，普通单词和占位符较低
+    """
+    if not value:
+        return 0.0
+    length = len(value)
+    return -sum(count / length * math.log2(count / length) for count in Counter(value).values())
+
+
+def redact(value: str) -> str:
+    """只保留密钥的首尾几个字符"""
+    if len(value) <= 8:
+        return value[:2] + "..."
+    return f"{value[:4]}...{value[-4:]}"
+
+
+class SecretScanner:
+    """
+    多模式密钥检测引擎
+    
+    每个文档只转为小写一次，然后用C实现的子串查找定位所有规则的关键词；只在关键词出现的位置
+    运行对应规则的正则确认（一次 match，而不是在整个文档上 search），最后按香农熵过滤掉占位符
+    和普通单词。正则的开销只与关键词出现次数成正比，不会随规则数量成倍增加整篇文档的扫描次数。
+    """
+    
+    def __init__(self, rules: Optional[List[SecretRule]] = None, max_bytes: Optional[int] = None):
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        # 同一位置被多条规则命中时保留排在前面的（更具体的）规则
+        self._priority = {rule: index for index, rule in enumerate(self.rules)}
+        self.max_bytes = max_bytes or settings.secret_scan_max_bytes
+        # 关键词 -> 使用该关键词的规则，每个关键词只查找一次
+        self._keywords: Dict[bytes, List[SecretRule]] = {}
+        for rule in self.rules:
+            for keyword in rule.keywords:
+                self._keywords.setdefault(keyword, []).append(rule)
+    
+    def scan(self, content: Union[str, bytes]) -> List[Dict[str, Any]]:
+        """
+        扫描一个文档中的密钥
+        
+        参数:
+            content: 文档内容，超过 max_bytes 的部分不扫描
+            
+        返回:
+            发现的密钥列表，按出现位置排序；同一规则的相同取值只报告一次，
+            同一位置只报告最具体的规则
+        """
+        data = content.encode("utf-8", errors="ignore") if isinstance(content, str) else content
+        if len(data) > self.max_bytes:
+            data = data[:self.max_bytes]
+        
+        matches = []
+        seen = set()
+        lowered = data.lower()
+        for keyword, rules in self._keywords.items():
+            position = lowered.find(keyword)
+            while position != -1:
+                for rule in rules:
+                    match = rule.regex.match(data, position)
+                    if match is None:
+                        continue
+                    value = match.group("secret")
+                    # 同一取值可能出现多次，按 (规则, 取值) 去重
+                    if (rule.name, value) in seen or PLACEHOLDER_RE.match(value):
+                        continue
+                    entropy = shannon_entropy(value)
+                    if entropy < rule.min_entropy:
+                        continue
+                    seen.add((rule.name, value))
+                    matches.append((match.start("secret"), rule, value, entropy))
+                position = lowered.find(keyword, position + len(keyword))
+        
+        matches.sort(key=lambda item: (item[0], self._priority[item[1]]))
+        findings = []
+        line, counted = 1, -1
+        for offset, rule, value, entropy in matches:
+            if offset == counted:
+                continue
+            # 按位置顺序增量统计换行数
+            line += data.count(b"\n", max(counted, 0), offset)
+            counted = offset
+            findings.append({
+                "rule": rule.name,
+                "type": rule.secret_type,
+                "risk": rule.risk,
+                "value": redact(value.decode("utf-8", errors="replace")),
+                "entropy": round(entropy, 2),
+                "line": line,
+                "offset": offset
+            })
+        return findings
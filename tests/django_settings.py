@@ -0,0 +1,13 @@
+"""Project settings with a throwaway SQLite database, for the tests of the import/export scripts"""
+import os
+
+from django_ai_agent.ai_agent_project.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['AGENT_TEST_DATABASE'],
+    }
+}
+# The apps have no migrations in the tree, their tables are created from the models
+MIGRATION_MODULES = {app: None for app in ('frontend_app', 'reports_app', 'chat_app', 'config_app', 'keywords_app')}
@@ -0,0 +1,165 @@
+import asyncio
+import ipaddress
+import struct
+
+import pytest
+
+from dns_resolver import DNSError, DNSResolver, RECORD_TYPES, encode_name, parse_response
+
+
+def _record(name, rtype, ttl, rdata):
+    return encode_name(name) + struct.pack("!HHIH", rtype, 1, ttl, len(rdata)) + rdata
+
+
+class StubDNSServer(asyncio.DatagramProtocol):
+    """Answers A queries from a fixed zone; unknown names get NXDOMAIN with an SOA"""
+
+    def __init__(self, zone, delay=0.0, mangle=None):
+        self.zone = zone
+        self.delay = delay
+        self.mangle = mangle
+        self.queries = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        asyncio.get_running_loop().call_later(self.delay, self._answer, data, addr)
+
+    def _answer(self, data, addr):
+        reply = self.reply(data)
+        self.transport.sendto(self.mangle(reply) if self.mangle else reply, addr)
+
+    def reply(self, data):
+        query = parse_response(data)
+        name, qtype = query["questions"][0]
+        self.queries.append((name, qtype))
+        question = encode_name(name) + struct.pack("!HH", qtype, 1)
+
+        answers = []
+        authority = []
+        rcode = 0
+        if name in self.zone:
+            target, address = self.zone[name]
+            if target != name:
+                answers.append(_record(name, RECORD_TYPES["CNAME"], 600, encode_name(target)))
+            if qtype == RECORD_TYPES["A"]:
+                answers.append(_record(target, RECORD_TYPES["A"], 300, ipaddress.IPv4Address(address).packed))
+        else:
+            rcode = 3
+            soa = (encode_name("ns.test") + encode_name("admin.test")
+                   + struct.pack("!IIIII", 1, 3600, 600, 86400, 60))
+            authority.append(_record("test", RECORD_TYPES["SOA"], 900, soa))
+
+        header = struct.pack("!HHHHHH", query["id"], 0x8180 | rcode, 1, len(answers), len(authority), 0)
+        return header + question + b"".join(answers) + b"".join(authority)
+
+
+async def _with_server(zone, scenario, delay=0.0, mangle=None, tcp=False):
+    loop = asyncio.get_running_loop()
+    transport, server = await loop.create_datagram_endpoint(
+        lambda: StubDNSServer(zone, delay, mangle), local_addr=("127.0.0.1", 0)
+    )
+    port = transport.get_extra_info("sockname")[1]
+    tcp_server = None
+    if tcp:
+        async def handle(reader, writer):
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+            reply = server.reply(await reader.readexactly(length))
+            server.tcp_queries = getattr(server, "tcp_queries", 0) + 1
+            writer.write(struct.pack("!H", len(reply)) + reply)
+            await writer.drain()
+            writer.close()
+
+        tcp_server = await asyncio.start_server(handle, "127.0.0.1", port)
+    try:
+        async with DNSResolver(nameservers=[f"127.0.0.1:{port}"], timeout=2.0, retries=0) as resolver:
+            return await scenario(resolver, server)
+    finally:
+        transport.close()
+        if tcp_server is not None:
+            tcp_server.close()
+            await tcp_server.wait_closed()
+
+
+ZONE = {
+    "example.test": ("example.test", "192.0.2.1"),
+    "www.example.test": ("example.test", "192.0.2.1"),
+}
+
+
+def test_resolve_follows_cname_and_caches():
+    async def scenario(resolver, server):
+        first = await resolver.resolve("WWW.example.test.")
+        second = await resolver.resolve("www.example.test")
+        return first, second, list(server.queries), resolver.get_cache_stats()
+
+    first, second, queries, stats = asyncio.run(_with_server(ZONE, scenario))
+    assert first["records"] == ["192.0.2.1"]
+    assert first["cnames"] == ["example.test"]
+    assert first["ttl"] == 300
+    assert second is first
+    assert queries == [("www.example.test", RECORD_TYPES["A"])]
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_nxdomain_is_cached_for_soa_minimum():
+    async def scenario(resolver, server):
+        first = await resolver.resolve("missing.test")
+        await resolver.resolve("missing.test")
+        return first, len(server.queries), resolver.get_cache_stats()
+
+    result, query_count, stats = asyncio.run(_with_server(ZONE, scenario))
+    assert result["records"] == []
+    assert result["rcode"] == "NXDOMAIN"
+    assert result["ttl"] == 60
+    assert query_count == 1
+    assert stats["negative_hits"] == 1
+
+
+def test_concurrent_lookups_are_coalesced():
+    async def scenario(resolver, server):
+        results = await asyncio.gather(*(resolver.resolve_address("example.test") for _ in range(20)))
+        return results, len(server.queries), resolver.get_cache_stats()
+
+    results, query_count, stats = asyncio.run(_with_server(ZONE, scenario, delay=0.05))
+    assert results == ["192.0.2.1"] * 20
+    assert query_count == 1
+    assert stats["coalesced"] == 19
+
+
+def _truncate_mid_record(reply):
+    # Set TC and cut the reply in the middle of the first answer's fixed fields
+    header, body = reply[:12], reply[12:]
+    flags = struct.unpack("!H", header[2:4])[0] | 0x0200
+    cut = len(encode_name("example.test")) + 4 + len(encode_name("example.test")) + 3
+    return header[:2] + struct.pack("!H", flags) + header[4:] + body[:cut]
+
+
+def test_truncated_reply_is_retried_over_tcp():
+    async def scenario(resolver, server):
+        return await resolver.resolve("example.test"), server.tcp_queries
+
+    result, tcp_queries = asyncio.run(_with_server(ZONE, scenario, mangle=_truncate_mid_record, tcp=True))
+    assert result["records"] == ["192.0.2.1"]
+    assert tcp_queries == 1
+
+
+def _dangling_pointer(reply):
+    # Keep the header and question, then start the answer with a compression pointer cut after one byte
+    question_end = 12 + len(encode_name("example.test")) + 4
+    return reply[:question_end] + b"\xc0"
+
+
+def test_malformed_reply_raises_dns_error():
+    async def scenario(resolver, server):
+        with pytest.raises(DNSError):
+            await resolver.resolve("example.test")
+        return len(server.queries)
+
+    assert asyncio.run(_with_server(ZONE, scenario, mangle=_dangling_pointer)) == 1
+
+    header = struct.pack("!HHHHHH", 1, 0x8180, 1, 1, 0, 0)
+    question = encode_name("example.test") + struct.pack("!HH", 1, 1)
+    with pytest.raises(DNSError):
+        parse_response(header + question + encode_name("example.test") + b"\x00\x01")
@@ -0,0 +1,53 @@
+import asyncio
+
+from dns_resolver import DNSError
+from modules.domain_module import DomainModule
+
+
+class FakeResolver:
+    """Answers from a fixed table; some names fail with a DNSError or an unexpected exception"""
+
+    def __init__(self, answers):
+        self.answers = answers
+
+    async def resolve(self, name, rdtype="A"):
+        await asyncio.sleep(0)
+        answer = self.answers.get(name)
+        if isinstance(answer, Exception):
+            raise answer
+        return {"records": answer or [], "cnames": []}
+
+
+def test_bruteforce_survives_unexpected_errors(tmp_path):
+    wordlist = tmp_path / "words.txt"
+    wordlist.write_text("www\nbroken\ntimeout\nmail\nmissing\napi\n", encoding="utf-8")
+    resolver = FakeResolver({
+        "www.example.com": ["192.0.2.1"],
+        "broken.example.com": IndexError("index out of range"),
+        "timeout.example.com": DNSError("timed out"),
+        "mail.example.com": ["192.0.2.2"],
+        "api.example.com": ["192.0.2.3"],
+    })
+    module = DomainModule(resolver=resolver)
+
+    result = asyncio.run(module.bruteforce_subdomains(
+        "example.com", str(wordlist), wildcard={"detected": False}, qps=1000, concurrency=2
+    ))
+
+    assert sorted(result["found"]) == ["api.example.com", "mail.example.com", "www.example.com"]
+    assert result["stats"]["candidates"] == 6
+    assert result["stats"]["errors"] == 2
+
+
+def test_bruteforce_filters_wildcard_answers(tmp_path):
+    wordlist = tmp_path / "words.txt"
+    wordlist.write_text("www\nrandom\n", encoding="utf-8")
+    resolver = FakeResolver({"www.example.com": ["192.0.2.1"], "random.example.com": ["198.51.100.7"]})
+    wildcard = {"detected": True, "addresses": ["198.51.100.7"], "cnames": []}
+
+    result = asyncio.run(DomainModule(resolver=resolver).bruteforce_subdomains(
+        "example.com", str(wordlist), wildcard=wildcard, qps=1000, concurrency=4
+    ))
+
+    assert list(result["found"]) == ["www.example.com"]
+    assert result["stats"]["wildcard_filtered"] == 1
@@ -0,0 +1,86 @@
+import asyncio
+
+import httpx
+
+from http_cache import ResponseCache
+from http_client import AsyncHTTPClient
+
+URL = "http://files.test/.env"
+BODY = b"SECRET_KEY=abc\n" * 64
+
+
+def _cache(tmp_path):
+    return ResponseCache(path=str(tmp_path / "cache.db"), default_ttl=3600, source_ttls={},
+                         max_bytes=1 << 20, max_age=86400)
+
+
+def test_put_and_get_round_trip(tmp_path):
+    async def run():
+        cache = _cache(tmp_path)
+        await cache.put("GET", URL, {}, 200, {"ETag": '"v1"', "Content-Length": "960"}, BODY, "utf-8")
+        entry = await cache.get("GET", URL, {})
+        cache.close()
+        return entry
+
+    entry = asyncio.run(run())
+    assert entry["fresh"] is True
+    assert entry["body"] == BODY
+    assert entry["etag"] == '"v1"'
+    assert "content-length" not in entry["headers"]
+
+
+def test_vary_headers_are_part_of_the_key(tmp_path):
+    async def run():
+        cache = _cache(tmp_path)
+        await cache.put("GET", URL, {"Accept-Language": "en"}, 200, {"Vary": "Accept-Language"}, b"en")
+        english = await cache.get("GET", URL, {"Accept-Language": "en"})
+        german = await cache.get("GET", URL, {"Accept-Language": "de"})
+        cache.close()
+        return english, german
+
+    english, german = asyncio.run(run())
+    assert english["body"] == b"en"
+    assert german is None
+
+
+def test_partial_response_is_not_returned_for_a_full_request(tmp_path):
+    async def run():
+        cache = _cache(tmp_path)
+        ranged = {"Range": "bytes=0-15"}
+        await cache.put("GET", URL, ranged, 206, {"Content-Range": "bytes 0-15/960"}, BODY[:16])
+        full = await cache.get("GET", URL, {})
+        partial = await cache.get("GET", URL, ranged)
+        other_range = await cache.get("GET", URL, {"Range": "bytes=16-31"})
+        cache.close()
+        return full, partial, other_range
+
+    full, partial, other_range = asyncio.run(run())
+    assert full is None
+    assert partial["status_code"] == 206
+    assert partial["body"] == BODY[:16]
+    assert other_range is None
+
+
+def test_client_does_not_serve_a_ranged_probe_to_a_full_get(tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append(request.headers.get("Range"))
+        if "Range" in request.headers:
+            return httpx.Response(206, headers={"Content-Range": f"bytes 0-15/{len(BODY)}"}, content=BODY[:16])
+        return httpx.Response(200, content=BODY)
+
+    async def run():
+        client = AsyncHTTPClient(rate_limits={}, cache=_cache(tmp_path))
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async with client:
+            metadata, sample = await client.fetch_streamed(URL, headers={"Range": "bytes=0-15"})
+            response = await client.get(URL)
+            again = await client.get(URL)
+        return metadata, sample, response, again
+
+    metadata, sample, response, again = asyncio.run(run())
+    assert metadata["status_code"] == 206 and sample == BODY[:16]
+    assert response.status_code == 200 and response.content == BODY
+    assert again.extensions.get("cached") is True
+    assert requests == ["bytes=0-15", None]
@@ -0,0 +1,38 @@
+import time
+
+from http_client import CircuitBreaker
+
+
+def _opened_breaker(reset_timeout=0.05):
+    breaker = CircuitBreaker(threshold=2, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    assert breaker.record_failure() is True
+    return breaker
+
+
+def test_breaker_allows_one_probe_after_reset_timeout():
+    breaker = _opened_breaker()
+    assert breaker.allow() is False
+    time.sleep(0.06)
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+    breaker.record_success()
+    assert breaker.is_open is False
+    assert breaker.allow() is True
+
+
+def test_failed_probe_reopens_breaker():
+    breaker = _opened_breaker()
+    time.sleep(0.06)
+    assert breaker.allow() is True
+    assert breaker.record_failure() is True
+    assert breaker.allow() is False
+
+
+def test_throttled_probe_ends_the_probe():
+    breaker = _opened_breaker()
+    time.sleep(0.06)
+    assert breaker.allow() is True
+    breaker.record_throttled()
+    assert breaker.is_open is True
+    assert breaker.allow() is True
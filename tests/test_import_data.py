@@ -0,0 +1,116 @@
+import os
+import sys
+
+import pytest
+
+django = pytest.importorskip("django")
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    os.environ["AGENT_TEST_DATABASE"] = str(tmp_path_factory.mktemp("db") / "db.sqlite3")
+    os.environ["DJANGO_SETTINGS_MODULE"] = "django_settings"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import import_data  # noqa: F401  (puts the Django project on sys.path)
+    django.setup()
+    from django.core.management import call_command
+    call_command("migrate", run_syncdb=True, verbosity=0)
+
+
+@pytest.fixture
+def user(db):
+    from django.contrib.auth.models import User
+    from keywords_app.models import Keyword, KeywordSearch, PersonInformation
+    for model in (PersonInformation, KeywordSearch, Keyword, User):
+        model.objects.all().delete()
+    return User.objects.create_user("analyst", password="secret")
+
+
+def _import(records, **options):
+    from django.core import serializers
+    from import_data import import_objects
+    objects = (item.object for item in serializers.deserialize("python", records))
+    return import_objects(objects, batch_size=2, progress_every=0, **options)
+
+
+def _keyword(pk, name, user, description=""):
+    return {"model": "keywords_app.keyword", "pk": pk,
+            "fields": {"name": name, "description": description, "created_by": user.pk}}
+
+
+def _search(pk, keyword_pk, query):
+    return {"model": "keywords_app.keywordsearch", "pk": pk,
+            "fields": {"keyword": keyword_pk, "platform": "web", "search_query": query}}
+
+
+def _person(pk, keyword_pk, url, followers):
+    return {"model": "keywords_app.personinformation", "pk": pk,
+            "fields": {"keyword": keyword_pk, "name": "Ada", "platform": "web", "profile_url": url,
+                       "followers_count": followers}}
+
+
+def test_update_matches_natural_keys_and_remaps_references(user):
+    from keywords_app.models import Keyword, KeywordSearch, PersonInformation
+    alpha = Keyword.objects.create(name="alpha", created_by=user)
+    beta = Keyword.objects.create(name="beta", description="unrelated", created_by=user)
+    person = PersonInformation.objects.create(keyword=alpha, name="Ada", platform="web",
+                                              profile_url="https://example.com/ada", followers_count=1)
+
+    records = [
+        # Exists here under another primary key
+        _keyword(70, "alpha", user, "updated"),
+        # New, but its primary key in the file is taken by an unrelated row here
+        _keyword(beta.pk, "gamma", user, "new"),
+        _search(1, 70, "alpha search"),
+        _search(2, beta.pk, "gamma search"),
+        _person(90, 70, "https://example.com/ada", 500),
+        _person(91, beta.pk, "https://example.com/bob", 7),
+    ]
+    importer = _import(records, on_conflict="update")
+
+    beta.refresh_from_db()
+    assert beta.name == "beta" and beta.description == "unrelated"
+    alpha.refresh_from_db()
+    assert alpha.description == "updated"
+    gamma = Keyword.objects.get(name="gamma")
+    assert gamma.pk not in (alpha.pk, beta.pk)
+
+    searches = dict(KeywordSearch.objects.values_list("search_query", "keyword_id"))
+    assert searches == {"alpha search": alpha.pk, "gamma search": gamma.pk}
+    person.refresh_from_db()
+    assert person.followers_count == 500
+    assert PersonInformation.objects.get(profile_url="https://example.com/bob").keyword_id == gamma.pk
+    assert PersonInformation.objects.count() == 2
+    assert importer.counts["keywords_app.keyword"] == {"created": 1, "updated": 1}
+    assert importer.counts["keywords_app.personinformation"] == {"created": 1, "updated": 1}
+
+
+def test_update_upserts_models_without_natural_key_by_primary_key(user):
+    from keywords_app.models import Keyword, KeywordSearch
+    keyword = Keyword.objects.create(name="alpha", created_by=user)
+    KeywordSearch.objects.create(pk=5, keyword=keyword, platform="web", search_query="old")
+
+    importer = _import([_search(5, keyword.pk, "new"), _search(6, keyword.pk, "other")], on_conflict="update")
+
+    assert dict(KeywordSearch.objects.values_list("pk", "search_query")) == {5: "new", 6: "other"}
+    assert importer.counts["keywords_app.keywordsearch"] == {"created": 1, "updated": 1}
+
+
+def test_batch_with_missing_reference_is_rolled_back(user):
+    from django.db import IntegrityError
+    from keywords_app.models import Keyword, KeywordSearch
+    keyword = Keyword.objects.create(name="alpha", created_by=user)
+    records = [
+        _search(1, keyword.pk, "first"), _search(2, keyword.pk, "second"),
+        _search(3, keyword.pk, "third"), _search(4, 999, "orphan"),
+    ]
+
+    with pytest.raises(IntegrityError):
+        _import(records)
+    # The first batch was committed, the batch with the missing keyword was not
+    assert sorted(KeywordSearch.objects.values_list("pk", flat=True)) == [1, 2]
+
+    KeywordSearch.objects.all().delete()
+    with pytest.raises(IntegrityError):
+        _import(records, atomic=True)
+    assert KeywordSearch.objects.count() == 0
@@ -0,0 +1,79 @@
+import asyncio
+import socket
+
+from port_scanner import AsyncPortScanner, parse_port_spec
+
+
+def _closed_port():
+    """A local port with nothing listening on it"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_parse_port_spec():
+    assert parse_port_spec("80,443,8000-8002") == [80, 443, 8000, 8001, 8002]
+    assert parse_port_spec([22, "25"]) == [22, 25]
+
+
+def test_scan_host_finds_local_listener():
+    async def run():
+        async def handle(reader, writer):
+            writer.write(b"SSH-2.0-test\r\n")
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        open_port = server.sockets[0].getsockname()[1]
+        closed_port = _closed_port()
+        found = []
+
+        async def on_open(port_result):
+            found.append(port_result["port"])
+
+        scanner = AsyncPortScanner(max_sockets=16, per_host_concurrency=8, timeout=2.0)
+        async with server:
+            result = await scanner.scan_host("127.0.0.1", [open_port, closed_port], on_open)
+        return result, found, open_port
+
+    result, found, open_port = asyncio.run(run())
+    assert result["alive"] is True
+    assert [item["port"] for item in result["open_ports"]] == [open_port]
+    assert result["open_ports"][0]["banner"] == "SSH-2.0-test"
+    assert result["closed"] == 1
+    assert found == [open_port]
+
+
+def test_scan_host_creates_no_more_workers_than_ports():
+    created = []
+
+    class CountingScanner(AsyncPortScanner):
+        async def _host_worker(self, state, port_iter, result, on_open=None):
+            created.append(state)
+            await super()._host_worker(state, port_iter, result, on_open)
+
+    scanner = CountingScanner(max_sockets=16, per_host_concurrency=100, timeout=1.0)
+    asyncio.run(scanner.scan_host("127.0.0.1", [_closed_port()]))
+    assert len(created) == 1
+
+
+def test_resolve_returns_literal_addresses():
+    scanner = AsyncPortScanner(max_sockets=4)
+    assert asyncio.run(scanner.resolve("127.0.0.1")) == "127.0.0.1"
+
+
+def test_worker_errors_are_counted():
+    async def run():
+        server = await asyncio.start_server(lambda reader, writer: writer.close(), "127.0.0.1", 0)
+        open_port = server.sockets[0].getsockname()[1]
+
+        async def on_open(port_result):
+            raise RuntimeError("callback failed")
+
+        scanner = AsyncPortScanner(max_sockets=16, per_host_concurrency=2, timeout=2.0, banner_timeout=0)
+        async with server:
+            return await scanner.scan_host("127.0.0.1", [open_port, _closed_port(), _closed_port()], on_open)
+
+    result = asyncio.run(run())
+    assert result["errors"] == 1
+    assert result["closed"] == 2
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("django")
+docx = pytest.importorskip("docx")
+
+# The render functions run without Django settings, as they do in the worker processes; the
+# project goes last on the path so that it does not shadow the top-level modules of the same name
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "django_ai_agent"))
+from reports_app import utils  # noqa: E402
+
+
+def _bullets(doc):
+    return [p.text for p in doc.paragraphs if p.style.name == "List Bullet"]
+
+
+def test_word_report_renders_mixed_lists(tmp_path):
+    data = {
+        "findings": [
+            "open <port> & \x01service",
+            {"host": "a<b>", "port": 80},
+            {"host": "c&d", "port": 443, "service": "https\x01"},
+            "second & last",
+            {"only": "one"},
+        ],
+        "details": {"hosts": ["x", "y", "z"], "note": "n/a"},
+    }
+    path = utils.render_word_report(str(tmp_path / "report.docx"), "Scan <&>", data)
+    doc = docx.Document(path)
+
+    assert doc.paragraphs[0].text == "Scan <&>"
+    assert _bullets(doc) == ["open <port> & service", "second & last", "x", "y", "z"]
+    # Two dicts in a row share one table with a header row, a lone dict is a key/value table
+    records, single = doc.tables
+    assert len(records.rows) == 3
+    assert [cell.text for cell in records.rows[0].cells] == ["host", "port", "service"]
+    assert [cell.text for cell in records.rows[1].cells] == ["a<b>", "80", ""]
+    assert [cell.text for cell in records.rows[2].cells] == ["c&d", "443", "https"]
+    assert len(single.rows) == 1
+    assert [cell.text for cell in single.rows[0].cells] == ["only", "one"]
+
+
+def test_combined_report_renders_mixed_lists(tmp_path):
+    scan_data = {"ports": [{"port": 22}, {"port": 80}], "headers": {"server": "<nginx>"}}
+    keyword_data = {"acme": ["a & b", "\x01c"]}
+    path = utils.render_combined_report(str(tmp_path / "combined.docx"), scan_data, keyword_data)
+    doc = docx.Document(path)
+
+    assert _bullets(doc) == ["a & b", "c"]
+    assert [len(table.rows) for table in doc.tables] == [3, 1]
+    assert doc.tables[1].rows[0].cells[1].text == "<nginx>"
+
+
+def test_existing_report_is_not_rendered_again(tmp_path):
+    path = utils.render_word_report(str(tmp_path / "report.docx"), "Title", {"a": ["b"]})
+    mtime = os.stat(path).st_mtime_ns
+    assert utils.render_word_report(path, "Title", {"a": ["c"]}) == path
+    assert os.stat(path).st_mtime_ns == mtime
+    assert _bullets(docx.Document(path)) == ["b"]
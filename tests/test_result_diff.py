@@ -0,0 +1,112 @@
+import copy
+import random
+
+from result_diff import VOLATILE_FIELDS, apply_diff, diff_results, summarize_diff
+
+
+def _without_volatile(value):
+    if isinstance(value, dict):
+        return {key: _without_volatile(item) for key, item in value.items() if key not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [_without_volatile(item) for item in value]
+    return value
+
+
+def _assert_round_trip(old, new):
+    snapshot = copy.deepcopy(old)
+    diff = diff_results(old, new)
+    assert _without_volatile(apply_diff(old, diff)) == _without_volatile(new)
+    assert old == snapshot
+
+
+OLD = {
+    "port": {
+        "target": "example.com",
+        "open_ports": [
+            {"port": 22, "service": "ssh", "rtt": 0.01},
+            {"port": 80, "service": "http", "rtt": 0.02},
+            {"port": 443, "service": "https", "rtt": 0.02},
+        ],
+        "scan_info": {"closed": 997, "filtered": 0},
+    },
+    "domain": {"subdomains": ["www.example.com", "mail.example.com", "dev.example.com"]},
+    "whois": {"registrar": "Example Registrar"},
+}
+
+
+def test_round_trip_keeps_the_new_order():
+    new = copy.deepcopy(OLD)
+    new["port"]["open_ports"] = [
+        {"port": 21, "service": "ftp", "rtt": 0.03},
+        {"port": 22, "service": "ssh", "rtt": 0.05},
+        {"port": 443, "service": "https", "banner": "nginx", "rtt": 0.01},
+        {"port": 8080, "service": "http-proxy", "rtt": 0.04},
+    ]
+    new["port"]["scan_info"] = {"closed": 996, "filtered": 0}
+    new["domain"]["subdomains"] = ["api.example.com", "dev.example.com", "www.example.com"]
+    del new["whois"]
+    new["github"] = {"repositories": []}
+    _assert_round_trip(OLD, new)
+
+
+def test_round_trip_keeps_duplicates():
+    old = {"domain": {"subdomains": ["a.example.com", "b.example.com", "a.example.com"]}}
+    new = {"domain": {"subdomains": ["a.example.com", "a.example.com", "a.example.com", "b.example.com"]}}
+    _assert_round_trip(old, new)
+    _assert_round_trip(new, old)
+
+
+def test_round_trip_with_duplicate_keys_and_different_content():
+    old = {"sensitive": {"sensitive_files": [{"url": "/a", "size": 1}, {"url": "/a", "size": 2}]}}
+    new = {"sensitive": {"sensitive_files": [{"url": "/a", "size": 2}]}}
+    _assert_round_trip(old, new)
+
+
+def test_volatile_fields_alone_are_not_a_change():
+    new = copy.deepcopy(OLD)
+    for item in new["port"]["open_ports"]:
+        item["rtt"] *= 3
+    assert diff_results(OLD, new) == {}
+
+
+def test_random_round_trips():
+    rng = random.Random(1234)
+    for _ in range(300):
+        old_ports = [{"port": rng.randrange(1, 12), "state": rng.choice("ab")} for _ in range(rng.randrange(8))]
+        new_ports = [{"port": rng.randrange(1, 12), "state": rng.choice("ab")} for _ in range(rng.randrange(8))]
+        old_names = [rng.choice("xyz") for _ in range(rng.randrange(6))]
+        new_names = [rng.choice("xyz") for _ in range(rng.randrange(6))]
+        old = {"port": {"open_ports": old_ports}, "domain": {"subdomains": old_names}}
+        new = {"port": {"open_ports": new_ports}, "domain": {"subdomains": new_names}}
+        _assert_round_trip(old, new)
+
+
+def test_chained_diffs_rebuild_the_latest_scan():
+    scans = [copy.deepcopy(OLD)]
+    rng = random.Random(99)
+    for _ in range(5):
+        scan = copy.deepcopy(scans[-1])
+        ports = scan["port"]["open_ports"]
+        rng.shuffle(ports)
+        ports.insert(rng.randrange(len(ports) + 1), {"port": rng.randrange(1000, 2000), "service": "?"})
+        scans.append(scan)
+    results = scans[0]
+    for previous, current in zip(scans, scans[1:]):
+        results = apply_diff(results, diff_results(previous, current))
+    assert results == scans[-1]
+
+
+def test_diffs_without_positions_are_still_applied():
+    legacy = {"domain": {"kind": "changed", "fields": {"subdomains": {
+        "kind": "list", "added": ["api.example.com"], "removed": ["mail.example.com"]
+    }}}}
+    results = apply_diff(OLD, legacy)
+    assert results["domain"]["subdomains"] == ["www.example.com", "dev.example.com", "api.example.com"]
+
+
+def test_summarize_diff_counts_changes():
+    new = copy.deepcopy(OLD)
+    new["port"]["open_ports"].append({"port": 8443, "service": "https-alt"})
+    new["port"]["open_ports"][0]["service"] = "openssh"
+    summary = summarize_diff(diff_results(OLD, new))
+    assert summary == {"port": {"open_ports": {"added": 1, "updated": 1}}}
@@ -0,0 +1,51 @@
+import asyncio
+
+from scheduler import FairScheduler
+
+
+def test_items_are_interleaved_across_keys():
+    order = []
+
+    async def handler(key, item):
+        order.append((key, item))
+        await asyncio.sleep(0)
+
+    groups = [("a", [1, 2, 3]), ("b", [1, 2, 3])]
+    asyncio.run(FairScheduler(max_concurrency=2).run(groups, handler))
+    assert order[:2] == [("a", 1), ("b", 1)]
+    assert sorted(order) == [("a", 1), ("a", 2), ("a", 3), ("b", 1), ("b", 2), ("b", 3)]
+
+
+def test_per_key_concurrency_is_respected():
+    running = {}
+    peak = {}
+
+    async def handler(key, item):
+        running[key] = running.get(key, 0) + 1
+        peak[key] = max(peak.get(key, 0), running[key])
+        await asyncio.sleep(0.01)
+        running[key] -= 1
+
+    groups = [("a", range(6)), ("b", range(6))]
+    asyncio.run(FairScheduler(max_concurrency=8, per_key_concurrency=2).run(groups, handler))
+    assert peak == {"a": 2, "b": 2}
+
+
+def test_failures_do_not_abort_the_batch():
+    handled = []
+    completed = []
+
+    async def handler(key, item):
+        if item == "bad":
+            raise RuntimeError("work item failed")
+        handled.append((key, item))
+
+    async def on_key_complete(key):
+        completed.append(key)
+        if key == "a":
+            raise RuntimeError("completion failed")
+
+    groups = [("a", ["bad", "ok"]), ("b", ["ok"]), ("c", ["ok"])]
+    asyncio.run(FairScheduler(max_concurrency=2).run(groups, handler, on_key_complete))
+    assert sorted(handled) == [("a", "ok"), ("b", "ok"), ("c", "ok")]
+    assert sorted(completed) == ["a", "b", "c"]
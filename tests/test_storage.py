@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from config import settings
+from storage import ResultsStorage
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "output_dir", str(tmp_path / "results"))
+    monkeypatch.setattr(settings, "results_catalog_path", None)
+    monkeypatch.setattr(settings, "findings_index_path", None)
+    return ResultsStorage()
+
+
+def _scan(*ports):
+    return {"port": {"open_ports": [{"port": port, "service": "tcp"} for port in ports]}}
+
+
+def test_latest_results_are_looked_up_per_target(storage):
+    async def run():
+        await storage.save_results("a.b", _scan(22))
+        await storage.save_results("a_b", _scan(80))
+        return await storage.load_latest_results("a.b"), await storage.load_latest_results("a_b")
+
+    dotted, underscored = asyncio.run(run())
+    assert dotted["target"] == "a.b"
+    assert dotted["results"] == _scan(22)
+    assert underscored["results"] == _scan(80)
+    assert asyncio.run(storage.load_latest_results("c.d")) is None
+
+
+def test_incremental_chain_restores_the_latest_scan(storage):
+    scans = [_scan(22, 80), _scan(443, 22), _scan(8080, 443, 22, 8080)]
+
+    async def run():
+        previous = None
+        for results in scans:
+            await storage.save_incremental_results("example.com", results, previous)
+            previous = await storage.load_latest_results("example.com")
+        return previous
+
+    latest = asyncio.run(run())
+    assert latest["chain_length"] == 2
+    assert latest["results"] == scans[-1]
@@ -0,0 +1,327 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import whois_client
+from whois_client import (IANA_SERVER, WhoisClient, WhoisError, _parse_lines, normalize_date, parse_record,
+                          parse_referral, registrable_domain)
+
+# Trimmed recordings of real replies
+IANA_COM = """\
+% IANA WHOIS server
+% for more information on IANA, visit http://www.iana.org
+% This query returned 1 object
+
+refer:        whois.verisign-grs.com
+
+domain:       COM
+
+organisation: VeriSign Global Registry Services
+address:      12061 Bluemont Way
+address:      Reston Virginia 20190
+address:      United States of America (the)
+
+whois:        whois.verisign-grs.com
+
+status:       ACTIVE
+remarks:      Registration information: http://www.verisigninc.com
+
+created:      1985-01-01
+changed:      2023-12-07
+source:       IANA
+"""
+
+VERISIGN_EXAMPLE = """\
+   Domain Name: EXAMPLE.COM
+   Registry Domain ID: 2336799_DOMAIN_COM-VRSN
+   Registrar WHOIS Server: whois.markmonitor.com
+   Registrar URL: http://www.markmonitor.com
+   Updated Date: 2024-08-14T07:01:34Z
+   Creation Date: 1995-08-14T04:00:00Z
+   Registry Expiry Date: 2025-08-13T04:00:00Z
+   Registrar: MarkMonitor Inc.
+   Registrar IANA ID: 292
+   Domain Status: clientDeleteProhibited https://icann.org/epp#clientDeleteProhibited
+   Domain Status: clientTransferProhibited https://icann.org/epp#clientTransferProhibited
+   Name Server: A.IANA-SERVERS.NET
+   Name Server: B.IANA-SERVERS.NET
+   DNSSEC: signedDelegation
+>>> Last update of whois database: 2024-09-01T12:00:00Z <<<
+
+NOTICE: The expiration date displayed in this record is the date the
+registrar's sponsorship of the domain name registration in the registry is
+currently set to expire.
+"""
+
+MARKMONITOR_EXAMPLE = """\
+Domain Name: example.com
+Registry Domain ID: 2336799_DOMAIN_COM-VRSN
+Registrar WHOIS Server: whois.markmonitor.com
+Registrar URL: http://www.markmonitor.com
+Updated Date: 2024-08-14T07:01:34+0000
+Creation Date: 1995-08-14T04:00:00+0000
+Registrar Registration Expiration Date: 2025-08-13T04:00:00+0000
+Registrar: MarkMonitor, Inc.
+Registrar Abuse Contact Email: abusecomplaints@markmonitor.com
+Domain Status: clientUpdateProhibited (https://www.icann.org/epp#clientUpdateProhibited)
+Registrant Organization: Internet Assigned Numbers Authority
+Registrant Country: US
+Registrant Email: REDACTED FOR PRIVACY
+Name Server: a.iana-servers.net
+Name Server: b.iana-servers.net
+>>> Last update of WHOIS database: 2024-09-01T12:00:00+0000 <<<
+"""
+
+VERISIGN_NOT_FOUND = """\
+No match for domain "NO-SUCH-DOMAIN-4F2A.COM".
+>>> Last update of whois database: 2024-09-01T12:00:00Z <<<
+"""
+
+RATE_LIMITED = "%ERROR:201: access denied - query limit exceeded, try again later\n"
+
+IANA_UK = """\
+refer:        whois.nic.uk
+
+domain:       UK
+"""
+
+NOMINET_EXAMPLE = """\
+
+    Domain name:
+        example.co.uk
+
+    Registrar:
+        Nominet UK [Tag = NOMINET]
+
+    Relevant dates:
+        Registered on: 26-Nov-1996
+        Expiry date:  28-Nov-2026
+
+    Name servers:
+        curt.ns.cloudflare.com
+        lia.ns.cloudflare.com
+
+    WHOIS lookup made at 12:00:00 01-Sep-2024
+"""
+
+
+class RecordedWhoisClient(WhoisClient):
+    """WhoisClient that answers from recordings instead of connecting to port 43"""
+
+    def __init__(self, replies, **kwargs):
+        kwargs.setdefault("rate_limits", {})
+        super().__init__(**kwargs)
+        self.replies = {server: list(texts) if isinstance(texts, list) else texts for server, texts in replies.items()}
+        self.sent = []
+
+    async def _exchange(self, server, query):
+        self.sent.append((server, query))
+        await asyncio.sleep(0.01)
+        reply = self.replies.get(server)
+        if reply is None:
+            raise ConnectionRefusedError(f"no recording for {server}")
+        # A list is consumed one reply per query, the last one repeats
+        if isinstance(reply, list):
+            return reply.pop(0) if len(reply) > 1 else reply[0]
+        return reply
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(whois_client.settings, "retry_backoff_base", 0)
+    monkeypatch.setattr(whois_client.settings, "whois_rate_limit", 0)
+
+
+def test_parse_lines_skips_comments_and_stops_at_last_update():
+    pairs = _parse_lines(VERISIGN_EXAMPLE)
+    assert pairs[0] == ("domain name", "EXAMPLE.COM")
+    assert ("registrar", "MarkMonitor Inc.") in pairs
+    assert not any(key.startswith("notice") for key, _ in pairs)
+    assert all(not key.startswith("%") for key, _ in _parse_lines(IANA_COM))
+
+
+def test_parse_lines_reads_indented_values():
+    pairs = _parse_lines(NOMINET_EXAMPLE)
+    assert ("domain name", "example.co.uk") in pairs
+    assert ("name servers", "curt.ns.cloudflare.com") in pairs
+    assert ("name servers", "lia.ns.cloudflare.com") in pairs
+    assert ("registered on", "26-Nov-1996") in pairs
+
+
+def test_parse_referral():
+    assert parse_referral(IANA_COM, IANA_SERVER) == "whois.verisign-grs.com"
+    assert parse_referral(VERISIGN_EXAMPLE, "whois.verisign-grs.com") == "whois.markmonitor.com"
+    # A server that refers to itself ends the chain
+    assert parse_referral(MARKMONITOR_EXAMPLE, "whois.markmonitor.com") is None
+    assert parse_referral("ReferralServer: whois://whois.ripe.net:43\n") == "whois.ripe.net"
+    assert parse_referral("ReferralServer: rwhois://rwhois.example.net:4321\n") is None
+    assert parse_referral(VERISIGN_NOT_FOUND) is None
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1995-08-14T04:00:00Z", "1995-08-14T04:00:00+00:00"),
+    ("2024-08-14T07:01:34+0000", "2024-08-14T07:01:34+00:00"),
+    ("2003-06-10 00:00:00 (GMT+0:00)", "2003-06-10T00:00:00"),
+    ("2020-01-02 03:04:05 UTC", "2020-01-02T03:04:05"),
+    ("26-Nov-1996", "1996-11-26T00:00:00"),
+    ("2001.02.03", "2001-02-03T00:00:00"),
+    ("03.02.2001", "2001-02-03T00:00:00"),
+    ("20010203", "2001-02-03T00:00:00"),
+    ("before 1995", "before 1995"),
+])
+def test_normalize_date(value, expected):
+    assert normalize_date(value) == expected
+
+
+def test_parse_record():
+    record = parse_record(VERISIGN_EXAMPLE)
+    assert record["registrar"] == "MarkMonitor Inc."
+    assert record["creation_date"] == "1995-08-14T04:00:00+00:00"
+    assert record["expiration_date"] == "2025-08-13T04:00:00+00:00"
+    assert record["nameservers"] == ["a.iana-servers.net", "b.iana-servers.net"]
+    assert record["status"] == ["clientDeleteProhibited", "clientTransferProhibited"]
+    assert record["dnssec"] == "signedDelegation"
+
+    record = parse_record(MARKMONITOR_EXAMPLE)
+    assert record["registrant_organization"] == "Internet Assigned Numbers Authority"
+    # Redacted values are left out
+    assert record["emails"] == ["abusecomplaints@markmonitor.com"]
+
+    record = parse_record(NOMINET_EXAMPLE)
+    assert record["creation_date"] == "1996-11-26T00:00:00"
+    assert record["nameservers"] == ["curt.ns.cloudflare.com", "lia.ns.cloudflare.com"]
+
+
+def test_registrable_domain_falls_back_to_second_level_suffixes(monkeypatch):
+    monkeypatch.setattr(whois_client, "tldextract", None)
+    assert registrable_domain("www.shop.example.co.uk") == "example.co.uk"
+    assert registrable_domain("a.b.example.com.cn.") == "example.com.cn"
+    assert registrable_domain("WWW.Example.COM") == "example.com"
+    # Only two-letter country codes have second-level suffixes
+    assert registrable_domain("mail.co.example.com") == "example.com"
+    assert registrable_domain("bücher.example.de") == "example.de"
+    assert registrable_domain("xn--bcher-kva.de") == "xn--bcher-kva.de"
+    assert registrable_domain("192.0.2.1") == "192.0.2.1"
+
+
+def test_lookup_follows_referral_chain():
+    client = RecordedWhoisClient({
+        IANA_SERVER: IANA_COM,
+        "whois.verisign-grs.com": VERISIGN_EXAMPLE,
+        "whois.markmonitor.com": MARKMONITOR_EXAMPLE,
+    })
+    result = asyncio.run(client.lookup("www.example.com"))
+
+    assert client.sent == [
+        (IANA_SERVER, "com"),
+        ("whois.verisign-grs.com", "domain example.com"),
+        ("whois.markmonitor.com", "example.com"),
+    ]
+    assert result["domain"] == "example.com"
+    assert result["found"] is True
+    assert result["servers"] == ["whois.verisign-grs.com", "whois.markmonitor.com"]
+    # Registrar fields override the registry's, registry-only fields are kept
+    assert result["registrar"] == "MarkMonitor, Inc."
+    assert result["dnssec"] == "signedDelegation"
+    assert result["raw"] == MARKMONITOR_EXAMPLE
+    assert client.stats["referrals"] == 1
+
+
+def test_lookup_stops_at_self_referral():
+    self_referral = VERISIGN_EXAMPLE.replace("whois.markmonitor.com", "whois.verisign-grs.com")
+    client = RecordedWhoisClient({IANA_SERVER: IANA_COM, "whois.verisign-grs.com": self_referral})
+    result = asyncio.run(client.lookup("example.com"))
+
+    assert result["servers"] == ["whois.verisign-grs.com"]
+    assert [server for server, _ in client.sent].count("whois.verisign-grs.com") == 1
+    assert client.stats["referrals"] == 0
+
+
+def test_lookup_of_cctld_second_level_domain(monkeypatch):
+    monkeypatch.setattr(whois_client, "tldextract", None)
+    client = RecordedWhoisClient({IANA_SERVER: IANA_UK, "whois.nic.uk": NOMINET_EXAMPLE})
+    result = asyncio.run(client.lookup("www.example.co.uk"))
+
+    assert client.sent == [(IANA_SERVER, "uk"), ("whois.nic.uk", "example.co.uk")]
+    assert result["domain"] == "example.co.uk"
+    assert result["registrar"] == "Nominet UK [Tag = NOMINET]"
+    assert result["expiration_date"] == "2026-11-28T00:00:00"
+
+
+def test_lookup_keeps_registry_data_when_registrar_fails():
+    client = RecordedWhoisClient({IANA_SERVER: IANA_COM, "whois.verisign-grs.com": VERISIGN_EXAMPLE})
+    result = asyncio.run(client.lookup("example.com"))
+
+    assert result["found"] is True
+    assert result["servers"] == ["whois.verisign-grs.com"]
+    assert result["registrar"] == "MarkMonitor Inc."
+    assert "whois.markmonitor.com" in result["referral_error"]
+
+
+def test_not_found_is_cached_for_the_negative_ttl(monkeypatch):
+    client = RecordedWhoisClient({IANA_SERVER: IANA_COM, "whois.verisign-grs.com": VERISIGN_NOT_FOUND},
+                                 cache_ttl=600, negative_ttl=60)
+    now = [1000.0]
+    # Only the cache's clock, the event loop keeps the real one
+    monkeypatch.setattr(whois_client, "time", SimpleNamespace(monotonic=lambda: now[0]))
+
+    async def run():
+        first = await client.lookup("no-such-domain-4f2a.com")
+        now[0] += 59
+        second = await client.lookup("www.no-such-domain-4f2a.com")
+        now[0] += 2
+        third = await client.lookup("no-such-domain-4f2a.com")
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+
+    assert first["found"] is False
+    assert "registrar" not in first
+    assert second is first
+    assert third is not first and third["found"] is False
+    assert client.stats["hits"] == 1
+    assert client.stats["misses"] == 2
+    # The TLD server is asked of IANA only once
+    assert [server for server, _ in client.sent] == [IANA_SERVER, "whois.verisign-grs.com", "whois.verisign-grs.com"]
+
+
+def test_rate_limited_reply_is_retried():
+    client = RecordedWhoisClient({
+        IANA_SERVER: IANA_COM,
+        "whois.verisign-grs.com": [RATE_LIMITED, VERISIGN_EXAMPLE],
+        "whois.markmonitor.com": MARKMONITOR_EXAMPLE,
+    })
+    result = asyncio.run(client.lookup("example.com"))
+
+    assert result["registrar"] == "MarkMonitor, Inc."
+    assert client.stats["rate_limited"] == 1
+    assert [server for server, _ in client.sent].count("whois.verisign-grs.com") == 2
+
+
+def test_persistent_rate_limit_raises_whois_error():
+    client = RecordedWhoisClient({IANA_SERVER: IANA_COM, "whois.verisign-grs.com": RATE_LIMITED})
+
+    with pytest.raises(WhoisError, match="whois.verisign-grs.com"):
+        asyncio.run(client.lookup("example.com"))
+    assert client.stats["rate_limited"] == whois_client.settings.retry_attempts
+    assert client.get_cache_stats()["size"] == 0
+
+
+def test_concurrent_lookups_are_coalesced():
+    client = RecordedWhoisClient({
+        IANA_SERVER: IANA_COM,
+        "whois.verisign-grs.com": VERISIGN_EXAMPLE,
+        "whois.markmonitor.com": MARKMONITOR_EXAMPLE,
+    })
+
+    async def run():
+        return await asyncio.gather(client.lookup("example.com"), client.lookup("www.example.com"),
+                                    client.lookup("api.example.com"))
+
+    results = asyncio.run(run())
+
+    assert results[0] is results[1] is results[2]
+    assert client.stats["misses"] == 1
+    assert client.stats["coalesced"] == 2
+    assert len(client.sent) == 3
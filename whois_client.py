@@ -0,0 +1,480 @@
+import asyncio
+import ipaddress
+import logging
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+from config import settings, module_config
+from rate_limiter import TokenBucket
+
+try:
+    import tldextract
+except ImportError:  # 没有公共后缀列表时按常见二级后缀推断可注册域名
+    tldextract = None
+
+logger = logging.getLogger(__name__)
+
+IANA_SERVER = "whois.iana.org"
+WHOIS_PORT = 43
+# 结果中保留的原始应答长度
+RAW_RESPONSE_LIMIT = 8192
+
+# 常见的国家顶级域下的二级后缀（如 example.com.cn、example.co.uk）
+SECOND_LEVEL_SUFFIXES = {"com", "net", "org", "gov", "edu", "ac", "co", "or", "ne", "go", "mil", "ltd", "plc", "sch", "gen"}
+
+# 部分服务器需要特定的查询格式
+QUERY_FORMATS = {
+    "whois.verisign-grs.com": "domain {}",
+    "whois.denic.de": "-T dn,ace {}",
+    "whois.jprs.jp": "{}/e",
+    "whois.arin.net": "n + {}"
+}
+
+# 标准化字段 -> 各服务器使用的字段名（小写）
+FIELD_ALIASES = {
+    "registrar": ("registrar", "sponsoring registrar", "registrar name", "registrar organization"),
+    "registrar_url": ("registrar url", "referral url"),
+    "creation_date": ("creation date", "created", "created on", "registered on", "registration time",
+                      "registered", "domain registration date", "registration date"),
+    "updated_date": ("updated date", "last updated", "last-modified", "last modified", "changed", "updated on"),
+    "expiration_date": ("registry expiry date", "registrar registration expiration date", "expiration date",
+                        "expiry date", "expires on", "expires", "paid-till", "expiration time", "renewal date"),
+    "nameservers": ("name server", "name servers", "nameserver", "nameservers", "nserver"),
+    "status": ("domain status", "status"),
+    "registrant": ("registrant", "registrant name", "registrant contact name"),
+    "registrant_organization": ("registrant organization", "registrant organisation", "organization",
+                                "orgname", "org-name", "owner"),
+    "registrant_country": ("registrant country", "country"),
+    "emails": ("registrar abuse contact email", "registrant email", "registrant contact email",
+               "abuse-mailbox", "orgabuseemail", "e-mail", "email"),
+    "dnssec": ("dnssec",),
+    "network": ("netrange", "inetnum", "inet6num", "cidr"),
+    "network_name": ("netname",),
+    "asn": ("originas", "origin", "aut-num")
+}
+FIELD_NAMES = {alias: field for field, aliases in FIELD_ALIASES.items() for alias in aliases}
+LIST_FIELDS = {"nameservers", "status", "emails"}
+DATE_FIELDS = {"creation_date", "updated_date", "expiration_date"}
+DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%d-%b-%Y", "%d-%b-%Y %H:%M:%S", "%Y.%m.%d", "%Y/%m/%d",
+                "%d.%m.%Y", "%d/%m/%Y", "%Y%m%d", "%Y. %m. %d.")
+
+# 转介到下一级WHOIS服务器的字段
+REFERRAL_KEYS = ("refer", "whois", "registrar whois server", "whois server", "referralserver")
+NOT_FOUND_RE = re.compile(
+    r"(?im)^\W*(no match for|not found|no data found|no entries found|no object found|domain not found|"
+    r"the queried object does not exist|no matching record|status:\s*(free|available))"
+)
+RATE_LIMITED_RE = re.compile(r"(?i)(limit exceeded|too many (requests|queries)|quota exceeded|try again later)")
+
+
+class WhoisError(Exception):
+    """WHOIS查询失败（连接失败、超时、服务器限流等）"""
+
+
+def registrable_domain(name: str) -> str:
+    """
+    求主机名的可注册域名（如 a.b.example.com.cn -> example.com.cn），同一域名下的子域名共享WHOIS结果
+    
+    安装了 tldextract 时使用其内置的公共后缀列表，否则按常见的二级后缀推断。
+    
+    参数:
+        name: 域名或IP
+        
+    返回:
+        可注册域名（IDNA编码、小写）；IP原样返回
+    """
+    name = name.strip().rstrip(".").lower()
+    try:
+        return str(ipaddress.ip_address(name))
+    except ValueError:
+        pass
+    try:
+        name = name.encode("idna").decode("ascii")
+    except UnicodeError:
+        pass
+    
+    if tldextract is not None:
+        extracted = _extractor()(name)
+        if extracted.domain and extracted.suffix:
+            return f"{extracted.domain}.{extracted.suffix}"
+    
+    labels = name.split(".")
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+_tld_extractor = None
+
+
+def _extractor():
+    global _tld_extractor
+    if _tld_extractor is None:
+        # 只使用随包发布的后缀列表，不在扫描时联网下载
+        _tld_extractor = tldextract.TLDExtract(suffix_list_urls=())
+    return _tld_extractor
+
+
+def _parse_lines(text: str) -> List[Tuple[str, str]]:
+    """
+    把WHOIS应答拆成 (字段名, 值) 对
+    
+    跳过注释行，在 ">>> Last update" 之后的声明部分停止；字段值为空时，其后缩进的行作为该字段的值。
+    """
+    pairs = []
+    pending = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith(">>>"):
+            break
+        if not stripped or stripped[0] in "%#":
+            pending = None
+            continue
+        if pending is not None and line[:1].isspace() and ": " not in stripped:
+            pairs.append((pending, stripped))
+            continue
+        key, sep, value = stripped.partition(":")
+        if not sep or not key or len(key) > 60:
+            pending = None
+            continue
+        key = key.strip().lower()
+        value = value.strip()
+        if value:
+            pairs.append((key, value))
+            pending = None
+        else:
+            pending = key
+    return pairs
+
+
+def parse_referral(text: str, current: Optional[str] = None) -> Optional[str]:
+    """
+    从WHOIS应答中找出下一级WHOIS服务器
+    
+    参数:
+        text: WHOIS应答
+        current: 当前服务器，指向自身的转介会被忽略
+        
+    返回:
+        服务器主机名，没有转介时返回None
+    """
+    for key, value in _parse_lines(text):
+        if key not in REFERRAL_KEYS:
+            continue
+        value = value.strip().lower()
+        if value.startswith("rwhois://"):
+            continue
+        if value.startswith("whois://"):
+            value = value[len("whois://"):]
+        server = value.split("/")[0].split(":")[0].strip()
+        if server and "." in server and " " not in server and server != current:
+            return server
+    return None
+
+
+def normalize_date(value: str) -> str:
+    """
+    把WHOIS中各种格式的日期转换为ISO格式，无法识别时原样返回
+    
+    参数:
+        value: 日期字符串
+        
+    返回:
+        ISO格式的日期时间
+    """
+    cleaned = re.sub(r"\s*\((UTC|GMT)[^)]*\)$|\s+(UTC|GMT|CST)$", "", value.strip())
+    try:
+        return datetime.fromisoformat(cleaned.replace("Z", "+00:00")).isoformat()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(cleaned, fmt).isoformat()
+        except ValueError:
+            continue
+    return value
+
+
+def parse_record(text: str) -> Dict[str, Any]:
+    """
+    把WHOIS应答解析为标准化字段
+    
+    参数:
+        text: WHOIS应答
+        
+    返回:
+        标准化字段字典（registrar、creation_date、expiration_date、nameservers、status、emails 等），
+        只包含应答中出现的字段；同一标量字段出现多次时取第一次
+    """
+    record: Dict[str, Any] = {}
+    for key, value in _parse_lines(text):
+        field = FIELD_NAMES.get(key)
+        if field is None or value.lower() in ("redacted for privacy", "data protected", "not disclosed"):
+            continue
+        if field in LIST_FIELDS:
+            if field == "nameservers":
+                value = value.split()[0].rstrip(".").lower()
+            elif field == "status":
+                value = value.split()[0]
+            values = record.setdefault(field, [])
+            if value not in values:
+                values.append(value)
+        elif field not in record:
+            record[field] = normalize_date(value) if field in DATE_FIELDS else value
+    return record
+
+
+class WhoisClient:
+    """
+    异步WHOIS（TCP 43端口）客户端
+    
+    域名查询依次跟随 IANA → 注册局 → 注册商 的转介，顶级域对应的注册局服务器只向IANA查询一次。
+    WHOIS协议每个连接只能查询一次，因此每个服务器的同时连接数有上限，并各有一个令牌桶限速
+    （默认取 modules.yaml 中 rate_limits.sources.whois，rate_limits.hosts 可按服务器覆盖），
+    服务器返回限流提示时降速后重试。
+    
+    结果按可注册域名在LRU缓存中保存 settings.whois_cache_ttl 秒（未注册的域名保存 whois_negative_ttl 秒），
+    同一域名的子域名和并发的重复查询只会发出一次请求。
+    """
+    
+    def __init__(self, resolver=None,
+                 timeout: Optional[float] = None,
+                 max_referrals: Optional[int] = None,
+                 max_connections_per_server: Optional[int] = None,
+                 cache_size: Optional[int] = None,
+                 cache_ttl: Optional[float] = None,
+                 negative_ttl: Optional[float] = None,
+                 rate_limits: Optional[Dict[str, Any]] = None):
+        self.resolver = resolver
+        self.timeout = timeout or settings.whois_timeout
+        self.max_referrals = max_referrals if max_referrals is not None else settings.whois_max_referrals
+        self.max_connections_per_server = max_connections_per_server or settings.whois_max_connections_per_server
+        self.cache_size = cache_size or settings.whois_cache_size
+        self.cache_ttl = cache_ttl if cache_ttl is not None else settings.whois_cache_ttl
+        self.negative_ttl = negative_ttl if negative_ttl is not None else settings.whois_negative_ttl
+        
+        rate_limits = rate_limits if rate_limits is not None else module_config.get_rate_limits()
+        self.default_rate_limit = (rate_limits.get("sources") or {}).get("whois") or {
+            "rate": settings.whois_rate_limit,
+            "burst": settings.whois_rate_burst
+        }
+        self.server_rate_limits: Dict[str, Dict[str, Any]] = rate_limits.get("hosts") or {}
+        
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._tld_servers: Dict[str, asyncio.Future] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._buckets: Dict[str, Optional[TokenBucket]] = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "queries": 0,
+            "referrals": 0,
+            "rate_limited": 0,
+            "errors": 0
+        }
+    
+    def get_cache_stats(self) -> Dict[str, int]:
+        """获取缓存命中、未命中和查询统计"""
+        return dict(self.stats, size=len(self._cache))
+    
+    async def lookup(self, target: str) -> Dict[str, Any]:
+        """
+        查询域名或IP的WHOIS信息
+        
+        参数:
+            target: 域名（可以是子域名）或IP
+            
+        返回:
+            标准化的WHOIS记录，包含 domain、found、servers（依次查询的服务器）、raw（最后一个服务器的应答）
+            以及 parse_record 解析出的字段；该字典可能被缓存并与其他调用方共享，调用方不应修改它
+            
+        异常:
+            WhoisError: 注册局服务器无法查询
+        """
+        domain = registrable_domain(target)
+        
+        cached = self._cache.get(domain)
+        if cached is not None:
+            expires_at, result = cached
+            if expires_at > time.monotonic():
+                self._cache.move_to_end(domain)
+                self.stats["hits"] += 1
+                return result
+            del self._cache[domain]
+        
+        future = self._inflight.get(domain)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+        
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[domain] = future
+        try:
+            result = await self._lookup(domain)
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e if isinstance(e, Exception) else WhoisError("查询已取消"))
+            # 避免没有其他等待者时出现 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            self._store(domain, result)
+            return result
+        finally:
+            del self._inflight[domain]
+    
+    def _store(self, domain: str, result: Dict[str, Any]):
+        """写入LRU缓存"""
+        ttl = self.cache_ttl if result["found"] else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._cache[domain] = (time.monotonic() + ttl, result)
+        self._cache.move_to_end(domain)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    async def _lookup(self, domain: str) -> Dict[str, Any]:
+        """从注册局开始跟随转介查询一个可注册域名或IP"""
+        try:
+            ipaddress.ip_address(domain)
+            # IP地址由IANA转介到对应的RIR
+            server = parse_referral(await self.query(IANA_SERVER, domain), IANA_SERVER)
+        except ValueError:
+            server = await self._tld_server(domain.rsplit(".", 1)[-1])
+        if server is None:
+            raise WhoisError(f"找不到 {domain} 的WHOIS服务器")
+        
+        result: Dict[str, Any] = {"domain": domain, "found": True, "servers": []}
+        record: Dict[str, Any] = {}
+        raw = ""
+        for depth in range(self.max_referrals + 1):
+            if server is None or server in result["servers"]:
+                break
+            try:
+                text = await self.query(server, QUERY_FORMATS.get(server, "{}").format(domain))
+            except WhoisError as e:
+                if depth == 0:
+                    raise
+                # 注册商服务器不可用时保留注册局的数据
+                logger.warning(f"查询注册商WHOIS服务器 {server} 时出错: {str(e)}")
+                result["referral_error"] = str(e)
+                break
+            result["servers"].append(server)
+            raw = text
+            if depth == 0 and NOT_FOUND_RE.search(text):
+                result["found"] = False
+                break
+            # 注册商的数据比注册局更详细，覆盖同名字段
+            record.update(parse_record(text))
+            server = parse_referral(text, server)
+            if server is not None and depth < self.max_referrals:
+                self.stats["referrals"] += 1
+        
+        result.update(record)
+        result["raw"] = raw[:RAW_RESPONSE_LIMIT]
+        return result
+    
+    async def _tld_server(self, tld: str) -> Optional[str]:
+        """向IANA查询顶级域的注册局WHOIS服务器，每个顶级域只查询一次"""
+        future = self._tld_servers.get(tld)
+        if future is None:
+            future = asyncio.ensure_future(self.query(IANA_SERVER, tld))
+            self._tld_servers[tld] = future
+        try:
+            text = await asyncio.shield(future)
+        except Exception:
+            # 失败的查询不缓存，下一次重新向IANA查询
+            if self._tld_servers.get(tld) is future:
+                del self._tld_servers[tld]
+            raise
+        return parse_referral(text, IANA_SERVER)
+    
+    def _get_semaphore(self, server: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(server)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_connections_per_server)
+            self._semaphores[server] = semaphore
+        return semaphore
+    
+    def _get_bucket(self, server: str) -> Optional[TokenBucket]:
+        if server not in self._buckets:
+            config = self.server_rate_limits.get(server, self.default_rate_limit)
+            rate = config.get("rate")
+            self._buckets[server] = (TokenBucket(float(rate), config.get("burst"), settings.rate_limit_min_rate)
+                                     if rate else None)
+        return self._buckets[server]
+    
+    async def query(self, server: str, query: str) -> str:
+        """
+        向WHOIS服务器发送一次查询
+        
+        参数:
+            server: WHOIS服务器主机名
+            query: 查询内容
+            
+        返回:
+            服务器的应答文本
+            
+        异常:
+            WhoisError: 重试后仍然连接失败、超时或被限流
+        """
+        bucket = self._get_bucket(server)
+        last_error = None
+        for attempt in range(settings.retry_attempts):
+            if attempt:
+                await asyncio.sleep(min(settings.retry_backoff_base * 2 ** attempt, settings.retry_backoff_max))
+            async with self._get_semaphore(server):
+                if bucket is not None:
+                    await bucket.acquire()
+                self.stats["queries"] += 1
+                try:
+                    text = await asyncio.wait_for(self._exchange(server, query), self.timeout)
+                except (OSError, asyncio.TimeoutError) as e:
+                    self.stats["errors"] += 1
+                    last_error = f"{type(e).__name__}: {str(e)}" if str(e) else type(e).__name__
+                    continue
+            
+            if RATE_LIMITED_RE.search(text) and not parse_record(text):
+                self.stats["rate_limited"] += 1
+                last_error = "服务器限流"
+                if bucket is not None:
+                    bucket.backoff(settings.rate_limit_backoff)
+                continue
+            if bucket is not None:
+                bucket.recover()
+            return text
+        raise WhoisError(f"查询 {server} 失败: {last_error}")
+    
+    async def _exchange(self, server: str, query: str) -> str:
+        """建立连接、发送查询并读取应答直到服务器关闭连接"""
+        address = server
+        if self.resolver is not None:
+            address = await self.resolver.resolve_address(server) or server
+        reader, writer = await asyncio.open_connection(address, WHOIS_PORT)
+        try:
+            writer.write(query.encode("utf-8") + b"\r\n")
+            await writer.drain()
+            data = await reader.read(settings.whois_max_bytes)
+            chunks = [data]
+            received = len(data)
+            while data and received < settings.whois_max_bytes:
+                data = await reader.read(settings.whois_max_bytes - received)
+                chunks.append(data)
+                received += len(data)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+        body = b"".join(chunks)
+        try:
+            return body.decode("utf-8")
+        except UnicodeDecodeError:
+            return body.decode("latin-1")